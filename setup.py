@@ -1,4 +1,4 @@
-from setuptools import setup
+from setuptools import find_packages, setup
 
 
 setup(
@@ -6,6 +6,6 @@ setup(
     version='0.1',
     description='Solution attempt for shell hackathon 2022',
     author='*um',
-    packages=['shellhackathon'],
+    packages=find_packages(include=['shellhackathon', 'shellhackathon.*']),
     zip_safe=False
 )
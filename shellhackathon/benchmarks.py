@@ -0,0 +1,400 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks comparing the package implementations with the approach of the notebooks.
+
+Run them with `python -m shellhackathon.benchmarks --help`.
+"""
+# system imports
+import logging
+import time
+from itertools import product
+from math import sqrt
+
+# third-party
+import click
+import click_log
+import numpy as np
+import pandas as pd
+import ortools.linear_solver.pywraplp as pywraplp
+
+# project imports
+from shellhackathon.candidates import CandidateArcs, nearest_candidates
+from shellhackathon.data.make_dataset import cache_dataset, load_arrays, load_frame
+from shellhackathon.distance import distance_matrix
+from shellhackathon.features.build_features import build_features
+from shellhackathon.models.aggregation import solve_aggregated
+from shellhackathon.models.backends import BACKENDS, get_backend
+from shellhackathon.models.placement import ChargerPlacementModel
+from shellhackathon.models.solution import PlacementSolution
+from shellhackathon.models.sparse import to_pywraplp, variable_values
+from shellhackathon.models.train_model import DemandForecaster, forecast_errors, history_years, notebook_forecast
+from shellhackathon.models.transportation import solve_transportation_lp
+from shellhackathon.utils import coordinates
+
+
+##############################################################################
+logger = logging.getLogger(__name__)
+click_log.basic_config(logger)
+
+SUPPLY_CSV = 'data/raw/exisiting_EV_infrastructure_2018.csv'
+PLAN_CSV = 'data/processed/exisiting_EV_infrastructure_2019.csv'
+DEMAND_CSV = 'data/processed/Demand_Future.csv'
+HISTORY_CSV = 'data/raw/Demand_History.csv'
+# existing infrastructure every year is planned from
+INSTANCES = {'2018': SUPPLY_CSV, '2019': SUPPLY_CSV, '2020': PLAN_CSV}
+
+
+##############################################################################
+def build_with_loops(supply: pd.DataFrame, demand: pd.DataFrame, year: str = '2019'):
+    """
+    Build the placement model exactly like the `Solution_2019` notebook does.
+    """
+    def compute_distance(loc1, loc2):
+        dx = loc1[0] - loc2[0]
+        dy = loc1[1] - loc2[1]
+        return sqrt(dx*dx + dy*dy)
+
+    demands = demand[year].tolist()
+    facilities = list(supply[["x_coordinate", "y_coordinate"]].itertuples(index=False, name=None))
+    customers = list(demand[["x_coordinate", "y_coordinate"]].itertuples(index=False, name=None))
+    num_facilities = len(facilities)
+    num_customers = len(customers)
+    cartesian_prod = list(product(range(num_customers), range(num_facilities)))
+    distance = {(c, f): compute_distance(customers[c], facilities[f]) for c, f in cartesian_prod}
+    slots = supply["total_parking_slots"].tolist()
+    slow_slots = supply["existing_num_SCS"].tolist()
+    fast_slots = supply["existing_num_FCS"].tolist()
+
+    solver = pywraplp.Solver.CreateSolver('SCIP_MIXED_INTEGER_PROGRAMMING')
+    assign = {}
+    for i, j in distance.keys():
+        assign[(i, j)] = solver.NumVar(0, solver.infinity(), "Assign")
+    slow = {}
+    for j in range(num_facilities):
+        slow[j] = solver.IntVar(slow_slots[j], solver.infinity(), "Slow")
+    fast = {}
+    for j in range(num_facilities):
+        fast[j] = solver.IntVar(fast_slots[j], solver.infinity(), "Fast")
+    for j in range(num_facilities):
+        solver.Add(slow[j] + fast[j] <= slots[j])
+    for j in range(num_facilities):
+        solver.Add(sum(assign[(i, j)] for i in range(num_customers)) <= (slow[j]*200 + fast[j]*400))
+    for i in range(num_customers):
+        solver.Add(sum(assign[(i, j)] for j in range(num_facilities)) == demands[i])
+    objective = solver.Objective()
+    for j in range(num_facilities):
+        objective.SetCoefficient(slow[j], 1.0*600)
+    for j in range(num_facilities):
+        objective.SetCoefficient(fast[j], 1.5*600)
+    for i in range(num_customers):
+        for j in range(num_facilities):
+            objective.SetCoefficient(assign[(i, j)], distance[(i, j)])
+    objective.SetMinimization()
+    return solver
+
+
+def build_with_arrays(supply: pd.DataFrame, demand: pd.DataFrame, year: str = '2019'):
+    """
+    Build the placement model in bulk with `ChargerPlacementModel`.
+    """
+    return ChargerPlacementModel(supply, demand, year).build()
+
+
+def timed(function, *args, repeat: int = 1, **kwargs) -> float:
+    """
+    Best wall time in seconds of `repeat` calls.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def load_instance(supply_csv: str, demand_csv: str, customers: int = 0):
+    supply = load_frame(supply_csv)
+    demand = load_frame(demand_csv)
+    if customers:
+        demand = demand.head(customers)
+    return supply, demand
+
+
+##############################################################################
+@click.group()
+@click_log.simple_verbosity_option(logger)
+def cli():
+    """
+    Benchmarks of the shellhackathon package.
+    """
+
+
+@cli.command()
+@click.option('--supply-csv', default=SUPPLY_CSV, type=click.Path(exists=True))
+@click.option('--demand-csv', default=DEMAND_CSV, type=click.Path(exists=True))
+@click.option('--year', default='2019')
+@click.option('--customers', default=0, help='only use the first N demand points (0 = all)')
+@click.option('--repeat', default=1)
+def build(supply_csv, demand_csv, year, customers, repeat):
+    """
+    Model build time of the notebook loops vs. the bulk array construction.
+    """
+    supply, demand = load_instance(supply_csv, demand_csv, customers)
+    results = pd.DataFrame({
+        'approach': ['loops', 'arrays'],
+        'seconds': [timed(build_with_loops, supply, demand, year, repeat=repeat),
+                    timed(build_with_arrays, supply, demand, year, repeat=repeat)],
+    })
+    results['speedup'] = results['seconds'].iloc[0] / results['seconds']
+    click.echo(f'{len(demand)} demand points x {len(supply)} parking slots')
+    click.echo(results.to_string(index=False))
+
+
+@cli.command()
+@click.option('--plan-csv', default=PLAN_CSV, type=click.Path(exists=True))
+@click.option('--demand-csv', default=DEMAND_CSV, type=click.Path(exists=True))
+@click.option('--year', default='2019')
+@click.option('--customers', default=0, help='only use the first N demand points (0 = all)')
+def transportation(plan_csv, demand_csv, year, customers):
+    """
+    Assignment for a fixed build plan: min-cost flow vs. GLOP LP vs. SCIP with fixed charger counts.
+    """
+    plan, demand = load_instance(plan_csv, demand_csv, customers)
+    model = ChargerPlacementModel(plan, demand, year)
+    slow, fast = plan['existing_num_SCS'], plan['existing_num_FCS']
+    capacities = slow * model.slow_charger + fast * model.fast_charger
+    build_costs = slow.sum() * model.slow_costs + fast.sum() * model.fast_costs
+    # existing chargers are lower bounds, so limiting the slots to them fixes the build plan
+    fixed = plan.assign(total_parking_slots=plan['existing_num_SCS'] + plan['existing_num_FCS'])
+
+    rows = []
+    for approach, function in [
+            ('min cost flow', lambda: model.reassign(slow, fast).objective),
+            ('glop', lambda: solve_transportation_lp(model.demands, capacities, model.arcs).objective + build_costs),
+            ('scip', lambda: ChargerPlacementModel(fixed, demand, year).solve().objective)]:
+        start = time.perf_counter()
+        objective = function()
+        rows.append((approach, time.perf_counter() - start, objective))
+    results = pd.DataFrame(rows, columns=['approach', 'seconds', 'objective'])
+    results['speedup'] = results['seconds'].iloc[-1] / results['seconds']
+    click.echo(f'{len(demand)} demand points x {len(plan)} parking slots')
+    click.echo(results.to_string(index=False))
+
+
+@cli.command()
+@click.option('--plan-csv', default=PLAN_CSV, type=click.Path(exists=True))
+@click.option('--demand-csv', default=DEMAND_CSV, type=click.Path(exists=True))
+@click.option('--year', default='2019')
+@click.option('--customers', default=500, help='only use the first N demand points (0 = all)')
+@click.option('--repeat', default=3)
+def extract(plan_csv, demand_csv, year, customers, repeat):
+    """
+    Reading the solution of a notebook model: `solution_value()` per variable vs. one bulk copy.
+    """
+    plan, demand = load_instance(plan_csv, demand_csv, customers)
+    # the fixed build plan keeps the solve short, extraction does not depend on it
+    fixed = plan.assign(total_parking_slots=plan['existing_num_SCS'] + plan['existing_num_FCS'])
+    solver = build_with_loops(fixed, demand, year)
+    solver.Solve()
+    arcs = CandidateArcs.dense(distance_matrix(demand[['x_coordinate', 'y_coordinate']].to_numpy(),
+                                               plan[['x_coordinate', 'y_coordinate']].to_numpy()))
+
+    def with_loops():
+        return [variable.solution_value() for variable in solver.variables()]
+
+    def with_arrays():
+        return PlacementSolution.from_values(variable_values(solver), arcs, year=year).to_frame()
+
+    results = pd.DataFrame({
+        'approach': ['solution_value loop', 'bulk values + result frame'],
+        'seconds': [timed(with_loops, repeat=repeat), timed(with_arrays, repeat=repeat)],
+    })
+    results['speedup'] = results['seconds'].iloc[0] / results['seconds']
+    click.echo(f'{solver.NumVariables()} variables')
+    click.echo(results.to_string(index=False))
+
+
+@cli.command()
+@click.option('--demand-csv', default=DEMAND_CSV, type=click.Path(exists=True))
+@click.option('--year', 'years', multiple=True, default=sorted(INSTANCES), type=click.Choice(sorted(INSTANCES)))
+@click.option('--backend', 'backends', multiple=True, default=sorted(BACKENDS))
+@click.option('--customers', default=0, help='only use the first N demand points (0 = all)')
+@click.option('--k', default=5, help='candidate parking slots per demand point (0 = all)')
+@click.option('--time-limit', default=120.0)
+@click.option('--threads', default=0, help='solver threads (0 = preset of the backend)')
+def backends(demand_csv, years, backends, customers, k, time_limit, threads):
+    """
+    Wall time and objective of the solver backends on the 2018, 2019 and 2020 instances.
+    """
+    rows = []
+    for year in years:
+        supply, demand = load_instance(INSTANCES[year], demand_csv, customers)
+        model = ChargerPlacementModel(supply, demand, year)
+        if k:
+            model = model.with_candidates(nearest_candidates(coordinates(demand), coordinates(supply), k=k))
+        for name in backends:
+            backend = get_backend(name, time_limit=time_limit, **({'threads': threads} if threads else {}))
+            start = time.perf_counter()
+            solution = model.solve(backend)
+            rows.append((year, name, solution.status, time.perf_counter() - start, solution.objective,
+                         solution.best_bound))
+            logger.info(f'{year} {name}: {solution.status} {solution.objective:.1f}')
+    results = pd.DataFrame(rows, columns=['year', 'backend', 'status', 'seconds', 'objective', 'best_bound'])
+    results['gap'] = (results['objective'] - results['best_bound']) / results['objective']
+    # above the best objective of the year
+    results['excess'] = results['objective'] / results.groupby('year')['objective'].transform('min') - 1
+    click.echo(f'{len(demand)} demand points x {len(supply)} parking slots, k = {k or "all"}')
+    click.echo(results.to_string(index=False))
+
+
+@cli.command()
+@click.option('--demand-csv', default=DEMAND_CSV, type=click.Path(exists=True))
+@click.option('--year', default='2019', type=click.Choice(sorted(INSTANCES)))
+@click.option('--backend', default='highs')
+@click.option('--cell-size', 'cell_sizes', multiple=True, type=float, default=(2.0, 4.0, 8.0),
+              help='edge length of the grid blocks')
+@click.option('--clusters', multiple=True, type=int, default=(256, 128), help='number of k-means clusters')
+@click.option('--k', default=5, help='candidate parking slots per demand point and super-node (0 = all)')
+@click.option('--time-limit', default=120.0)
+def aggregation(demand_csv, year, backend, cell_sizes, clusters, k, time_limit):
+    """
+    Size, wall time and objective error of solving on aggregated demand instead of all demand points.
+    """
+    supply, demand = load_instance(INSTANCES[year], demand_csv)
+    model = ChargerPlacementModel(supply, demand, year)
+    if k:
+        model = model.with_candidates(nearest_candidates(coordinates(demand), coordinates(supply), k=k))
+    start = time.perf_counter()
+    full = model.solve(backend, time_limit=time_limit)
+    rows = [('full', len(demand), len(model.arcs), time.perf_counter() - start, full.objective, full.objective)]
+    settings = [('grid', dict(cell_size=size)) for size in cell_sizes] + \
+        [('kmeans', dict(clusters=num_clusters)) for num_clusters in clusters]
+    for method, parameters in settings:
+        result = solve_aggregated(model, method, k=k or None, solver_name=backend, time_limit=time_limit,
+                                  **parameters)
+        summary = result.summary()
+        rows.append((f'{method} {list(parameters.values())[0]:g}', result.num_clusters,
+                     sum(len(solution.arcs) for solution in result.reduced.values()), summary['seconds'],
+                     result.objective, result.reduced_objective))
+        logger.info(f'{rows[-1][0]}: {summary["status"]} {result.objective:.1f}')
+    results = pd.DataFrame(rows, columns=['model', 'customers', 'arcs', 'seconds', 'objective', 'reduced_objective'])
+    results['reduction'] = results['arcs'].iloc[0] / results['arcs']
+    # aggregation error as seen by the reduced model, and the excess of the disaggregated plan
+    results['error'] = (results['objective'] - results['reduced_objective']) / results['objective']
+    results['excess'] = results['objective'] / full.objective - 1
+    click.echo(f'{len(demand)} demand points x {len(supply)} parking slots, {year}, {backend}')
+    click.echo(results.to_string(index=False))
+
+
+@cli.command()
+@click.option('--demand-csv', default=DEMAND_CSV, type=click.Path(exists=True))
+@click.option('--year', 'years', multiple=True, default=sorted(INSTANCES), type=click.Choice(sorted(INSTANCES)))
+@click.option('--customers', default=0, help='only use the first N demand points (0 = all)')
+@click.option('--k', default=5, help='candidate parking slots per demand point (0 = all)')
+@click.option('--parameters', default='limits/gap = 0', help='SCIP parameters')
+def presolve(demand_csv, years, customers, k, parameters):
+    """
+    Branch-and-bound nodes of SCIP with and without the presolved charger bounds, as reported by the notebooks.
+    """
+    rows = []
+    for year in years:
+        supply, demand = load_instance(INSTANCES[year], demand_csv, customers)
+        model = ChargerPlacementModel(supply, demand, year)
+        if k:
+            model = model.with_candidates(nearest_candidates(coordinates(demand), coordinates(supply), k=k))
+        slow, fast = model.charger_bounds()
+        for tighten in (False, True):
+            solver = to_pywraplp(model.build(tighten=tighten), 'scip')
+            solver.SetSolverSpecificParametersAsString(parameters)
+            start = time.perf_counter()
+            solver.Solve()
+            # values the charger variables can take
+            domain = 2 * model.slots if not tighten else slow + fast
+            rows.append((year, tighten, int((domain - model.existing_slow - model.existing_fast).sum()),
+                         solver.nodes(), solver.iterations(), time.perf_counter() - start,
+                         solver.Objective().Value()))
+            logger.info(f'{year} tighten={tighten}: {solver.nodes()} nodes')
+    results = pd.DataFrame(rows, columns=['year', 'tighten', 'domain', 'nodes', 'iterations', 'seconds',
+                                          'objective'])
+    click.echo(f'{len(demand)} demand points x {len(supply)} parking slots, k = {k or "all"}')
+    click.echo(results.to_string(index=False))
+
+
+@cli.command()
+@click.option('--csv', 'sources', multiple=True,
+              default=[HISTORY_CSV, DEMAND_CSV, SUPPLY_CSV, PLAN_CSV])
+@click.option('--repeat', default=20)
+def dataset(sources, repeat):
+    """
+    Load times of the CSV files compared with the typed binary cache.
+    """
+    rows = []
+    for source in sources:
+        cache_dataset(source)
+        rows.append((source, timed(pd.read_csv, source, repeat=repeat), timed(load_frame, source, repeat=repeat),
+                     timed(load_arrays, source, repeat=repeat)))
+    results = pd.DataFrame(rows, columns=['source', 'read_csv', 'load_frame', 'load_arrays'])
+    results['speedup_frame'] = results['read_csv'] / results['load_frame']
+    results['speedup_arrays'] = results['read_csv'] / results['load_arrays']
+    click.echo(results.to_string(index=False))
+
+
+@cli.command()
+@click.option('--history-csv', default=HISTORY_CSV, type=click.Path(exists=True))
+@click.option('--holdout', default=2, help='number of last years held out')
+@click.option('--window', default=2)
+@click.option('--n-jobs', default=-1)
+def forecast(history_csv, holdout, window, n_jobs):
+    """
+    Holdout errors and times of the notebook forecast and the lag window forecaster: both are trained on the
+    history without the last HOLDOUT years and forecast them.
+    """
+    history = load_frame(history_csv)
+    years = history_years(history)
+    train, test = years[:-holdout], years[-holdout:]
+    actual = history[test].to_numpy()
+
+    start = time.perf_counter()
+    notebook = notebook_forecast(history, train, horizon=holdout, n_jobs=n_jobs)
+    notebook_time = time.perf_counter() - start
+    start = time.perf_counter()
+    forecaster = DemandForecaster(window=window, horizon=holdout, n_jobs=n_jobs).fit(history, train)
+    lagged = forecaster.predict(history, train)
+    lagged_time = time.perf_counter() - start
+
+    rows = []
+    for method, values, seconds in [('notebook', notebook, notebook_time), ('lag windows', lagged, lagged_time)]:
+        for step, year in enumerate(test):
+            rows.append(dict(method=method, year=year, seconds=seconds,
+                             **forecast_errors(actual[:, step], values[:, step])))
+    click.echo(pd.DataFrame(rows).to_string(index=False))
+
+
+@cli.command()
+@click.option('--supply-csv', default=SUPPLY_CSV, type=click.Path(exists=True))
+@click.option('--size', 'sizes', multiple=True, type=int, default=(64, 256, 1000), help='cells per side of the grid')
+@click.option('--years', 'num_years', default=9)
+def features(supply_csv, sizes, num_years):
+    """
+    Build times of the spatial features of square demand grids of SIZE x SIZE cells with random demand.
+    """
+    supply = load_frame(supply_csv)
+    rng = np.random.default_rng(0)
+    rows = []
+    for size in sizes:
+        y, x = np.divmod(np.arange(size * size), size)
+        # the hackathon area stretched to the grid, so that the existing chargers lie within it
+        scale = 64 / size
+        demand = pd.DataFrame({'x_coordinate': (x + 0.5) * scale, 'y_coordinate': (y + 0.5) * scale})
+        growth = np.cumprod(rng.uniform(1.1, 1.5, (size * size, num_years)), axis=1)
+        for year in range(num_years):
+            demand[str(2010 + year)] = growth[:, year]
+        start = time.perf_counter()
+        result = build_features(demand, supply)
+        rows.append(dict(cells=size * size, years=num_years, features=result.shape[1],
+                         seconds=time.perf_counter() - start))
+    click.echo(pd.DataFrame(rows).to_string(index=False))
+
+
+if __name__ == '__main__':
+    cli()
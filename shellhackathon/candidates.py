@@ -0,0 +1,209 @@
+"""
+Candidate arcs between demand points and parking slots.
+
+The full assignment model has one variable per demand/supply pair, but in an optimal solution demand is
+only ever served by a few nearby parking slots. `nearest_candidates` keeps the K nearest (and/or all
+within a radius) parking slots per demand point using a KD-tree. `price_out` re-adds pruned arcs whose
+reduced cost is negative until none are left: in the LP relaxation of the placement model, so the relaxation
+over the kept arcs is the one over all arcs, and in the assignment of the final build plan.
+"""
+from dataclasses import dataclass
+from typing import Callable, Optional, Tuple, TypeVar
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from shellhackathon.distance import _as_points, iter_distance_chunks
+from shellhackathon.models.transportation import solve_transportation_lp
+
+# result of the restricted problem in `price_out`
+Result = TypeVar('Result')
+
+
+@dataclass(frozen=True)
+class CandidateArcs:
+    """
+    Sparse set of (customer, facility) arcs with their distance costs, sorted customer-major.
+    """
+    customer: np.ndarray
+    facility: np.ndarray
+    cost: np.ndarray
+    num_customers: int
+    num_facilities: int
+
+    def __len__(self) -> int:
+        return len(self.customer)
+
+    @property
+    def keys(self) -> np.ndarray:
+        """
+        Linear index of every arc in the dense (num_customers, num_facilities) matrix.
+        """
+        return self.customer.astype(np.int64) * self.num_facilities + self.facility
+
+    @classmethod
+    def from_keys(cls, keys, cost, num_customers: int, num_facilities: int) -> 'CandidateArcs':
+        keys = np.asarray(keys, dtype=np.int64)
+        keys, index = np.unique(keys, return_index=True)
+        return cls(customer=keys // num_facilities, facility=keys % num_facilities,
+                   cost=np.asarray(cost, dtype=np.float64)[index],
+                   num_customers=num_customers, num_facilities=num_facilities)
+
+    @classmethod
+    def dense(cls, distance: np.ndarray) -> 'CandidateArcs':
+        """
+        All arcs of a dense distance matrix, i.e. no pruning.
+
+        Examples:
+            >>> arcs = CandidateArcs.dense(np.array([[1., 2.], [3., 4.]]))
+            >>> len(arcs), arcs.customer, arcs.facility
+            (4, array([0, 0, 1, 1]), array([0, 1, 0, 1]))
+        """
+        num_customers, num_facilities = distance.shape
+        return cls(customer=np.repeat(np.arange(num_customers), num_facilities),
+                   facility=np.tile(np.arange(num_facilities), num_customers),
+                   cost=np.asarray(distance, dtype=np.float64).ravel(),
+                   num_customers=num_customers, num_facilities=num_facilities)
+
+    def union(self, other: 'CandidateArcs') -> 'CandidateArcs':
+        """
+        Merge two arc sets over the same customers and facilities.
+        """
+        if (self.num_customers, self.num_facilities) != (other.num_customers, other.num_facilities):
+            raise ValueError('arc sets belong to different problems')
+        return self.from_keys(np.concatenate([self.keys, other.keys]),
+                              np.concatenate([self.cost, other.cost]),
+                              self.num_customers, self.num_facilities)
+
+    def to_dense(self, values, fill: float = 0.0) -> np.ndarray:
+        """
+        Scatter one value per arc into a dense (num_customers, num_facilities) matrix.
+        """
+        dense = np.full((self.num_customers, self.num_facilities), fill, dtype=np.float64)
+        dense[self.customer, self.facility] = values
+        return dense
+
+
+def nearest_candidates(customers, facilities, k: Optional[int] = None,
+                       radius: Optional[float] = None) -> CandidateArcs:
+    """
+    Keep the `k` nearest facilities and/or all facilities within `radius` of every customer.
+
+    If only `radius` is given, every customer still keeps its nearest facility, so that no demand point
+    is left without an arc.
+
+    Examples:
+        >>> arcs = nearest_candidates([(0, 0), (10, 0)], [(1, 0), (9, 0), (5, 0)], k=1)
+        >>> arcs.customer, arcs.facility, arcs.cost
+        (array([0, 1]), array([0, 1]), array([1., 1.]))
+        >>> nearest_candidates([(0, 0), (10, 0)], [(1, 0), (9, 0), (5, 0)], radius=5).facility
+        array([0, 2, 1, 2])
+    """
+    if k is None and radius is None:
+        raise ValueError('give at least one of k or radius')
+    customers = _as_points(customers)
+    facilities = _as_points(facilities)
+    num_facilities = len(facilities)
+    tree = cKDTree(facilities)
+
+    _, nearest = tree.query(customers, k=min(k or 1, num_facilities))
+    nearest = nearest.reshape(len(customers), -1)
+    parts = [(np.arange(len(customers))[:, None] * num_facilities + nearest).ravel()]
+    if radius is not None:
+        pairs = cKDTree(customers).sparse_distance_matrix(tree, radius, output_type='ndarray')
+        parts.append(pairs['i'].astype(np.int64) * num_facilities + pairs['j'])
+
+    keys = np.unique(np.concatenate(parts))
+    customer, facility = keys // num_facilities, keys % num_facilities
+    cost = np.hypot(*(customers[customer] - facilities[facility]).T)
+    return CandidateArcs(customer=customer, facility=facility, cost=cost,
+                         num_customers=len(customers), num_facilities=num_facilities)
+
+
+def price_arcs(customers, facilities, demand_duals, capacity_duals, arcs: CandidateArcs,
+               tol: float = 1e-6, chunk_size: int = 4096) -> CandidateArcs:
+    """
+    Find the arcs outside of `arcs` with negative reduced cost `c_ij - u_i - v_j`.
+
+    `u` are the duals of the demand constraints and `v` (<= 0) the duals of the capacity constraints of
+    the transportation LP over `arcs`. The full distance matrix is streamed in chunks and never stored.
+
+    Examples:
+        >>> arcs = nearest_candidates([(0, 0)], [(1, 0), (2, 0)], k=1)
+        >>> price_arcs([(0, 0)], [(1, 0), (2, 0)], [5.], [-4., 0.], arcs).facility
+        array([1])
+    """
+    demand_duals = np.asarray(demand_duals, dtype=np.float64)
+    capacity_duals = np.asarray(capacity_duals, dtype=np.float64)
+    num_facilities = arcs.num_facilities
+    known = arcs.keys
+
+    keys, costs = [], []
+    for start, block in iter_distance_chunks(customers, facilities, chunk_size):
+        reduced = block - demand_duals[start:start + len(block), None] - capacity_duals[None, :]
+        rows, cols = np.nonzero(reduced < -tol)
+        block_keys = (rows + start).astype(np.int64) * num_facilities + cols
+        new = ~np.isin(block_keys, known, assume_unique=True)
+        keys.append(block_keys[new])
+        costs.append(block[rows[new], cols[new]])
+    return CandidateArcs.from_keys(np.concatenate(keys), np.concatenate(costs),
+                                   arcs.num_customers, num_facilities)
+
+
+def _price_years(customers, facilities, demand_duals, capacity_duals, arcs: CandidateArcs, tol: float,
+                 chunk_size: int) -> CandidateArcs:
+    """
+    `arcs` and the pruned arcs with negative reduced cost in any year, for duals with one row per year.
+    """
+    new = arcs
+    for year_demand_duals, year_capacity_duals in zip(np.atleast_2d(demand_duals), np.atleast_2d(capacity_duals)):
+        new = new.union(price_arcs(customers, facilities, year_demand_duals, year_capacity_duals, arcs,
+                                   tol=tol, chunk_size=chunk_size))
+    return new
+
+
+def price_out(solve: Callable[[CandidateArcs], Tuple[Result, np.ndarray]], customers, facilities, demands,
+              arcs: CandidateArcs,
+              relaxation: Optional[Callable[[CandidateArcs], Tuple[np.ndarray, np.ndarray]]] = None,
+              max_iterations: int = 20, tol: float = 1e-6,
+              chunk_size: int = 4096) -> Tuple[Result, CandidateArcs, bool]:
+    """
+    Column generation loop over pruned arcs.
+
+    `relaxation(arcs)` returns the demand and capacity duals of the LP relaxation of the restricted placement
+    problem, whose capacity constraints also hold the charger variables. Pruned arcs with negative reduced
+    cost are added until there are none, so the relaxation over the arcs equals the one over all arcs. The
+    duals of the transportation LP of a fixed build plan are not enough for this: a parking slot without
+    chargers gets an arbitrarily negative capacity dual there, so arcs that make building chargers at it
+    worthwhile are never added.
+
+    `solve(arcs)` then solves the restricted placement problem and returns `(result, capacities)`, where
+    `capacities` is the per-facility capacity of the build plan it found. The plan is fixed, the
+    transportation LP over the current arcs gives demand and capacity duals, and all pruned arcs with
+    negative reduced cost are added before starting over. Without `relaxation` only this step is done,
+    which is exact for transportation problems with fixed capacities. For multi-year problems `demands`,
+    `capacities` and the duals have one row per year and arcs are priced for every year.
+
+    Returns:
+        the last `result`, the final arc set, and whether the loop converged. On convergence no pruned arc
+        improves the LP relaxation or the assignment of the returned build plan. The plan itself is optimal
+        for the final arcs; an arc with non-negative reduced cost in the relaxation may still be used by a
+        better integer plan, the gap to the relaxation bounds how much that can save.
+    """
+    demands = np.atleast_2d(demands)
+    for _ in range(max_iterations):
+        if relaxation is not None:
+            new = _price_years(customers, facilities, *relaxation(arcs), arcs, tol, chunk_size)
+            if len(new) > len(arcs):
+                arcs = new
+                continue
+        result, capacities = solve(arcs)
+        lp = [solve_transportation_lp(year_demands, year_capacities, arcs)
+              for year_demands, year_capacities in zip(demands, np.atleast_2d(capacities))]
+        new = _price_years(customers, facilities, [year.demand_duals for year in lp],
+                           [year.capacity_duals for year in lp], arcs, tol, chunk_size)
+        if len(new) == len(arcs):
+            return result, arcs, True
+        arcs = new
+    result, _ = solve(arcs)
+    return result, arcs, False
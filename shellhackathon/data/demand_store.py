@@ -0,0 +1,217 @@
+"""
+Memory-mapped store of demand grids that do not fit in memory as `DataFrame`.
+
+A store is a directory with
+
+- `coordinates.npy`: the demand points as (n, 2) float32 array
+- `demand.npy`: the demand of every year as (n, years) float32 array
+- `meta.json`: the years and whether the points are sorted by y
+
+and is opened as read-only memory maps, so only the pages that are used are read. The demand of a year is a
+strided view of the demand matrix, and consecutive points and years are slices, so none of them copies any
+data. For points sorted by y (the row-major order of the hackathon grid), the rows of a bounding box are one
+contiguous band found by binary search; a band spanning all x values is returned as view, otherwise only the
+band is scanned and the selected points are copied.
+
+`DemandStore` can be used in place of a demand table by the placement models, `score` and the forecasting
+code; `shellhackathon.utils.demand_values` reads demand from either.
+"""
+import json
+from pathlib import Path
+from typing import Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from shellhackathon.data.make_dataset import INTERIM_DIR, MmapMode, load_arrays
+
+COORDINATES = ['x_coordinate', 'y_coordinate']
+
+
+class DemandStore:
+    """
+    Demand points and their demand per year as float32 arrays, usually memory-mapped.
+
+    Args:
+        coordinates: (n, 2) array of the demand points
+        demand: (n, years) array of the demand
+        years: the year of every demand column
+        sorted_by_y: whether the points are sorted by y, checked if not given
+
+    Examples:
+        >>> store = DemandStore.from_frame(pd.DataFrame({'x_coordinate': [0.5, 1.5, 0.5, 1.5],
+        ...                                              'y_coordinate': [0.5, 0.5, 1.5, 1.5],
+        ...                                              '2019': [1., 2., 3., 4.], '2020': [2., 3., 4., 5.]}))
+        >>> len(store), store.years, store.year(2020)
+        (4, ['2019', '2020'], array([2., 3., 4., 5.], dtype=float32))
+        >>> band = store.bbox(0, 1, 2, 2)
+        >>> band.year(2019), bool(np.shares_memory(band.demand, store.demand))
+        (array([3., 4.], dtype=float32), True)
+        >>> store.bbox(1, 0, 2, 2).coordinates
+        array([[1.5, 0.5],
+               [1.5, 1.5]], dtype=float32)
+    """
+
+    def __init__(self, coordinates: np.ndarray, demand: np.ndarray, years, sorted_by_y: Optional[bool] = None):
+        years = [str(year) for year in years]
+        if coordinates.ndim != 2 or coordinates.shape[1] != 2:
+            raise ValueError(f'coordinates must have shape (n, 2), not {coordinates.shape}')
+        if demand.shape != (len(coordinates), len(years)):
+            raise ValueError(f'demand must have shape {(len(coordinates), len(years))}, not {demand.shape}')
+        self.coordinates = coordinates
+        self.demand = demand
+        self.years = years
+        if sorted_by_y is None:
+            sorted_by_y = bool(np.all(coordinates[1:, 1] >= coordinates[:-1, 1]))
+        self.sorted_by_y = sorted_by_y
+
+    def __len__(self) -> int:
+        return len(self.coordinates)
+
+    def __contains__(self, year) -> bool:
+        return str(year) in self.years
+
+    def __repr__(self) -> str:
+        return f'DemandStore({len(self)} points, years {self.years})'
+
+    def year(self, year) -> np.ndarray:
+        """
+        View of the demand of one year.
+        """
+        return self.demand[:, self.years.index(str(year))]
+
+    def select_years(self, years) -> 'DemandStore':
+        """
+        Store of some years, a view if they are consecutive columns.
+        """
+        columns = [self.years.index(str(year)) for year in years]
+        if columns and columns == list(range(columns[0], columns[0] + len(columns))):
+            demand = self.demand[:, columns[0]:columns[0] + len(columns)]
+        else:
+            demand = self.demand[:, columns]
+        return DemandStore(self.coordinates, demand, years, self.sorted_by_y)
+
+    def rows(self, start: int, stop: int) -> 'DemandStore':
+        """
+        View of the points `start` to `stop`.
+        """
+        return DemandStore(self.coordinates[start:stop], self.demand[start:stop], self.years, self.sorted_by_y)
+
+    def bbox(self, x_min: float, y_min: float, x_max: float, y_max: float) -> 'DemandStore':
+        """
+        Store of the points within a bounding box, borders included.
+        """
+        if self.sorted_by_y:
+            y = self.coordinates[:, 1]
+            band = self.rows(int(np.searchsorted(y, y_min, side='left')),
+                             int(np.searchsorted(y, y_max, side='right')))
+            inside = (band.coordinates[:, 0] >= x_min) & (band.coordinates[:, 0] <= x_max)
+        else:
+            band = self
+            x, y = self.coordinates[:, 0], self.coordinates[:, 1]
+            inside = (x >= x_min) & (x <= x_max) & (y >= y_min) & (y <= y_max)
+        if inside.all():
+            return band
+        return DemandStore(band.coordinates[inside], band.demand[inside], self.years, self.sorted_by_y)
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Demand table like `Demand_Future.csv`, loading all data into memory.
+        """
+        frame = pd.DataFrame(np.asarray(self.coordinates), columns=COORDINATES)
+        for index, year in enumerate(self.years):
+            frame[year] = self.demand[:, index]
+        return frame
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame, years=None) -> 'DemandStore':
+        """
+        In-memory store of a demand table, by default of all year columns.
+        """
+        years = [column for column in frame.columns if str(column).isdigit()] if years is None else years
+        return cls(frame[COORDINATES].to_numpy(dtype=np.float32),
+                   frame[[str(year) for year in years]].to_numpy(dtype=np.float32), years)
+
+    @classmethod
+    def from_cache(cls, source: Union[str, Path], cache_dir: Union[str, Path] = INTERIM_DIR,
+                   years=None) -> 'DemandStore':
+        """
+        Store of a demand CSV file from the binary cache of `shellhackathon.data.make_dataset`, without
+        parsing it.
+        """
+        arrays = load_arrays(source, cache_dir)
+        store = cls(arrays.coordinates, arrays.values, arrays.columns)
+        return store.select_years(arrays.years if years is None else years)
+
+    @classmethod
+    def create(cls, path: Union[str, Path], num_points: int, years, sorted_by_y: bool = False) -> 'DemandStore':
+        """
+        New store of zeros on disk, memory-mapped for writing, e.g. to fill it in chunks.
+        """
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        years = [str(year) for year in years]
+        coordinates = np.lib.format.open_memmap(path / 'coordinates.npy', mode='w+', dtype=np.float32,
+                                                shape=(num_points, 2))
+        demand = np.lib.format.open_memmap(path / 'demand.npy', mode='w+', dtype=np.float32,
+                                           shape=(num_points, len(years)))
+        store = cls(coordinates, demand, years, sorted_by_y)
+        store._write_meta(path)
+        return store
+
+    @classmethod
+    def open(cls, path: Union[str, Path], mode: MmapMode = 'r') -> 'DemandStore':
+        """
+        Open a store on disk, read-only by default.
+        """
+        path = Path(path)
+        meta = json.loads((path / 'meta.json').read_text())
+        return cls(np.load(path / 'coordinates.npy', mmap_mode=mode), np.load(path / 'demand.npy', mmap_mode=mode),
+                   meta['years'], meta['sorted_by_y'])
+
+    def save(self, path: Union[str, Path]) -> 'DemandStore':
+        """
+        Write the store to disk and return it opened from there.
+        """
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        np.save(path / 'coordinates.npy', np.ascontiguousarray(self.coordinates, dtype=np.float32))
+        np.save(path / 'demand.npy', np.ascontiguousarray(self.demand, dtype=np.float32))
+        self._write_meta(path)
+        return DemandStore.open(path)
+
+    def _write_meta(self, path: Path):
+        (path / 'meta.json').write_text(json.dumps(dict(years=self.years, sorted_by_y=self.sorted_by_y)))
+
+    @classmethod
+    def from_csv(cls, source: Union[str, Path], path: Union[str, Path], years=None,
+                 chunksize: int = 1_000_000) -> 'DemandStore':
+        """
+        Convert a demand CSV file into a store on disk, parsing `chunksize` rows at a time so that the file
+        never has to fit in memory. By default all year columns are kept.
+        """
+        num_lines, last = 0, b'\n'
+        with open(source, 'rb') as file:
+            for block in iter(lambda: file.read(1 << 24), b''):
+                num_lines += block.count(b'\n')
+                last = block[-1:]
+        # without the header line, and with a last line that has no newline
+        num_points = num_lines - 1 + (last != b'\n')
+        header = pd.read_csv(source, nrows=0).columns
+        years = [column for column in header if column.isdigit()] if years is None else [str(y) for y in years]
+
+        store = cls.create(path, num_points, years)
+        start = 0
+        for chunk in pd.read_csv(source, usecols=COORDINATES + years, chunksize=chunksize, dtype=np.float32):
+            stop = start + len(chunk)
+            store.coordinates[start:stop] = chunk[COORDINATES].to_numpy()
+            store.demand[start:stop] = chunk[years].to_numpy()
+            start = stop
+        if start != num_points:
+            raise ValueError(f'{source} has {start} rows of demand, but {num_points} lines')
+        for array in (store.coordinates, store.demand):
+            if isinstance(array, np.memmap):
+                array.flush()
+        store.sorted_by_y = bool(np.all(store.coordinates[1:, 1] >= store.coordinates[:-1, 1]))
+        store._write_meta(Path(path))
+        return cls.open(path)
@@ -1,42 +1,235 @@
 # -*- coding: utf-8 -*-
+"""
+Typed binary cache of the raw and processed CSV inputs.
+
+Every CSV file is parsed once into a cache entry in `data/interim`, keyed by the SHA-256 hash of the file, so
+that an edited source gets a new entry and the stale entries of the same source path are removed. An entry
+holds
+
+- `table.parquet`: the cleaned table with canonical types, i.e. without the junk index columns that
+  `to_csv` with the default index left in the processed files (`Unnamed: 0` and a leading blank column),
+  integer index and charger columns and float64 coordinates and demand
+- `coordinates.npy`: the coordinates as (n, 2) float32 array
+- `values.npy`: all other non-index columns as (n, columns) float32 array, e.g. the demand per year
+- `manifest.json`: resolved source path, hash, shape and columns
+
+`load_frame` returns the table, `load_arrays` the arrays as read-only memory maps without parsing anything.
+Run `make data` to fill the cache ahead of time; the loaders build missing entries on first use.
+"""
 # system imports
-import os
+import hashlib
+import json
 import logging
+import os
+import shutil
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Literal, Optional, Tuple, Union
 
 # third-party
 import click
 import click_log
+import numpy as np
+import pandas as pd
 
 # project imports
 
 
 ##############################################################################
 log_fmt = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-logging.basicConfig(level=logging.INFO, format=log_fmt)
 logger = logging.getLogger(__name__)
 click_log.basic_config(logger)
 
+PROJECT_DIR = Path(__file__).resolve().parents[2]
+INTERIM_DIR = PROJECT_DIR / 'data' / 'interim'
+COORDINATES = ['x_coordinate', 'y_coordinate']
+# columns with integral values, stored as float in some processed files
+INTEGER_COLUMNS = ['total_parking_slots', 'existing_num_SCS', 'existing_num_FCS']
+_digests: Dict[Tuple[str, int, int], str] = {}
+MmapMode = Literal['r+', 'r', 'w+', 'c']
+
 
 ##############################################################################
-def do_work():
-    print('working...')
+def file_hash(path: Union[str, Path]) -> str:
+    """
+    SHA-256 hex digest of the contents of a file. Digests are remembered per process until the size or
+    modification time of the file changes.
+    """
+    stat = os.stat(path)
+    key = (str(Path(path).resolve()), stat.st_size, stat.st_mtime_ns)
+    if key not in _digests:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as file:
+            for block in iter(lambda: file.read(1 << 20), b''):
+                digest.update(block)
+        _digests[key] = digest.hexdigest()
+    return _digests[key]
+
+
+def is_junk_column(name) -> bool:
+    """
+    Whether a column is an index written by `to_csv`: unnamed (`''` or `Unnamed: 0`, `Unnamed: 0.1`, ...).
+
+    Examples:
+        >>> [is_junk_column(name) for name in ['', 'Unnamed: 0', 'Unnamed: 0.1', 'demand_point_index', '2019']]
+        [True, True, True, False, False]
+    """
+    name = str(name)
+    return name.strip() == '' or name.startswith('Unnamed:')
+
+
+def clean_frame(frame: pd.DataFrame) -> pd.DataFrame:
+    """
+    Drop the junk index columns and cast the columns to canonical types: integer columns, `*_index` and the
+    charger columns to int64, everything else to float64.
+
+    Examples:
+        >>> frame = pd.DataFrame({'Unnamed: 0': [0, 1], 'supply_point_index': [0, 1], 'x_coordinate': [0.5, 1.5],
+        ...                       'total_parking_slots': [20, 30], 'existing_num_SCS': [5.0, 4.0]})
+        >>> clean_frame(frame).dtypes.astype(str).tolist()
+        ['int64', 'float64', 'int64', 'int64']
+    """
+    frame = frame.loc[:, [not is_junk_column(column) for column in frame.columns]].copy()
+    frame.columns = [str(column) for column in frame.columns]
+    for column in frame.columns:
+        if pd.api.types.is_integer_dtype(frame[column]):
+            frame[column] = frame[column].astype(np.int64)
+            continue
+        values = frame[column].to_numpy(dtype=np.float64)
+        if column.endswith('_index') or (column in INTEGER_COLUMNS and np.all(values == np.round(values))):
+            frame[column] = values.astype(np.int64)
+        else:
+            frame[column] = values
+    return frame.reset_index(drop=True)
+
+
+def value_columns(frame: pd.DataFrame) -> List[str]:
+    """
+    Columns of the values array: everything except index columns and coordinates.
+    """
+    return [column for column in frame.columns if not column.endswith('_index') and column not in COORDINATES]
+
+
+@dataclass
+class DatasetArrays:
+    # (n, 2) float32 coordinates and (n, columns) float32 values, read-only memory maps of the cache
+    coordinates: np.ndarray
+    values: np.ndarray
+    columns: List[str]
+
+    @property
+    def years(self) -> List[str]:
+        return [column for column in self.columns if column.isdigit()]
+
+    def column(self, name) -> np.ndarray:
+        """
+        View of the values of one column, e.g. the demand of a year.
+        """
+        return self.values[:, self.columns.index(str(name))]
+
+
+def entry_dir(source: Union[str, Path], cache_dir: Union[str, Path] = INTERIM_DIR,
+              digest: Optional[str] = None) -> Path:
+    """
+    Directory of the cache entry of a source file, named after the file and the start of its hash.
+    """
+    digest = digest or file_hash(source)
+    return Path(cache_dir) / f'{Path(source).stem}-{digest[:16]}'
+
+
+def cache_dataset(source: Union[str, Path], cache_dir: Union[str, Path] = INTERIM_DIR) -> Path:
+    """
+    Build the cache entry of a CSV file unless it exists, and return its directory.
+
+    The entry is written to a temporary directory first and renamed, so concurrent builds of the same entry
+    (e.g. the workers of a sweep) never see half-written files.
+    """
+    digest = file_hash(source)
+    target = entry_dir(source, cache_dir, digest)
+    if (target / 'manifest.json').exists():
+        return target
+
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    frame = clean_frame(pd.read_csv(source))
+    columns = value_columns(frame)
+    building = Path(tempfile.mkdtemp(prefix=f'.{target.name}-', dir=cache_dir))
+    try:
+        frame.to_parquet(building / 'table.parquet', index=False)
+        np.save(building / 'coordinates.npy', frame[COORDINATES].to_numpy(dtype=np.float32))
+        np.save(building / 'values.npy', frame[columns].to_numpy(dtype=np.float32))
+        manifest = dict(source=str(Path(source).resolve()), sha256=digest, rows=len(frame), columns=list(frame.columns),
+                        values=columns)
+        (building / 'manifest.json').write_text(json.dumps(manifest, indent=2))
+        os.replace(building, target)
+    except OSError:
+        # another process renamed its build first
+        if not (target / 'manifest.json').exists():
+            raise
+    finally:
+        shutil.rmtree(building, ignore_errors=True)
+
+    # entries of older versions of the same file, not of other files with the same name
+    for stale in cache_dir.glob(f'{Path(source).stem}-*/manifest.json'):
+        if stale.parent != target and json.loads(stale.read_text())['source'] == str(Path(source).resolve()):
+            shutil.rmtree(stale.parent, ignore_errors=True)
+    logger.info(f'cached {source} in {target}')
+    return target
+
+
+def load_frame(source: Union[str, Path], cache_dir: Union[str, Path] = INTERIM_DIR) -> pd.DataFrame:
+    """
+    The cleaned and typed table of a CSV file, from the cache.
+    """
+    return pd.read_parquet(cache_dataset(source, cache_dir) / 'table.parquet')
+
+
+def load_arrays(source: Union[str, Path], cache_dir: Union[str, Path] = INTERIM_DIR,
+                mmap_mode: Optional[MmapMode] = 'r') -> DatasetArrays:
+    """
+    Coordinates and values of a CSV file as float32 arrays, memory-mapped from the cache.
+
+    Examples:
+        >>> import tempfile
+        >>> with tempfile.TemporaryDirectory() as directory:
+        ...     source = Path(directory) / 'demand.csv'
+        ...     _ = source.write_text(',demand_point_index,x_coordinate,y_coordinate,2018,2019\\n'
+        ...                           '0,0,0.5,0.5,1.5,2.5\\n1,1,1.5,0.5,3.0,4.0\\n')
+        ...     arrays = load_arrays(source, cache_dir=Path(directory) / 'interim')
+        ...     arrays.coordinates.dtype, arrays.years, arrays.column(2019).tolist()
+        (dtype('float32'), ['2018', '2019'], [2.5, 4.0])
+    """
+    target = cache_dataset(source, cache_dir)
+    manifest = json.loads((target / 'manifest.json').read_text())
+    return DatasetArrays(coordinates=np.load(target / 'coordinates.npy', mmap_mode=mmap_mode),
+                         values=np.load(target / 'values.npy', mmap_mode=mmap_mode), columns=manifest['values'])
+
+
+def make_dataset(sources, cache_dir: Union[str, Path] = INTERIM_DIR) -> List[Path]:
+    """
+    Cache every CSV file of the given files and directories.
+    """
+    entries = []
+    for source in map(Path, sources):
+        for path in sorted(source.glob('*.csv')) if source.is_dir() else [source]:
+            entries.append(cache_dataset(path, cache_dir))
+    return entries
 
 
 ##############################################################################
 @click.command()
 @click_log.simple_verbosity_option(logger)
-@click.argument('input_filepath', type=click.Path(exists=True))
+@click.argument('input_filepaths', nargs=-1, required=True, type=click.Path(exists=True))
 @click.argument('output_filepath', type=click.Path())
-def main(input_filepath, output_filepath):
+def main(input_filepaths, output_filepath):
     """
-    TODO This is the cli documentation
+    Cache the CSV files in INPUT_FILEPATHS (files or directories) as typed binary data in OUTPUT_FILEPATH.
     """
-    logger.info('Making something ...')
-    do_work()
+    entries = make_dataset(input_filepaths, output_filepath)
+    logger.info(f'{len(entries)} data sets cached in {output_filepath}')
 
 
 if __name__ == '__main__':
-    # not used in this stub but often useful for finding various files
-    project_dir = os.path.join(os.path.dirname(__file__), os.pardir, os.pardir)
-
+    logging.basicConfig(level=logging.INFO, format=log_fmt)
     main()
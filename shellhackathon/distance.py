@@ -0,0 +1,76 @@
+"""
+Distance matrices between demand points (customers) and parking slots (facilities).
+
+The solution notebooks used to build a ``{(c, f): compute_distance(...)}`` dict over the cartesian
+product of all demand and supply points. The functions in this module compute the same numbers as a
+dense ``(num_customers, num_facilities)`` array in one broadcast, so model builders and scorers can
+gather coefficients with NumPy indexing instead of 400k dict lookups.
+"""
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+
+
+def _as_points(points) -> np.ndarray:
+    points = np.asarray(points, dtype=np.float64)
+    if points.ndim != 2 or points.shape[1] != 2:
+        raise ValueError(f'expected an array of shape (n, 2), got {points.shape}')
+    return points
+
+
+def distance_matrix(customers, facilities, dtype=np.float64, chunk_size: Optional[int] = None,
+                    out: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Euclidean distance between every customer and every facility.
+
+    Args:
+        customers: array-like of shape (num_customers, 2) with x/y coordinates
+        facilities: array-like of shape (num_facilities, 2) with x/y coordinates
+        dtype: float type of the result, `np.float32` halves the memory footprint
+        chunk_size: compute the matrix in blocks of this many customers. This bounds the size of the
+            temporaries to `chunk_size * num_facilities`, use it for grids that do not fit in RAM twice.
+        out: optional preallocated array of shape (num_customers, num_facilities), e.g. a `np.memmap`
+
+    Returns:
+        array of shape (num_customers, num_facilities), `out` if it was given
+
+    Examples:
+        >>> distance_matrix([(0, 0), (3, 4)], [(0, 0), (0, 4)])
+        array([[0., 4.],
+               [5., 3.]])
+        >>> distance_matrix([(0, 0), (3, 4)], [(0, 0), (0, 4)], dtype=np.float32, chunk_size=1).dtype
+        dtype('float32')
+    """
+    customers = _as_points(customers)
+    facilities = _as_points(facilities)
+    shape = (len(customers), len(facilities))
+    if out is None:
+        out = np.empty(shape, dtype=dtype)
+    elif out.shape != shape:
+        raise ValueError(f'out has shape {out.shape}, expected {shape}')
+
+    for start, block in iter_distance_chunks(customers, facilities, chunk_size=chunk_size or len(customers)):
+        out[start:start + len(block)] = block
+    return out
+
+
+def iter_distance_chunks(customers, facilities,
+                         chunk_size: int = 4096) -> Iterator[Tuple[int, np.ndarray]]:
+    """
+    Lazily compute the distance matrix in row blocks.
+
+    Yields `(start, block)` pairs, where `block` holds the distances of customers
+    `start, ..., start + len(block) - 1` to all facilities. Use this to stream over grids whose full
+    distance matrix does not fit in memory at all.
+
+    Examples:
+        >>> [(start, block.shape) for start, block in iter_distance_chunks(np.zeros((5, 2)), [(1, 1)], 2)]
+        [(0, (2, 1)), (2, (2, 1)), (4, (1, 1))]
+    """
+    customers = _as_points(customers)
+    facilities = _as_points(facilities)
+    chunk_size = max(int(chunk_size), 1)
+    for start in range(0, len(customers), chunk_size):
+        block = customers[start:start + chunk_size]
+        yield start, np.hypot(block[:, 0, None] - facilities[None, :, 0],
+                              block[:, 1, None] - facilities[None, :, 1])
@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+"""
+Spatial features of the demand grid.
+
+The demand points lie on a regular grid (the cell centres of the 64 x 64 hackathon area), so the demand table
+is scattered into a (years, rows, cols) array once and every neighbourhood feature is a vectorized pass over
+that array instead of a neighbour search per point:
+
+- ring means: the mean demand of the cells within Chebyshev distance `k` of a cell (the `k`-ring including
+  the cell itself), from a summed-area table, so every radius costs four lookups per cell
+- growth rates: the relative change of demand and of the ring means against the previous year
+- charger distance: the distance to the nearest site with existing chargers, from a KD-tree
+- charger density: the existing charging capacity per area within the `k`-ring, from the same summed-area
+  tables applied to the capacity scattered onto the grid
+
+`build_features` returns one row per demand point, so the features line up with the demand table.
+"""
+# system imports
+import logging
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+# third-party
+import click
+import click_log
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+# project imports
+from shellhackathon.utils import FAST_CHARGER, SLOW_CHARGER, coordinates, demand_values
+
+
+##############################################################################
+logger = logging.getLogger(__name__)
+click_log.basic_config(logger)
+
+RADII = (1, 2, 4)
+
+
+##############################################################################
+@dataclass
+class DemandGrid:
+    # (years, rows, cols) demand, zero in cells without demand point
+    values: np.ndarray
+    years: List[str]
+    # x and y of the lower left corner and the side of a cell
+    origin: np.ndarray
+    cell_size: float
+    # grid cell of every demand point
+    rows: np.ndarray
+    cols: np.ndarray
+
+    @property
+    def shape(self):
+        return self.values.shape[1:]
+
+    def occupied(self) -> np.ndarray:
+        """
+        (rows, cols) mask of the cells that hold a demand point.
+        """
+        mask = np.zeros(self.shape, dtype=bool)
+        mask[self.rows, self.cols] = True
+        return mask
+
+    def cells(self, points: np.ndarray) -> np.ndarray:
+        """
+        (n, 2) row and column of the cells of (n, 2) points, clipped to the grid.
+        """
+        cells = np.floor((points[:, ::-1] - self.origin[::-1]) / self.cell_size).astype(np.int64)
+        return np.clip(cells, 0, np.array(self.shape) - 1)
+
+    def centres(self) -> np.ndarray:
+        """
+        (rows * cols, 2) coordinates of the cell centres, row by row.
+        """
+        y, x = np.indices(self.shape)
+        return np.column_stack([x.ravel(), y.ravel()]) * self.cell_size + self.origin + self.cell_size / 2
+
+    def at_points(self, grid: np.ndarray) -> np.ndarray:
+        """
+        Values of a (..., rows, cols) feature at the demand points, as (..., n) array.
+        """
+        return grid[..., self.rows, self.cols]
+
+
+def grid_cell_size(points: np.ndarray) -> float:
+    """
+    Side of the grid cells: the smallest distance between two distinct x or y coordinates.
+
+    Examples:
+        >>> grid_cell_size(np.array([[0.5, 0.5], [1.5, 0.5], [0.5, 2.5]]))
+        1.0
+    """
+    gaps = np.concatenate([np.diff(np.unique(points[:, axis])) for axis in range(2)])
+    return float(gaps.min()) if len(gaps) else 1.0
+
+
+def demand_grid(demand, years=None, cell_size: Optional[float] = None) -> DemandGrid:
+    """
+    Scatter the demand of a demand table or `DemandStore` into a (years, rows, cols) array.
+
+    Examples:
+        >>> demand = pd.DataFrame({'x_coordinate': [0.5, 1.5, 0.5], 'y_coordinate': [0.5, 0.5, 1.5],
+        ...                        '2018': [1., 2., 3.], '2019': [2., 3., 4.]})
+        >>> grid = demand_grid(demand)
+        >>> grid.values[1].tolist(), grid.years
+        ([[2.0, 3.0], [4.0, 0.0]], ['2018', '2019'])
+    """
+    if years is None:
+        years = demand.years if hasattr(demand, 'years') else [str(c) for c in demand.columns if str(c).isdigit()]
+    years = [str(year) for year in years]
+    points = coordinates(demand)
+    cell_size = grid_cell_size(points) if cell_size is None else cell_size
+    origin = np.floor(points.min(axis=0) / cell_size) * cell_size
+    cells = np.floor((points[:, ::-1] - origin[::-1]) / cell_size).astype(np.int64)
+    rows, cols = cells[:, 0], cells[:, 1]
+    values = np.zeros((len(years), rows.max() + 1, cols.max() + 1))
+    values[:, rows, cols] = demand_values(demand, years).T
+    return DemandGrid(values, years, origin, cell_size, rows, cols)
+
+
+def window_sums(grid: np.ndarray, radius: int) -> np.ndarray:
+    """
+    Sum of the cells within Chebyshev distance `radius` of every cell of the last two axes, cut at the
+    borders, from a summed-area table.
+
+    Examples:
+        >>> window_sums(np.arange(9.).reshape(3, 3), 1)
+        array([[ 8., 15., 12.],
+               [21., 36., 27.],
+               [20., 33., 24.]])
+    """
+    rows, cols = grid.shape[-2:]
+    table = np.zeros(grid.shape[:-2] + (rows + 1, cols + 1))
+    np.cumsum(np.cumsum(grid, axis=-2, dtype=np.float64), axis=-1, out=table[..., 1:, 1:])
+    low_rows = np.clip(np.arange(rows) - radius, 0, rows)[:, None]
+    high_rows = np.clip(np.arange(rows) + radius + 1, 0, rows)[:, None]
+    low_cols = np.clip(np.arange(cols) - radius, 0, cols)
+    high_cols = np.clip(np.arange(cols) + radius + 1, 0, cols)
+    return (table[..., high_rows, high_cols] - table[..., low_rows, high_cols]
+            - table[..., high_rows, low_cols] + table[..., low_rows, low_cols])
+
+
+def ring_means(grid: np.ndarray, radius: int, occupied: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Mean of the cells within Chebyshev distance `radius` of every cell, over the occupied cells only.
+
+    Examples:
+        >>> means = ring_means(np.arange(9.).reshape(3, 3), 1)
+        >>> float(means[1, 1]), float(means[0, 0])
+        (4.0, 2.0)
+    """
+    occupied = np.ones(grid.shape[-2:], dtype=bool) if occupied is None else occupied
+    counts = window_sums(occupied.astype(np.float64), radius)
+    return window_sums(grid, radius) / np.maximum(counts, 1)
+
+
+def growth_rates(values: np.ndarray, lag: int = 1) -> np.ndarray:
+    """
+    Relative change along the first axis against `lag` steps before, zero for the first `lag` steps and
+    where there was no demand.
+
+    Examples:
+        >>> growth_rates(np.array([[0., 2.], [1., 3.], [2., 6.]]))
+        array([[0. , 0. ],
+               [0. , 0.5],
+               [1. , 1. ]])
+    """
+    growth = np.zeros_like(values, dtype=np.float64)
+    before, after = values[:-lag], values[lag:]
+    np.divide(after - before, before, out=growth[lag:], where=before > 0)
+    return growth
+
+
+def charger_capacity(supply: pd.DataFrame) -> np.ndarray:
+    """
+    Existing charging capacity of every site.
+    """
+    return (supply['existing_num_SCS'].to_numpy(dtype=np.float64) * SLOW_CHARGER
+            + supply['existing_num_FCS'].to_numpy(dtype=np.float64) * FAST_CHARGER)
+
+
+def charger_distance(points: np.ndarray, supply: pd.DataFrame) -> np.ndarray:
+    """
+    Distance of every point to the nearest site with existing chargers, infinite without any.
+
+    Examples:
+        >>> supply = pd.DataFrame({'x_coordinate': [0., 5.], 'y_coordinate': [0., 0.],
+        ...                        'existing_num_SCS': [0, 1], 'existing_num_FCS': [0, 0]})
+        >>> charger_distance(np.array([[1., 0.], [5., 3.]]), supply)
+        array([4., 3.])
+    """
+    sites = coordinates(supply)[charger_capacity(supply) > 0]
+    if not len(sites):
+        return np.full(len(points), np.inf)
+    distances, _ = cKDTree(sites).query(points, workers=-1)
+    return distances
+
+
+def charger_density(grid: DemandGrid, supply: pd.DataFrame, radius: int) -> np.ndarray:
+    """
+    (rows, cols) existing charging capacity per area within Chebyshev distance `radius` of every cell. Sites
+    outside the grid count for the nearest border cell.
+    """
+    capacity = np.zeros(grid.shape)
+    cells = grid.cells(coordinates(supply))
+    np.add.at(capacity, (cells[:, 0], cells[:, 1]), charger_capacity(supply))
+    area = window_sums(np.ones(grid.shape), radius) * grid.cell_size ** 2
+    return window_sums(capacity, radius) / area
+
+
+def build_features(demand, supply: pd.DataFrame, years=None, radii: Sequence[int] = RADII,
+                   cell_size: Optional[float] = None) -> pd.DataFrame:
+    """
+    Spatial features of every demand point of a demand table or `DemandStore`:
+
+    - `<year>_ring<k>`: mean demand within the `k`-ring
+    - `<year>_growth`, `<year>_ring<k>_growth`: growth of demand and of the ring mean against the previous
+      year
+    - `charger_distance`: distance to the nearest existing charger
+    - `charger_density<k>`: existing charging capacity per area within the `k`-ring
+
+    Examples:
+        >>> x, y = np.meshgrid(np.arange(3) + 0.5, np.arange(3) + 0.5)
+        >>> demand = pd.DataFrame({'x_coordinate': x.ravel(), 'y_coordinate': y.ravel(), '2018': np.arange(9.)})
+        >>> demand['2019'] = demand['2018'] * 2
+        >>> supply = pd.DataFrame({'x_coordinate': [0.5], 'y_coordinate': [0.5],
+        ...                        'existing_num_SCS': [1], 'existing_num_FCS': [0]})
+        >>> features = build_features(demand, supply, radii=[1])
+        >>> features.loc[4, ['2019_ring1', '2019_growth', 'charger_distance', 'charger_density1']].tolist()
+        [8.0, 1.0, 1.4142135623730951, 22.22222222222222]
+    """
+    grid = demand_grid(demand, years, cell_size)
+    occupied = grid.occupied()
+    columns: Dict[str, np.ndarray] = {}
+    rings = {radius: ring_means(grid.values, radius, occupied) for radius in radii}
+    growth = grid.at_points(growth_rates(grid.values))
+    ring_growth = {radius: grid.at_points(growth_rates(means)) for radius, means in rings.items()}
+    ring_values = {radius: grid.at_points(means) for radius, means in rings.items()}
+    for index, year in enumerate(grid.years):
+        for radius in radii:
+            columns[f'{year}_ring{radius}'] = ring_values[radius][index]
+        columns[f'{year}_growth'] = growth[index]
+        for radius in radii:
+            columns[f'{year}_ring{radius}_growth'] = ring_growth[radius][index]
+    columns['charger_distance'] = charger_distance(coordinates(demand), supply)
+    for radius in radii:
+        columns[f'charger_density{radius}'] = grid.at_points(charger_density(grid, supply, radius))
+    return pd.DataFrame(columns)
+
+
+##############################################################################
+@click.command()
+@click_log.simple_verbosity_option(logger)
+@click.argument('demand_filepath', type=click.Path(exists=True))
+@click.argument('supply_filepath', type=click.Path(exists=True))
+@click.argument('output_filepath', type=click.Path())
+@click.option('--radius', 'radii', multiple=True, type=int, default=RADII, help='k of the k-ring features')
+def main(demand_filepath, supply_filepath, output_filepath, radii):
+    """
+    Build the spatial features of the demand points in DEMAND_FILEPATH with the existing chargers in
+    SUPPLY_FILEPATH and write them with the demand point index and coordinates to OUTPUT_FILEPATH (parquet).
+    """
+    from shellhackathon.data.make_dataset import load_frame
+    demand = load_frame(demand_filepath)
+    features = build_features(demand, load_frame(supply_filepath), radii=radii)
+    other = [column for column in demand.columns if not column.isdigit()]
+    pd.concat([demand[other], features], axis=1).to_parquet(output_filepath, index=False)
+    logger.info(f'{features.shape[1]} features of {len(features)} demand points written to {output_filepath}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,207 @@
+"""
+Spatial aggregation of demand points to shrink the placement model.
+
+The demand points are clustered into super-nodes, either by coarsening the regular demand grid into blocks
+of `cell_size` x `cell_size` or by k-means weighted with the demand. Every super-node sits at the
+demand-weighted centroid of its points and gets their summed demand, so the reduced model has one row of
+assignment variables per super-node instead of one per demand point. The build plan of the reduced model is
+then used for the original demand points, whose assignment is solved as min-cost flow
+(`ChargerPlacementModel.reassign`).
+
+The disaggregated plan is a feasible solution of the original problem. The difference between its
+objective and the objective of the reduced model is reported as aggregation error. It has no fixed sign:
+distances measured from the centroids underestimate the costs of spread-out clusters, while all points of
+a cluster have to be served in the same shares by the reduced model.
+"""
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from shellhackathon.candidates import nearest_candidates
+from shellhackathon.models.placement import ChargerPlacementModel, MultiYearPlacementModel
+from shellhackathon.models.solution import PlacementSolution
+from shellhackathon.utils import coordinates, demand_values
+
+
+def grid_clusters(customers, cell_size: float) -> np.ndarray:
+    """
+    Cluster label of every demand point, one cluster per `cell_size` x `cell_size` block of the plane.
+
+    Examples:
+        >>> grid_clusters([[0.5, 0.5], [1.5, 0.5], [2.5, 0.5], [0.5, 3.5]], cell_size=2)
+        array([0, 0, 1, 2])
+    """
+    customers = np.asarray(customers, dtype=np.float64)
+    blocks = np.floor(customers / cell_size).astype(np.int64)
+    _, labels = np.unique(blocks, axis=0, return_inverse=True)
+    # labels in order of first appearance, so that they follow the order of the demand points
+    _, first, labels = np.unique(labels.ravel(), return_index=True, return_inverse=True)
+    return np.argsort(np.argsort(first))[labels]
+
+
+def kmeans_clusters(customers, weights, k: int, seed: int = 0) -> np.ndarray:
+    """
+    Cluster label of every demand point from k-means weighted with the demand, so that areas with high
+    demand get smaller clusters.
+    """
+    from sklearn.cluster import KMeans
+    customers = np.asarray(customers, dtype=np.float64)
+    weights = np.asarray(weights, dtype=np.float64)
+    # points without demand would not move any centroid, but still need a cluster
+    weights = np.maximum(weights, 1e-6 * max(weights.max(initial=0.0), 1.0))
+    k = min(k, len(customers))
+    return KMeans(n_clusters=k, n_init=3, random_state=seed).fit(customers, sample_weight=weights).labels_
+
+
+def aggregate_demand(demand: pd.DataFrame, labels, years) -> pd.DataFrame:
+    """
+    One demand point per cluster at the centroid of its points, weighted with the total demand of `years`,
+    with the summed demand of every year and the number of points as `size`.
+
+    Examples:
+        >>> demand = pd.DataFrame({'x_coordinate': [0.5, 1.5, 5.5], 'y_coordinate': [0.5, 0.5, 0.5],
+        ...                        '2019': [10., 30., 5.]})
+        >>> aggregate_demand(demand, [0, 0, 1], ['2019'])
+           x_coordinate  y_coordinate  2019  size
+        0          1.25           0.5  40.0     2
+        1          5.50           0.5   5.0     1
+    """
+    years = [str(year) for year in years]
+    labels = np.asarray(labels, dtype=np.int64)
+    num_clusters = labels.max(initial=-1) + 1
+    points = coordinates(demand)
+    demands = demand_values(demand, years)
+    weights = demands.sum(axis=1)
+    size = np.bincount(labels, minlength=num_clusters)
+    total = np.bincount(labels, weights, minlength=num_clusters)
+    # clusters without demand sit at the plain mean of their points
+    has_demand = total > 0
+    centroid = np.empty((num_clusters, 2))
+    for axis in range(2):
+        weighted = np.bincount(labels, weights * points[:, axis], minlength=num_clusters)
+        plain = np.bincount(labels, points[:, axis], minlength=num_clusters)
+        centroid[:, axis] = np.where(has_demand, weighted / np.where(has_demand, total, 1.0), plain / size)
+    frame = pd.DataFrame({'x_coordinate': centroid[:, 0], 'y_coordinate': centroid[:, 1]})
+    for index, year in enumerate(years):
+        frame[year] = np.bincount(labels, demands[:, index], minlength=num_clusters)
+    frame['size'] = size
+    return frame
+
+
+@dataclass
+class AggregationResult:
+    # solutions of the original demand points per year, with the plans of the reduced model
+    solutions: Dict[str, PlacementSolution]
+    # solutions of the reduced model per year
+    reduced: Dict[str, PlacementSolution]
+    # cluster of every original demand point
+    labels: np.ndarray
+    num_customers: int
+    num_clusters: int
+    # seconds spent on clustering, the reduced solve and the disaggregation
+    aggregation_time: float
+    solve_time: float
+    disaggregation_time: float
+
+    @property
+    def objective(self) -> float:
+        return float(sum(solution.objective for solution in self.solutions.values()))
+
+    @property
+    def reduced_objective(self) -> float:
+        return float(sum(solution.objective for solution in self.reduced.values()))
+
+    @property
+    def error(self) -> float:
+        """
+        Objective of the disaggregated plan minus the objective of the reduced model.
+        """
+        return self.objective - self.reduced_objective
+
+    @property
+    def relative_error(self) -> float:
+        return self.error / max(abs(self.objective), 1e-9)
+
+    @property
+    def reduction(self) -> float:
+        """
+        Factor by which the number of demand points, and so of assignment variables, shrank.
+        """
+        return self.num_customers / max(self.num_clusters, 1)
+
+    def summary(self) -> Dict[str, Union[str, float]]:
+        return {'customers': self.num_customers, 'clusters': self.num_clusters, 'reduction': self.reduction,
+                'status': ','.join(solution.status for solution in self.solutions.values()),
+                'objective': self.objective, 'reduced_objective': self.reduced_objective,
+                'error': self.error, 'relative_error': self.relative_error,
+                'seconds': self.aggregation_time + self.solve_time + self.disaggregation_time}
+
+
+def solve_aggregated(model: ChargerPlacementModel, method: str = 'grid', cell_size: float = 2.0,
+                     clusters: Optional[int] = None, seed: int = 0, k: Optional[int] = None,
+                     **solve_kwargs) -> AggregationResult:
+    """
+    Solve the placement model on aggregated demand and disaggregate the plan to the original demand points.
+
+    Args:
+        model: a `ChargerPlacementModel` or `MultiYearPlacementModel` of the original demand points; the
+            disaggregated assignment uses its candidate arcs
+        method: `grid` for blocks of `cell_size` x `cell_size`, `kmeans` for demand weighted clusters
+        cell_size: edge length of the grid blocks, e.g. 4 merges 16 cells of the 64x64 grid
+        clusters: number of clusters of `kmeans`
+        seed: seed of `kmeans`
+        k: candidate parking slots per super-node of the reduced model, all by default
+        solve_kwargs: passed to `solve_years` of the reduced model, e.g. the backend and a time limit
+
+    Examples:
+        >>> x, y = np.meshgrid(np.arange(8) + 0.5, np.arange(8) + 0.5)
+        >>> demand = pd.DataFrame({'x_coordinate': x.ravel(), 'y_coordinate': y.ravel(), '2019': 10.})
+        >>> supply = pd.DataFrame({'x_coordinate': [2., 6.], 'y_coordinate': [4., 4.],
+        ...                        'total_parking_slots': [3, 3],
+        ...                        'existing_num_SCS': [0, 0], 'existing_num_FCS': [0, 0]})
+        >>> result = solve_aggregated(ChargerPlacementModel(supply, demand, 2019), cell_size=4)
+        >>> result.num_clusters, result.reduction, result.solutions['2019'].status
+        (4, 16.0, 'FEASIBLE')
+        >>> bool(abs(result.relative_error) < 0.1)
+        True
+    """
+    start = time.perf_counter()
+    customers = coordinates(model.demand)
+    if method == 'grid':
+        labels = grid_clusters(customers, cell_size)
+    elif method == 'kmeans':
+        if clusters is None:
+            raise ValueError('kmeans aggregation needs the number of clusters')
+        labels = kmeans_clusters(customers, demand_values(model.demand, model.years).sum(axis=1),
+                                 clusters, seed=seed)
+    else:
+        raise ValueError(f'unknown aggregation method {method!r}, use grid or kmeans')
+    aggregated = aggregate_demand(model.demand, labels, model.years)
+    parameters: Dict[str, Any] = dict(slow_charger=model.slow_charger, fast_charger=model.fast_charger,
+                                      slow_costs=model.slow_costs, fast_costs=model.fast_costs, tighten=model.tighten)
+    if k is not None:
+        parameters['candidates'] = nearest_candidates(coordinates(aggregated), coordinates(model.supply), k=k)
+    reduced_model: ChargerPlacementModel
+    if isinstance(model, MultiYearPlacementModel):
+        reduced_model = MultiYearPlacementModel(model.supply, aggregated, model.years, **parameters)
+    else:
+        reduced_model = ChargerPlacementModel(model.supply, aggregated, model.year, **parameters)
+    aggregation_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    reduced = reduced_model.solve_years(**solve_kwargs)
+    solve_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    solutions = {}
+    for year, solution in reduced.items():
+        if solution.has_solution:
+            solutions[year] = model.reassign(solution.slow, solution.fast, year)
+        else:
+            solutions[year] = solution
+    return AggregationResult(solutions=solutions, reduced=reduced, labels=labels, num_customers=len(customers),
+                             num_clusters=len(aggregated), aggregation_time=aggregation_time, solve_time=solve_time,
+                             disaggregation_time=time.perf_counter() - start)
@@ -0,0 +1,330 @@
+"""
+Solver backends with parameter presets.
+
+A `Backend` is an OR-Tools solver plus the settings that matter when comparing solvers or bounding the
+latency of a solve: number of threads, time limit, relative and absolute MIP gap, node limit and whether
+presolve runs. The settings are translated to the parameter string of each solver, so the models only pass
+a backend (or the name of a preset in `BACKENDS`) around:
+
+- `scip`, `highs` and `cp-sat` are solved through `ModelSolverHelper`
+- `cbc` is not available in `ModelSolverHelper` and solved through `pywraplp` instead
+- `glop-rounding` solves the LP relaxation with GLOP; the models round it to an integer solution, see
+  `ChargerPlacementModel.solve` and `FacilityLocationModel.solve`
+
+CP-SAT only solves integer programs, continuous variables like the assignment are scaled to integers, so
+its objective is accurate to about `1e-3` per unit of flow.
+
+With a time limit a solve ends with the best solution found so far (status `FEASIBLE`). To follow a long
+solve, pass a callback to `solve`: it gets an `Incumbent` for every improved solution while the solver
+runs. OR-Tools has no incumbent callbacks for these solvers in Python, so the improvements are read from
+the solver log, which is captured from the standard output during the solve.
+
+HiGHS returns no solution at all when it stops at the time or node limit (in OR-Tools 9.15), use SCIP, CBC
+or CP-SAT if a solve has to end at a deadline.
+"""
+import dataclasses
+import logging
+import re
+import time
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+import ortools.linear_solver.pywraplp as pywraplp
+from ortools.linear_solver.python import model_builder_helper as mbh
+
+from shellhackathon.models.sparse import has_solution, solve_model, to_pywraplp, variable_values
+
+
+@dataclass(frozen=True)
+class Backend:
+    """
+    A solver and its parameters.
+
+    Args:
+        name: name of the preset
+        solver: OR-Tools solver name, e.g. `scip`, `highs`, `sat`, `cbc` or `glop`
+        threads: number of threads
+        time_limit: in seconds, `None` for no limit
+        relative_gap: stop at this relative gap between objective and bound, `None` for the solver default
+        absolute_gap: stop at this absolute gap between objective and bound
+        node_limit: stop after this many branch-and-bound nodes
+        presolve: whether the solver presolves the model
+        relaxation: solve the LP relaxation and let the model round it
+        parameters: further solver specific parameters
+    """
+    name: str
+    solver: str
+    threads: int = 1
+    time_limit: Optional[float] = None
+    relative_gap: Optional[float] = 1e-4
+    absolute_gap: Optional[float] = None
+    node_limit: Optional[int] = None
+    presolve: bool = True
+    relaxation: bool = False
+    parameters: str = ''
+
+    def replace(self, **changes) -> 'Backend':
+        return dataclasses.replace(self, **changes)
+
+    def solver_parameters(self) -> str:
+        """
+        The settings as parameter string of the solver, `cbc` gets them as `MPSolverParameters` instead.
+
+        Raises a `ValueError` for settings the solver does not have, e.g. a node limit for CP-SAT.
+
+        Examples:
+            >>> print(BACKENDS['scip'].replace(threads=4, node_limit=1000).solver_parameters())
+            parallel/maxnthreads = 4
+            limits/gap = 0.0001
+            limits/nodes = 1000
+            >>> BACKENDS['highs'].replace(presolve=False, relative_gap=None).solver_parameters()
+            'threads=1\\npresolve=off'
+        """
+        templates = TEMPLATES.get(self.solver, {})
+        settings = {'relative_gap': self.relative_gap, 'absolute_gap': self.absolute_gap,
+                    'node_limit': self.node_limit, 'presolve': None if self.presolve else 'off'}
+        unsupported = [key for key, value in settings.items() if value is not None and key not in templates]
+        if self.solver in PYWRAPLP_SOLVERS:
+            unsupported = [key for key in unsupported if key not in ('relative_gap', 'presolve')]
+        if unsupported:
+            raise ValueError(f'{self.name} does not support the settings {unsupported}')
+
+        parameters = [templates['threads'].format(self.threads)] if 'threads' in templates else []
+        parameters += [templates[key].format(value) for key, value in settings.items()
+                       if value is not None and key in templates]
+        if self.parameters:
+            parameters.append(self.parameters)
+        return templates.get('separator', '\n').join(parameters)
+
+
+# solver specific parameter templates, `presolve` is the one switching presolve off
+TEMPLATES = {
+    'scip': {'threads': 'parallel/maxnthreads = {}', 'relative_gap': 'limits/gap = {}',
+             'absolute_gap': 'limits/absgap = {}', 'node_limit': 'limits/nodes = {}',
+             'presolve': 'presolving/maxrounds = 0', 'separator': '\n'},
+    'highs': {'threads': 'threads={}', 'relative_gap': 'mip_rel_gap={}', 'absolute_gap': 'mip_abs_gap={}',
+              'node_limit': 'mip_max_nodes={}', 'presolve': 'presolve=off', 'separator': '\n'},
+    'sat': {'threads': 'num_workers:{}', 'relative_gap': 'relative_gap_limit:{}',
+            'absolute_gap': 'absolute_gap_limit:{}', 'presolve': 'cp_model_presolve:false', 'separator': ' '},
+    'glop': {'presolve': 'use_preprocessing:false', 'separator': ' '},
+}
+
+# the same relative gap for all MIP solvers, their defaults differ (SCIP and CP-SAT solve to optimality)
+BACKENDS = {
+    'scip': Backend('scip', 'scip'),
+    'highs': Backend('highs', 'highs'),
+    'cbc': Backend('cbc', 'cbc'),
+    # CP-SAT is a portfolio solver, it needs several workers to be competitive
+    'cp-sat': Backend('cp-sat', 'sat', threads=8, parameters='mip_var_scaling:1000 mip_wanted_precision:1e-3'),
+    'glop-rounding': Backend('glop-rounding', 'glop', relative_gap=None, relaxation=True),
+}
+ALIASES = {'sat': 'cp-sat'}
+# solvers missing in `ModelSolverHelper`
+PYWRAPLP_SOLVERS = ('cbc',)
+
+STATUS = {pywraplp.Solver.OPTIMAL: mbh.SolveStatus.OPTIMAL, pywraplp.Solver.FEASIBLE: mbh.SolveStatus.FEASIBLE,
+          pywraplp.Solver.INFEASIBLE: mbh.SolveStatus.INFEASIBLE,
+          pywraplp.Solver.UNBOUNDED: mbh.SolveStatus.UNBOUNDED, pywraplp.Solver.ABNORMAL: mbh.SolveStatus.ABNORMAL,
+          pywraplp.Solver.MODEL_INVALID: mbh.SolveStatus.MODEL_INVALID,
+          pywraplp.Solver.NOT_SOLVED: mbh.SolveStatus.NOT_SOLVED}
+
+
+def get_backend(backend: Union[str, Backend], time_limit: Optional[float] = None, parameters: str = '',
+                **changes) -> Backend:
+    """
+    A backend by preset name, or a plain solver for names without preset, with some settings changed.
+
+    Args:
+        backend: a `Backend`, the name of a preset in `BACKENDS` or any OR-Tools solver name
+        time_limit: overrides the time limit of the backend if given
+        parameters: solver specific parameters appended to the ones of the backend
+        changes: other settings to change, e.g. `threads`
+
+    Examples:
+        >>> get_backend('cp-sat', time_limit=10).time_limit
+        10
+        >>> get_backend('pdlp')
+        Backend(name='pdlp', solver='pdlp', threads=1, time_limit=None, relative_gap=None, absolute_gap=None, \
+node_limit=None, presolve=True, relaxation=False, parameters='')
+    """
+    if isinstance(backend, str):
+        name = ALIASES.get(backend, backend)
+        backend = BACKENDS.get(name) or Backend(name, name, relative_gap=None)
+    if time_limit is not None:
+        changes['time_limit'] = time_limit
+    if parameters:
+        separator = TEMPLATES.get(backend.solver, {}).get('separator', '\n')
+        changes['parameters'] = separator.join(filter(None, [backend.parameters, parameters]))
+    return backend.replace(**changes) if changes else backend
+
+
+@dataclass
+class Incumbent:
+    objective: float
+    bound: float
+    # seconds since the start of the solve
+    elapsed: float
+    solver: str = ''
+
+    @property
+    def gap(self) -> float:
+        return abs(self.objective - self.bound) / max(abs(self.objective), 1e-9)
+
+
+# log lines of the solvers reporting a new solution, with the objective and bound
+INCUMBENT_LINES = {
+    # the rows of the progress table, a new solution is marked by the heuristic that found it
+    'scip': re.compile(r'^\s*\S?\s*[\d.]+s\|.*\|\s*(?P<bound>[-+\d.e]+)\s*\|\s*(?P<objective>[-+\d.e]+)\s*\|'),
+    'highs': re.compile(r'^\s*[A-Za-z]?\s+\d+\s+\d+\s+\d+\s+[\d.]+%\s+(?P<bound>\S+)\s+(?P<objective>\S+)\s'),
+    'sat': re.compile(r'^#\d+\s+[\d.]+s best:(?P<objective>\S+)\s+next:\[(?P<bound>[^,\]]+)'),
+}
+
+
+class IncumbentParser:
+    """
+    Turn the log lines of a solver into an `Incumbent` for every improved solution.
+
+    Examples:
+        >>> incumbents = []
+        >>> parser = IncumbentParser('sat', incumbents.append)
+        >>> parser('#Bound   0.44s best:inf   next:[1634161.84,5932660.67] max_lp')
+        >>> parser('#1       0.85s best:1993524.96 next:[1634161.9,1993524.96] no_lp')
+        >>> incumbents[0].objective, incumbents[0].bound, round(incumbents[0].gap, 3)
+        (1993524.96, 1634161.9, 0.18)
+    """
+
+    def __init__(self, solver: str, callback: Callable[[Incumbent], None], start: Optional[float] = None):
+        self.solver = solver
+        self.pattern = INCUMBENT_LINES.get(solver)
+        self.callback = callback
+        self.start = time.perf_counter() if start is None else start
+        self.best = np.inf
+        self.bound = -np.inf
+
+    def report(self, objective: float, bound: float, final: bool = False):
+        """
+        Pass on an improved solution; the final solution is also passed on if only its bound improved.
+        """
+        if objective < self.best or (final and bound > self.bound):
+            self.best, self.bound = min(objective, self.best), bound
+            self.callback(Incumbent(objective, bound, time.perf_counter() - self.start, self.solver))
+
+    def __call__(self, line: str):
+        match = self.pattern.match(line) if self.pattern else None
+        if match is None:
+            return
+        try:
+            objective, bound = float(match['objective']), float(match['bound'])
+        except ValueError:  # e.g. `--` before the first solution
+            return
+        if np.isfinite(objective):
+            self.report(objective, bound)
+
+
+def log_incumbents(logger: logging.Logger, level: int = logging.INFO) -> Callable[[Incumbent], None]:
+    """
+    Incumbent callback writing every improved solution to a logger.
+    """
+    def callback(incumbent: Incumbent):
+        logger.log(level, f'{incumbent.solver} {incumbent.elapsed:.2f}s objective {incumbent.objective:.2f} '
+                          f'bound {incumbent.bound:.2f} gap {incumbent.gap:.4%}')
+    return callback
+
+
+class IncumbentTrace:
+    """
+    Incumbent callback collecting the improved solutions, e.g. for a metrics table.
+    """
+
+    def __init__(self):
+        self.incumbents: List[Incumbent] = []
+
+    def __call__(self, incumbent: Incumbent):
+        self.incumbents.append(incumbent)
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame([dict(dataclasses.asdict(incumbent), gap=incumbent.gap)
+                             for incumbent in self.incumbents],
+                            columns=['solver', 'elapsed', 'objective', 'bound', 'gap'])
+
+
+class PywraplpResult:
+    """
+    A solved `pywraplp.Solver` with the accessors of `ModelSolverHelper` used by the models.
+    """
+
+    def __init__(self, solver: pywraplp.Solver, status: int, wall_time: float):
+        self.solver = solver
+        self._status = STATUS.get(status, mbh.SolveStatus.ABNORMAL)
+        self._wall_time = wall_time
+
+    def status(self) -> mbh.SolveStatus:
+        return self._status
+
+    def objective_value(self) -> float:
+        return self.solver.Objective().Value()
+
+    def best_objective_bound(self) -> float:
+        return self.solver.Objective().BestBound()
+
+    def wall_time(self) -> float:
+        return self._wall_time
+
+    def variable_values(self) -> np.ndarray:
+        return variable_values(self.solver)
+
+
+def solve(model: mbh.ModelBuilderHelper, backend: Union[str, Backend] = 'scip',
+          callback: Optional[Callable[[Incumbent], None]] = None):
+    """
+    Solve a bulk built model with a backend.
+
+    Args:
+        model: the model
+        backend: a `Backend` or its name, see `get_backend`
+        callback: called with an `Incumbent` for every improved solution while the solver runs (read from
+            the logs of SCIP, HiGHS and CP-SAT), and for the final solution and bound
+
+    Returns a `ModelSolverHelper`, or a `PywraplpResult` with the same accessors for `cbc`.
+
+    Examples:
+        >>> import scipy.sparse as sp
+        >>> from shellhackathon.models.sparse import build_model
+        >>> model = build_model([0, 0], [10, 10], [3, 3], [7], [np.inf], sp.csr_matrix([[2., 3.]]), integer=[0, 1])
+        >>> [(name, solve(model, name).objective_value()) for name in ('scip', 'highs', 'cbc', 'cp-sat')]
+        [('scip', 9.0), ('highs', 9.0), ('cbc', 9.0), ('cp-sat', 9.0)]
+        >>> solve(model, 'glop-rounding').objective_value()  # the relaxation, the models round it
+        7.0
+    """
+    backend = get_backend(backend)
+    solver_parameters = backend.solver_parameters()
+    parser = IncumbentParser(backend.solver, callback) if callback is not None else None
+    solver: Union[mbh.ModelSolverHelper, PywraplpResult]
+    if backend.solver not in PYWRAPLP_SOLVERS:
+        solver = solve_model(model, backend.solver, time_limit=backend.time_limit, parameters=solver_parameters,
+                             log_callback=parser if parser and parser.pattern else None)
+    else:
+        solver = _solve_pywraplp(model, backend, solver_parameters)
+    # the relaxation is no solution, the models report the rounded one
+    if parser is not None and has_solution(solver) and not backend.relaxation:
+        parser.report(solver.objective_value(), solver.best_objective_bound(), final=True)
+    return solver
+
+
+def _solve_pywraplp(model: mbh.ModelBuilderHelper, backend: Backend, solver_parameters: str) -> PywraplpResult:
+    solver = to_pywraplp(model, backend.solver)
+    solver.SetNumThreads(backend.threads)
+    if backend.time_limit is not None:
+        solver.SetTimeLimit(int(backend.time_limit * 1000))
+    if solver_parameters:
+        solver.SetSolverSpecificParametersAsString(solver_parameters)
+    parameters = pywraplp.MPSolverParameters()
+    if backend.relative_gap is not None:
+        parameters.SetDoubleParam(parameters.RELATIVE_MIP_GAP, backend.relative_gap)
+    parameters.SetIntegerParam(parameters.PRESOLVE, parameters.PRESOLVE_ON if backend.presolve
+                               else parameters.PRESOLVE_OFF)
+    start = time.perf_counter()
+    status = solver.Solve(parameters)
+    return PywraplpResult(solver, status, time.perf_counter() - start)
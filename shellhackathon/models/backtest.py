@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+Rolling-origin backtests of demand forecasters.
+
+For every origin year `t` and estimator the lag window forecaster of `train_model` is fitted on the history
+through `t` and forecasts `t + 1`, ..., `t + horizon`, which are compared with the actual demand. This is
+the situation of the hackathon (forecast 2019 and 2020 from the history through 2018), unlike the random
+split of the demand points of one year in the notebooks, which evaluates only one year ahead and lets the
+model see the neighbours and the future of every test point.
+
+All (estimator, origin) pairs run in a process pool. The history is written once to a `.npy` file that every
+worker memory-maps, so it is neither pickled per task nor copied per worker. The lag windows are not views of
+it: `lag_windows` stacks them with a reshape, which copies them, so every fit holds the windows of its own
+origin in memory while it runs.
+"""
+# system imports
+import logging
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+# third-party
+import click
+import click_log
+import numpy as np
+import pandas as pd
+
+# project imports
+from shellhackathon.models.train_model import DemandForecaster, forecast_errors, history_matrix, history_years
+
+
+##############################################################################
+logger = logging.getLogger(__name__)
+click_log.basic_config(logger)
+
+ESTIMATORS = ['extra_trees', 'random_forest', 'gradient_boosting', 'linear', 'mean_growth']
+
+
+##############################################################################
+def make_estimator(name: str, random_state: int = 0):
+    """
+    Estimator of the forecaster by name; `mean_growth` forecasts the mean relative growth of the training
+    windows, a baseline.
+    """
+    from sklearn.dummy import DummyRegressor
+    from sklearn.ensemble import ExtraTreesRegressor, HistGradientBoostingRegressor, RandomForestRegressor
+    from sklearn.linear_model import LinearRegression
+    estimators = {
+        'extra_trees': lambda: ExtraTreesRegressor(n_estimators=100, min_samples_leaf=5, random_state=random_state),
+        'random_forest': lambda: RandomForestRegressor(n_estimators=100, min_samples_leaf=5,
+                                                       random_state=random_state),
+        'gradient_boosting': lambda: HistGradientBoostingRegressor(random_state=random_state),
+        'linear': LinearRegression,
+        'mean_growth': DummyRegressor,
+    }
+    if name not in estimators:
+        raise ValueError(f'unknown estimator {name}, use one of {", ".join(estimators)}')
+    return estimators[name]()
+
+
+def rolling_origins(num_years: int, window: int, horizon: int) -> List[int]:
+    """
+    Indices of the last training year of every origin: the history through an origin must hold one lag
+    window, and at least one year must follow it.
+
+    Examples:
+        >>> rolling_origins(9, window=2, horizon=2)
+        [3, 4, 5, 6, 7]
+    """
+    return list(range(window + horizon - 1, num_years - 1))
+
+
+##############################################################################
+# data of the worker processes, sent once when the pool starts
+_worker_data: Dict = {}
+
+
+def _init_worker(history_path, years, window, horizon, n_jobs):
+    _worker_data.update(history=np.load(history_path, mmap_mode='r'), years=years, window=window, horizon=horizon,
+                        n_jobs=n_jobs)
+
+
+def run_origin(estimator: str, origin: int) -> List[Dict]:
+    """
+    Fit one estimator on the history through the year `origin` and evaluate its forecast, in a worker.
+    """
+    history, years = _worker_data['history'], _worker_data['years']
+    forecaster = DemandForecaster(make_estimator(estimator), window=_worker_data['window'],
+                                  horizon=_worker_data['horizon'], n_jobs=_worker_data['n_jobs'])
+    start = time.perf_counter()
+    forecast = forecaster.fit(history[:, :origin + 1]).predict(history[:, :origin + 1])
+    seconds = time.perf_counter() - start
+    rows = []
+    for step in range(1, min(forecaster.horizon, len(years) - 1 - origin) + 1):
+        rows.append(dict(estimator=estimator, origin=years[origin], year=years[origin + step], step=step,
+                         seconds=seconds, **forecast_errors(history[:, origin + step], forecast[:, step - 1])))
+    return rows
+
+
+def run_backtest(history, estimators: Sequence[str] = ESTIMATORS, years=None, window: int = 2, horizon: int = 2,
+                 workers: int = 0, n_jobs: Optional[int] = 1) -> pd.DataFrame:
+    """
+    Rolling-origin backtest of forecasters with the given estimators.
+
+    Args:
+        history: demand table, `DemandStore` or (points, years) array of the demand history
+        estimators: names of the estimators, see `make_estimator`
+        years: years of the history, all by default
+        window, horizon: of the forecasters, see `DemandForecaster`
+        workers: number of processes, 0 runs in this process
+        n_jobs: jobs of every fit, so that `workers * n_jobs` matches the cores
+
+    Returns one row per estimator, origin and forecast step with the MAE and MAPE and the fit and predict
+    seconds.
+    """
+    if years is None:
+        years = history_years(history) if not isinstance(history, np.ndarray) else list(range(history.shape[1]))
+    years = [str(year) for year in years]
+    matrix = history_matrix(history, years if not isinstance(history, np.ndarray) else None)
+    tasks = [(estimator, origin) for estimator in estimators
+             for origin in rolling_origins(len(years), window, horizon)]
+    logger.info(f'{len(tasks)} fits of {len(estimators)} estimators')
+
+    rows = []
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / 'history.npy'
+        np.save(path, np.ascontiguousarray(matrix, dtype=np.float64))
+        initargs = (path, years, window, horizon, n_jobs)
+        if workers:
+            with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=initargs) as executor:
+                for future in as_completed([executor.submit(run_origin, *task) for task in tasks]):
+                    rows.extend(future.result())
+        else:
+            _init_worker(*initargs)
+            for task in tasks:
+                rows.extend(run_origin(*task))
+            _worker_data.clear()
+    return pd.DataFrame(rows).sort_values(['estimator', 'origin', 'step'], ignore_index=True)
+
+
+def summarize(results: pd.DataFrame) -> pd.DataFrame:
+    """
+    Mean errors and seconds per estimator and forecast step, the best MAE of the last step first.
+    """
+    summary = results.groupby(['estimator', 'step'])[['mae', 'mape', 'seconds']].mean().unstack('step')
+    summary.columns = [f'{name}_{step}' for name, step in summary.columns]
+    return summary.sort_values(f'mae_{results["step"].max()}')
+
+
+##############################################################################
+@click.command()
+@click_log.simple_verbosity_option(logger)
+@click.argument('input_filepath', type=click.Path(exists=True))
+@click.option('--estimator', 'estimators', multiple=True, default=ESTIMATORS, type=click.Choice(ESTIMATORS))
+@click.option('--window', default=2, help='past years used as features')
+@click.option('--horizon', default=2, help='future years forecast from every origin')
+@click.option('--workers', default=4)
+@click.option('--n-jobs', default=1, help='jobs of every fit')
+@click.option('--output', type=click.Path(), help='write all results to this Parquet file')
+def main(input_filepath, estimators, window, horizon, workers, n_jobs, output):
+    """
+    Rolling-origin backtest of the demand history in INPUT_FILEPATH.
+    """
+    from shellhackathon.data.make_dataset import load_frame
+    results = run_backtest(load_frame(input_filepath), estimators, window=window, horizon=horizon,
+                           workers=workers, n_jobs=n_jobs)
+    if output:
+        results.to_parquet(output, index=False)
+    click.echo(summarize(results).to_string())
+
+
+if __name__ == '__main__':
+    main()
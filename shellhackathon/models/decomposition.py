@@ -0,0 +1,234 @@
+"""
+Benders decomposition of the charger placement MIP.
+
+The capacity constraint `sum_i assign[i, j] <= slow_charger * slow[j] + fast_charger * fast[j]` is the only
+link between the build decisions and the assignment variables. The master problem only contains the
+integer charger counts and one variable `theta[s]` per subproblem estimating its transportation costs.
+Every subproblem is the transportation LP for the capacities of the current master solution; its
+capacity duals `v` give the optimality cut
+
+    theta[s] >= Q_s(K') + sum_j v_j (K_j - K'_j)
+
+where `K` are the capacities of the chargers. The master objective is a valid lower bound and every plan
+that serves all demand an upper bound, so the solver can stop early with a guaranteed gap.
+
+Subproblems are independent (e.g. one per demand scenario) and are solved in a process pool.
+"""
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import scipy.sparse as sp
+
+from shellhackathon.models.placement import ChargerPlacementModel
+from shellhackathon.models.solution import PlacementSolution
+from shellhackathon.models.sparse import build_model, has_solution, solve_model
+from shellhackathon.models.transportation import TransportationResult, solve_transportation_lp
+
+# subproblem data of the worker processes, sent once when the pool starts
+_worker_data: Dict = {}
+
+
+def _init_worker(arcs, demands, penalty):
+    _worker_data['arcs'] = arcs
+    _worker_data['demands'] = demands
+    _worker_data['penalty'] = penalty
+
+
+def _solve_subproblem(scenario: int, capacities: np.ndarray) -> TransportationResult:
+    return solve_transportation_lp(_worker_data['demands'][scenario], capacities, _worker_data['arcs'],
+                                   penalty=_worker_data['penalty'])
+
+
+@dataclass
+class BendersProgress:
+    iteration: int
+    elapsed: float
+    lower_bound: float
+    upper_bound: float
+
+    @property
+    def gap(self) -> float:
+        return (self.upper_bound - self.lower_bound) / max(abs(self.upper_bound), 1e-9)
+
+
+class BendersSolver:
+    """
+    Benders decomposition for a `ChargerPlacementModel`.
+
+    Args:
+        model: the placement model; the subproblems use its candidate arcs, the bounds are valid for them
+        demands: optional demand scenarios of shape (num_scenarios, num_customers) sharing one build plan,
+            the demand of the model year by default
+        weights: probability of every scenario, uniform by default
+        gap: stop when the relative gap between the bounds is below this value
+        time_limit: in seconds
+        max_iterations: maximal number of master solves
+        workers: number of processes for the subproblems, 0 solves them in this process; a single
+            subproblem (no `demands`) is always solved in this process
+        callback: called with `BendersProgress` after every iteration, return `True` to stop
+        penalty: costs of unmet demand in the subproblems, 10 times the largest arc costs by default.
+            The bounds stay valid for any penalty, very large ones make GLOP fail on large instances.
+
+    With `demands` the bounds are the ones of the expected costs over the scenarios, which `solve` leaves in
+    `lower_bound` and `upper_bound`; the solution is the plan assigned to the demand of the model year.
+
+    Examples:
+        >>> import pandas as pd
+        >>> supply = pd.DataFrame({'x_coordinate': [0., 10.], 'y_coordinate': [0., 0.],
+        ...                        'total_parking_slots': [2, 2],
+        ...                        'existing_num_SCS': [1, 0], 'existing_num_FCS': [0, 0]})
+        >>> demand = pd.DataFrame({'x_coordinate': [1., 9.], 'y_coordinate': [0., 0.],
+        ...                        '2019': [150., 300.]})
+        >>> solution = BendersSolver(ChargerPlacementModel(supply, demand, 2019)).solve()
+        >>> solution.status, solution.objective, solution.best_bound, solution.slow, solution.fast
+        ('OPTIMAL', 1950.0, 1950.0, array([1., 0.]), array([0., 1.]))
+    """
+
+    def __init__(self, model: ChargerPlacementModel, demands=None, weights=None, gap: float = 1e-4,
+                 time_limit: float = 600.0, max_iterations: int = 100, workers: int = 0,
+                 callback: Optional[Callable[[BendersProgress], Optional[bool]]] = None,
+                 penalty: Optional[float] = None):
+        if len(model.years) > 1:
+            raise ValueError('decomposition is only implemented for single year models')
+        self.model = model
+        self.demands = np.atleast_2d(model.demands if demands is None else np.asarray(demands, dtype=np.float64))
+        num_scenarios = len(self.demands)
+        self.weights = (np.full(num_scenarios, 1 / num_scenarios) if weights is None
+                        else np.asarray(weights, dtype=np.float64))
+        self.gap = gap
+        self.time_limit = time_limit
+        self.max_iterations = max_iterations
+        self.workers = workers
+        self.callback = callback
+        self.penalty = 10 * (model.arcs.cost.max(initial=0) + 1) if penalty is None else penalty
+        # cuts theta[s] >= constant + coefficients @ capacities
+        self.scenarios = demands is not None
+        self.cuts: List[tuple] = []
+        self.history: List[BendersProgress] = []
+        self.lower_bound, self.upper_bound = -np.inf, np.inf
+
+    def _master(self, time_limit: Optional[float]):
+        """
+        Solve the master problem over `[slow, fast, theta]` with all cuts found so far.
+        """
+        model = self.model
+        num_facilities, num_scenarios = model.num_facilities, len(self.demands)
+        facilities = np.arange(num_facilities)
+        slow, fast = facilities, num_facilities + facilities
+        num_variables = 2 * num_facilities + num_scenarios
+
+        # slots, and enough capacity for the total demand of every scenario
+        rows = [np.concatenate([facilities, facilities])]
+        cols = [np.concatenate([slow, fast])]
+        vals = [np.ones(2 * num_facilities)]
+        row_lower = [np.full(num_facilities, -np.inf)]
+        row_upper = [model.slots]
+        row = num_facilities
+        for demands in self.demands:
+            rows.append(np.full(2 * num_facilities, row))
+            cols.append(np.concatenate([slow, fast]))
+            vals.append(np.concatenate([np.full(num_facilities, model.slow_charger),
+                                        np.full(num_facilities, model.fast_charger)]))
+            row_lower.append(np.array([demands.sum()]))
+            row_upper.append(np.array([np.inf]))
+            row += 1
+        # theta[s] - v @ (slow_charger * slow + fast_charger * fast) >= constant
+        for scenario, constant, coefficients in self.cuts:
+            rows.append(np.full(2 * num_facilities + 1, row))
+            cols.append(np.concatenate([slow, fast, [2 * num_facilities + scenario]]))
+            vals.append(np.concatenate([-coefficients * model.slow_charger, -coefficients * model.fast_charger,
+                                        [1.0]]))
+            row_lower.append(np.array([constant]))
+            row_upper.append(np.array([np.inf]))
+            row += 1
+
+        matrix = sp.csr_matrix((np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))),
+                               shape=(row, num_variables))
+        master = build_model(
+            lower=np.concatenate([model.existing_slow, model.existing_fast, np.zeros(num_scenarios)]),
+            upper=np.concatenate([model.slots, model.slots, np.full(num_scenarios, np.inf)]),
+            objective=np.concatenate([np.full(num_facilities, model.slow_costs),
+                                      np.full(num_facilities, model.fast_costs), self.weights]),
+            row_lower=np.concatenate(row_lower), row_upper=np.concatenate(row_upper),
+            matrix=matrix, integer=np.concatenate([slow, fast]), name='benders_master')
+        solver = solve_model(master, 'scip', time_limit=time_limit)
+        if not has_solution(solver):
+            raise RuntimeError(f'master problem could not be solved: {solver.status().name}')
+        values = np.round(solver.variable_values())
+        return values[slow], values[fast], solver.best_objective_bound()
+
+    def solve(self) -> PlacementSolution:
+        """
+        Iterate master and subproblems until the gap is closed or a limit is reached.
+
+        Returns the best plan found with the lower bound as `best_bound`; the status is `OPTIMAL` if the
+        gap was closed. With demand scenarios it returns `ChargerPlacementModel.reassign` of the plan, whose
+        objective and flow are the ones of the demand of the model year.
+        """
+        model = self.model
+        start = time.perf_counter()
+        lower_bound, upper_bound, best = -np.inf, np.inf, None
+        executor = None
+        if self.workers and len(self.demands) > 1:
+            executor = ProcessPoolExecutor(self.workers, initializer=_init_worker,
+                                           initargs=(model.arcs, self.demands, self.penalty))
+        else:
+            _init_worker(model.arcs, self.demands, self.penalty)
+
+        try:
+            for iteration in range(1, self.max_iterations + 1):
+                remaining = self.time_limit - (time.perf_counter() - start)
+                if remaining <= 0:
+                    break
+                slow, fast, master_bound = self._master(remaining)
+                lower_bound = max(lower_bound, master_bound)
+
+                capacities = slow * model.slow_charger + fast * model.fast_charger
+                scenarios = range(len(self.demands))
+                if executor is None:
+                    results = [_solve_subproblem(scenario, capacities) for scenario in scenarios]
+                else:
+                    results = list(executor.map(_solve_subproblem, scenarios, [capacities] * len(self.demands)))
+
+                for scenario, result in enumerate(results):
+                    self.cuts.append((scenario, result.objective - result.capacity_duals @ capacities,
+                                      result.capacity_duals))
+                if all(result.unmet.sum() <= 1e-9 for result in results):
+                    costs = float(slow.sum() * model.slow_costs + fast.sum() * model.fast_costs
+                                  + self.weights @ [result.objective for result in results])
+                    if costs < upper_bound:
+                        upper_bound, best = costs, (slow, fast, results[0].flow)
+
+                progress = BendersProgress(iteration, time.perf_counter() - start, lower_bound, upper_bound)
+                self.history.append(progress)
+                if self.callback is not None and self.callback(progress):
+                    break
+                if progress.gap <= self.gap:
+                    break
+        finally:
+            if executor is not None:
+                executor.shutdown()
+            _worker_data.clear()
+
+        self.lower_bound, self.upper_bound = lower_bound, upper_bound
+        if best is None:
+            raise RuntimeError('no plan serving all demand found')
+        slow, fast, flow = best
+        if self.scenarios:
+            solution = model.reassign(slow, fast)
+            solution.wall_time = time.perf_counter() - start
+            return solution
+        closed = (upper_bound - lower_bound) / max(abs(upper_bound), 1e-9) <= self.gap
+        return PlacementSolution(status='OPTIMAL' if closed else 'FEASIBLE', objective=float(upper_bound),
+                                 slow=slow, fast=fast, arcs=model.arcs, flow=flow, year=model.year,
+                                 best_bound=float(lower_bound), wall_time=time.perf_counter() - start)
+
+
+def solve_benders(model: ChargerPlacementModel, **kwargs) -> PlacementSolution:
+    """
+    Solve the placement model by Benders decomposition, see `BendersSolver`.
+    """
+    return BendersSolver(model, **kwargs).solve()
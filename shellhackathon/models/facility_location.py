@@ -0,0 +1,196 @@
+"""
+Facility location problem (FLP) with fixed candidate locations.
+
+This is the model of `reports/facility_location_report.py`, built in bulk like `ChargerPlacementModel`:
+
+- `open[j]` is 1 if facility `j` is opened, at `setup_costs[j]`
+- `assign[i, j] >= 0` is the demand of customer `i` served by facility `j`, at `costs[i, j]` per unit
+- demand: `sum_j assign[i, j] == demands[i]`
+- shipping: `assign[i, j] <= demands[i] * open[j]`
+- capacity, for the capacitated FLP only: `sum_i assign[i, j] <= capacities[j] * open[j]`
+
+With unit demands `assign` is the fraction of the demand of a customer served by a facility, as in the
+uncapacitated example of the report. The model is solved with the backends of
+`shellhackathon.models.backends`; the `glop-rounding` backend opens every facility used by the LP
+relaxation and assigns the demand to them as min-cost flow.
+"""
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional, Union
+
+import numpy as np
+import scipy.sparse as sp
+
+from shellhackathon.candidates import CandidateArcs
+from shellhackathon.distance import distance_matrix
+from shellhackathon.models.backends import Backend, Incumbent, get_backend, solve
+from shellhackathon.models.sparse import build_model, has_solution, variable_values
+from shellhackathon.models.transportation import solve_transportation
+
+
+@dataclass
+class FacilityLocationSolution:
+    status: str
+    objective: float
+    # whether each facility is opened
+    open: np.ndarray
+    # arcs of the model and the demand shipped along each of them
+    arcs: CandidateArcs
+    flow: np.ndarray
+    best_bound: float = np.nan
+    wall_time: float = np.nan
+
+    @property
+    def has_solution(self) -> bool:
+        return self.status in ('OPTIMAL', 'FEASIBLE')
+
+    @property
+    def opened(self) -> np.ndarray:
+        return np.flatnonzero(self.open)
+
+
+class FacilityLocationModel:
+    """
+    Capacitated or uncapacitated facility location MIP.
+
+    Variables are laid out as `[assign (one per arc), open (one per facility)]`, constraints as
+    `[demand, shipping (one per arc), capacity]`.
+
+    Args:
+        setup_costs: costs of opening each facility, or one value for all
+        costs: `CandidateArcs` or dense (customers, facilities) matrix of the costs per unit of demand
+        demands: demand per customer, 1 for all by default
+        capacities: capacity per facility, or one value for all; `None` for the uncapacitated FLP
+
+    Examples:
+        The capacitated example of the report:
+
+        >>> costs = np.array([[4, 6, 9], [5, 4, 7], [6, 3, 4], [8, 5, 3], [10, 8, 4]])
+        >>> model = FacilityLocationModel(1000, costs, demands=[80, 270, 250, 160, 180], capacities=500)
+        >>> solution = model.solve()
+        >>> solution.status, solution.objective, solution.opened
+        ('OPTIMAL', 5610.0, array([1, 2]))
+        >>> solution = model.solve('glop-rounding')
+        >>> solution.status, solution.objective, solution.opened
+        ('FEASIBLE', 5610.0, array([1, 2]))
+    """
+
+    def __init__(self, setup_costs, costs: Union[CandidateArcs, np.ndarray], demands=None, capacities=None):
+        if not isinstance(costs, CandidateArcs):
+            costs = CandidateArcs.dense(np.asarray(costs, dtype=np.float64))
+        self.arcs = costs
+        self.setup_costs = np.broadcast_to(np.asarray(setup_costs, dtype=np.float64), self.num_facilities).copy()
+        self.demands = np.ones(self.num_customers) if demands is None else np.asarray(demands, dtype=np.float64)
+        self.capacities = None if capacities is None else \
+            np.broadcast_to(np.asarray(capacities, dtype=np.float64), self.num_facilities).copy()
+
+    @classmethod
+    def from_coordinates(cls, customers, facilities, setup_costs, demands=None, capacities=None,
+                         cost_per_mile: float = 1.0) -> 'FacilityLocationModel':
+        """
+        Model with the euclidean distance times `cost_per_mile` as costs.
+
+        Examples:
+            The uncapacitated example of the report:
+
+            >>> customers = [(0, 1.5), (2.5, 1.2)]
+            >>> facilities = [(0, 0), (0, 1), (0, 2), (1, 0), (1, 1), (1, 2), (2, 0), (2, 1), (2, 2)]
+            >>> solution = FacilityLocationModel.from_coordinates(customers, facilities,
+            ...                                                   [3, 2, 3, 1, 3, 3, 4, 3, 2]).solve()
+            >>> solution.opened, round(solution.objective, 4)
+            (array([3]), 4.7237)
+        """
+        return cls(setup_costs, cost_per_mile * distance_matrix(customers, facilities), demands, capacities)
+
+    @property
+    def num_customers(self) -> int:
+        return self.arcs.num_customers
+
+    @property
+    def num_facilities(self) -> int:
+        return self.arcs.num_facilities
+
+    def build(self, relax: bool = False):
+        """
+        Emit the MIP, or its LP relaxation, as `ModelBuilderHelper`.
+        """
+        arcs = self.arcs
+        num_arcs, num_customers, num_facilities = len(arcs), self.num_customers, self.num_facilities
+        arc_index = np.arange(num_arcs)
+        open_index = num_arcs + np.arange(num_facilities)
+
+        # demand: sum_j assign[i, j] == demands[i]
+        rows = [arcs.customer]
+        cols = [arc_index]
+        vals = [np.ones(num_arcs)]
+        # shipping: assign[i, j] - demands[i] * open[j] <= 0
+        rows += [num_customers + arc_index, num_customers + arc_index]
+        cols += [arc_index, num_arcs + arcs.facility]
+        vals += [np.ones(num_arcs), -self.demands[arcs.customer]]
+        num_rows = num_customers + num_arcs
+        row_lower = [self.demands, np.full(num_arcs, -np.inf)]
+        row_upper = [self.demands, np.zeros(num_arcs)]
+        if self.capacities is not None:
+            # capacity: sum_i assign[i, j] - capacities[j] * open[j] <= 0
+            rows += [num_rows + arcs.facility, num_rows + np.arange(num_facilities)]
+            cols += [arc_index, open_index]
+            vals += [np.ones(num_arcs), -self.capacities]
+            num_rows += num_facilities
+            row_lower.append(np.full(num_facilities, -np.inf))
+            row_upper.append(np.zeros(num_facilities))
+
+        matrix = sp.csr_matrix((np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))),
+                               shape=(num_rows, num_arcs + num_facilities))
+        return build_model(lower=np.zeros(num_arcs + num_facilities),
+                           upper=np.concatenate([np.full(num_arcs, np.inf), np.ones(num_facilities)]),
+                           objective=np.concatenate([arcs.cost, self.setup_costs]),
+                           row_lower=np.concatenate(row_lower), row_upper=np.concatenate(row_upper),
+                           matrix=matrix, integer=None if relax else open_index, name='facility_location')
+
+    def assign(self, open) -> FacilityLocationSolution:
+        """
+        Optimal assignment of the demand to the opened facilities, solved as min-cost flow. Opened facilities
+        that serve no demand are closed again.
+        """
+        open = np.asarray(open, dtype=bool)
+        capacities = self.demands.sum() if self.capacities is None else self.capacities
+        result = solve_transportation(self.demands, np.where(open, capacities, 0.0), self.arcs)
+        feasible = result.unmet.sum() <= 1e-9
+        open = open & (np.bincount(self.arcs.facility, result.flow, minlength=self.num_facilities) > 0)
+        objective = float(result.flow @ self.arcs.cost + self.setup_costs[open].sum())
+        return FacilityLocationSolution(status='FEASIBLE' if feasible else 'INFEASIBLE',
+                                        objective=objective if feasible else np.nan, open=open,
+                                        arcs=self.arcs, flow=result.flow)
+
+    def solve(self, solver_name: Union[str, Backend] = 'scip', time_limit: Optional[float] = None,
+              parameters: str = '', callback: Optional[Callable[[Incumbent], None]] = None,
+              **settings) -> FacilityLocationSolution:
+        """
+        Build and solve the model.
+
+        Args:
+            solver_name: a backend like `scip`, `highs`, `cbc`, `cp-sat` or `glop-rounding` (see
+                `shellhackathon.models.backends`), or any other OR-Tools solver
+            time_limit: in seconds
+            parameters: solver specific parameters as string
+            callback, settings: see `ChargerPlacementModel.solve`
+        """
+        backend = get_backend(solver_name, time_limit=time_limit, parameters=parameters, **settings)
+        solver = solve(self.build(relax=backend.relaxation), backend, callback=callback)
+        if not has_solution(solver):
+            return FacilityLocationSolution(status=solver.status().name, objective=np.nan,
+                                            open=np.zeros(self.num_facilities, dtype=bool), arcs=self.arcs,
+                                            flow=np.full(len(self.arcs), np.nan), wall_time=solver.wall_time())
+
+        values = variable_values(solver)
+        num_arcs = len(self.arcs)
+        if backend.relaxation:
+            start = time.perf_counter()
+            solution = self.assign(values[num_arcs:] > 1e-6)
+            solution.best_bound = solver.objective_value()
+            solution.wall_time = solver.wall_time() + time.perf_counter() - start
+            return solution
+        return FacilityLocationSolution(status=solver.status().name,
+                                        objective=float(values @ np.concatenate([self.arcs.cost, self.setup_costs])),
+                                        open=values[num_arcs:] > 0.5, arcs=self.arcs, flow=values[:num_arcs],
+                                        best_bound=solver.best_objective_bound(), wall_time=solver.wall_time())
@@ -0,0 +1,303 @@
+"""
+Large neighbourhood search (LNS) for charger placement.
+
+For large instances the MIP is too slow. The LNS works on the charger counts per parking slot only; the
+assignment of every build plan is the optimal transportation for it, evaluated with a min-cost flow
+network that is built once (`MinCostFlowEvaluator`).
+
+Moves are evaluated incrementally: the destroy, repair and trim steps of an iteration only re-route the
+customers with an arc to a parking slot whose capacity changed (`MinCostFlowEvaluator.resolve`), the flow of
+all other customers is kept. That is a feasible assignment whose costs bound the optimal ones from above, so
+a move accepted on them is accepted on the exact costs as well; only accepted plans get a full flow solve,
+which keeps the exact assignment of the current plan. Rejected moves are never solved exactly, so a move that
+only pays off by re-routing far away customers can be missed.
+
+- construction: every demand point asks its nearest parking slot for capacity, which builds the cheapest
+  charger mix for it
+- destroy: reset the chargers of a few (nearby or random) parking slots to the existing ones
+- destroy: or remove single chargers, so their demand has to be served elsewhere
+- destroy: or add single chargers, so that demand can be served closer
+- repair: give unserved demand to the nearest parking slot that can still grow
+- trim: remove chargers whose capacity is not used and replace two slow by one fast charger
+"""
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from shellhackathon.candidates import nearest_candidates
+from shellhackathon.models.placement import ChargerPlacementModel
+from shellhackathon.models.solution import PlacementSolution
+from shellhackathon.models.transportation import MinCostFlowEvaluator, TransportationResult
+from shellhackathon.utils import FAST_CHARGER, FAST_COSTS, SLOW_CHARGER, SLOW_COSTS, coordinates
+
+
+@dataclass
+class LNSProgress:
+    iteration: int
+    elapsed: float
+    objective: float
+    best_objective: float
+    improved: bool
+
+
+def cheapest_mix(required, slow_min, fast_min, slots, slow_charger: float = SLOW_CHARGER,
+                 fast_charger: float = FAST_CHARGER, slow_costs: float = SLOW_COSTS, fast_costs: float = FAST_COSTS):
+    """
+    Cheapest number of slow and fast chargers per parking slot with at least the `required` capacity.
+
+    Counts never go below `slow_min`/`fast_min` and always fit in the `slots`. If the required capacity
+    cannot be reached, the parking slot is filled up with fast chargers.
+
+    Examples:
+        >>> cheapest_mix([150, 350, 500, 5000], [0, 0, 1, 0], [0, 0, 0, 0], [3, 3, 3, 3])
+        (array([1, 0, 1, 0]), array([0, 1, 1, 3]))
+    """
+    required = np.asarray(required, dtype=np.float64)
+    slow_min = np.asarray(slow_min, dtype=np.int64)
+    fast_min = np.asarray(fast_min, dtype=np.int64)
+    slots = np.asarray(slots, dtype=np.int64)
+
+    fast = np.maximum(np.arange(slots.max(initial=0) + 1)[None, :], fast_min[:, None])
+    missing = np.maximum(required[:, None] - fast * fast_charger, 0)
+    slow = np.maximum(slow_min[:, None], np.ceil(missing / slow_charger - 1e-9).astype(np.int64))
+    costs = np.where(slow + fast <= slots[:, None], slow * slow_costs + fast * fast_costs, np.inf)
+
+    best = np.argmin(costs, axis=1)
+    rows = np.arange(len(required))
+    feasible = np.isfinite(costs[rows, best])
+    return (np.where(feasible, slow[rows, best], slow_min),
+            np.where(feasible, fast[rows, best], slots - slow_min))
+
+
+class LNSSolver:
+    """
+    Large neighbourhood search for a `ChargerPlacementModel`.
+
+    Args:
+        model: the placement model, only its data and candidate arcs are used
+        k: restrict the search to the `k` nearest parking slots per demand point, `None` for the model arcs.
+            The best plan is reassigned over the model arcs at the end.
+        destroy_size: maximal number of parking slots changed per iteration
+        time_limit: time budget in seconds
+        max_iterations: optional iteration limit
+        seed: seed of the random number generator
+        threshold: worse plans are accepted if their costs are within this fraction of the best costs;
+            the threshold decreases linearly to zero over the time or iteration budget
+        incremental: evaluate the moves of an iteration with `MinCostFlowEvaluator.resolve`, which only
+            re-routes the customers next to changed parking slots; accepted plans are solved exactly
+        callback: called with an `LNSProgress` after every iteration, return `True` to stop
+
+    Examples:
+        >>> import pandas as pd
+        >>> supply = pd.DataFrame({'x_coordinate': [0., 10.], 'y_coordinate': [0., 0.],
+        ...                        'total_parking_slots': [2, 2],
+        ...                        'existing_num_SCS': [1, 0], 'existing_num_FCS': [0, 0]})
+        >>> demand = pd.DataFrame({'x_coordinate': [1., 9.], 'y_coordinate': [0., 0.],
+        ...                        '2019': [150., 300.]})
+        >>> solution = LNSSolver(ChargerPlacementModel(supply, demand, 2019), max_iterations=10).solve()
+        >>> solution.status, solution.objective, solution.slow, solution.fast
+        ('FEASIBLE', 1950.0, array([1., 0.]), array([0., 1.]))
+    """
+
+    def __init__(self, model: ChargerPlacementModel, k: Optional[int] = 10, destroy_size: int = 5,
+                 time_limit: float = 60.0, max_iterations: Optional[int] = None, seed: Optional[int] = 0,
+                 threshold: float = 0.001, incremental: bool = True,
+                 callback: Optional[Callable[[LNSProgress], Optional[bool]]] = None):
+        self.model = model
+        self.destroy_size = destroy_size
+        self.time_limit = time_limit
+        self.max_iterations = max_iterations
+        self.rng = np.random.default_rng(seed)
+        self.threshold = threshold
+        self.incremental = incremental
+        self.callback = callback
+
+        if k is None:
+            self.arcs = model.arcs
+        else:
+            self.arcs = nearest_candidates(coordinates(model.demand), coordinates(model.supply), k=k)
+        self.evaluator = MinCostFlowEvaluator(model.demands, self.arcs)
+        self.slow_min = model.existing_slow.astype(np.int64)
+        self.fast_min = model.existing_fast.astype(np.int64)
+        self.slots = model.slots.astype(np.int64)
+        self.facility_tree = cKDTree(coordinates(model.supply))
+
+    def _capacities(self, slow, fast) -> np.ndarray:
+        return slow * self.model.slow_charger + fast * self.model.fast_charger
+
+    def _costs(self, slow, fast, result: TransportationResult) -> float:
+        return float(result.flow @ self.arcs.cost + slow.sum() * self.model.slow_costs
+                     + fast.sum() * self.model.fast_costs)
+
+    def _evaluate(self, capacities, base: Optional[Tuple[np.ndarray, TransportationResult]] = None):
+        """
+        Transportation for the capacities, re-solved from the `(capacities, result)` of the plan it was derived
+        from if there is one.
+        """
+        if base is None or not self.incremental:
+            return self.evaluator.solve(capacities)
+        return self.evaluator.resolve(capacities, *base)
+
+    def _mix(self, required):
+        model = self.model
+        return cheapest_mix(required, self.slow_min, self.fast_min, self.slots, model.slow_charger,
+                            model.fast_charger, model.slow_costs, model.fast_costs)
+
+    def _nearest_arc(self, mask) -> np.ndarray:
+        """
+        Index of the cheapest arc per customer among the arcs in `mask`.
+        """
+        candidates = np.flatnonzero(mask)
+        order = candidates[np.lexsort((self.arcs.cost[candidates], self.arcs.customer[candidates]))]
+        first = np.r_[True, np.diff(self.arcs.customer[order]) != 0]
+        return order[first]
+
+    def construct(self):
+        """
+        Greedy start: use the existing chargers, then repair.
+        """
+        return self.repair(self.slow_min.copy(), self.fast_min.copy())
+
+    def repair(self, slow, fast, frozen=None, max_rounds: int = 50,
+               base: Optional[Tuple[np.ndarray, TransportationResult]] = None):
+        """
+        Add chargers until all demand is served, preferably not at the `frozen` parking slots. `base` is the
+        `(capacities, result)` of the plan the counts were derived from, see `_evaluate`.
+        """
+        for _ in range(max_rounds):
+            capacities = self._capacities(slow, fast)
+            result = self._evaluate(capacities, base)
+            base = capacities, result
+            if result.unmet.sum() <= 1e-9:
+                return slow, fast, result
+            # fast chargers can still be added or replace slow ones
+            can_grow = (slow + fast < self.slots) | (slow > self.slow_min)
+            unmet = result.unmet > 1e-9
+            mask = can_grow[self.arcs.facility] & unmet[self.arcs.customer]
+            if frozen is not None:
+                arcs = self._nearest_arc(mask & ~frozen[self.arcs.facility])
+                if len(np.unique(self.arcs.customer[arcs])) < unmet.sum():
+                    frozen = None
+                    continue
+            else:
+                arcs = self._nearest_arc(mask)
+            if not len(arcs):
+                break
+            extra = np.bincount(self.arcs.facility[arcs], result.unmet[self.arcs.customer[arcs]],
+                                minlength=self.arcs.num_facilities)
+            slow, fast = self._mix(capacities + extra)
+        raise RuntimeError('could not find a plan serving all demand, increase k')
+
+    def trim(self, slow, fast, result: TransportationResult):
+        """
+        Remove chargers whose capacity is not used by the assignment, and replace two slow by one fast.
+        """
+        slack = self._capacities(slow, fast) - np.bincount(self.arcs.facility, result.flow,
+                                                           minlength=self.arcs.num_facilities) + 1e-9
+        fast_charger, slow_charger = self.model.fast_charger, self.model.slow_charger
+        drop_fast = np.minimum(fast - self.fast_min, np.floor(slack / fast_charger).astype(np.int64))
+        fast = fast - drop_fast
+        slack = slack - drop_fast * fast_charger
+        drop_slow = np.minimum(slow - self.slow_min, np.floor(slack / slow_charger).astype(np.int64))
+        slow = slow - drop_slow
+        slack = slack - drop_slow * slow_charger
+        downgrade = (slack >= fast_charger - slow_charger) & (fast > self.fast_min)
+        fast = fast - downgrade
+        slow = slow + downgrade
+        if 2 * self.model.slow_costs > self.model.fast_costs and 2 * slow_charger <= fast_charger:
+            merge = (slow - self.slow_min) // 2
+            slow = slow - 2 * merge
+            fast = fast + merge
+        return slow, fast
+
+    def _destroy(self, slow, fast):
+        """
+        Random destroy move, returns the new counts and the parking slots repair should avoid.
+        """
+        num_facilities = self.arcs.num_facilities
+        size = self.rng.integers(1, min(self.destroy_size, num_facilities) + 1)
+        slow, fast = slow.copy(), fast.copy()
+        move = self.rng.integers(4)
+        if move == 3:
+            # add a charger at a few parking slots, trimming then removes capacity that is not needed anymore
+            free = np.flatnonzero(slow + fast < self.slots)
+            if len(free):
+                sites = self.rng.choice(free, size=min(size, len(free)), replace=False)
+                fast[sites] += 1
+                return slow, fast, None
+        if move == 0:
+            # remove one charger at a few parking slots, the demand has to go elsewhere
+            built = np.flatnonzero((slow > self.slow_min) | (fast > self.fast_min))
+            if len(built):
+                sites = self.rng.choice(built, size=min(size, len(built)), replace=False)
+                has_fast = fast[sites] > self.fast_min[sites]
+                fast[sites[has_fast]] -= 1
+                slow[sites[~has_fast]] -= 1
+                frozen = np.zeros(num_facilities, dtype=bool)
+                frozen[sites] = True
+                return slow, fast, frozen
+        if move == 1:
+            # reset a cluster of neighbouring parking slots
+            center = self.facility_tree.data[self.rng.integers(num_facilities)]
+            _, sites = self.facility_tree.query(center, k=size)
+        else:
+            sites = self.rng.choice(num_facilities, size=size, replace=False)
+        slow[sites] = self.slow_min[sites]
+        fast[sites] = self.fast_min[sites]
+        return slow, fast, None
+
+    def _improve(self, slow, fast, result):
+        """
+        Trim and re-evaluate until the plan does not change anymore.
+        """
+        while True:
+            trimmed = self.trim(slow, fast, result)
+            if np.array_equal(trimmed[0], slow) and np.array_equal(trimmed[1], fast):
+                return slow, fast, result
+            slow, fast, result = self.repair(*trimmed, base=(self._capacities(slow, fast), result))
+
+    def solve(self) -> PlacementSolution:
+        start = time.perf_counter()
+        slow, fast, result = self._improve(*self.construct())
+        objective = best_objective = self._costs(slow, fast, result)
+        best = slow, fast
+
+        iteration = 0
+        while time.perf_counter() - start < self.time_limit and (
+                self.max_iterations is None or iteration < self.max_iterations):
+            iteration += 1
+            current = self._capacities(slow, fast), result
+            destroyed_slow, destroyed_fast, frozen = self._destroy(slow, fast)
+            candidate = self._improve(*self.repair(destroyed_slow, destroyed_fast, frozen, base=current))
+            candidate_objective = self._costs(*candidate)
+            # threshold acceptance: slightly worse plans are accepted early on to escape local optima
+            progress = max((time.perf_counter() - start) / self.time_limit,
+                           iteration / self.max_iterations if self.max_iterations else 0.0)
+            if candidate_objective <= objective + self.threshold * (1 - progress) * best_objective:
+                if self.incremental:
+                    # the local re-solves bound the costs from above, so the move stays accepted
+                    exact = self.evaluator.solve(self._capacities(*candidate[:2]))
+                    candidate = candidate[0], candidate[1], exact
+                    candidate_objective = self._costs(*candidate)
+                slow, fast, result = candidate
+                objective = candidate_objective
+            improved = objective < best_objective - 1e-9
+            if improved:
+                best, best_objective = (slow, fast), objective
+            if self.callback is not None and self.callback(LNSProgress(
+                    iteration, time.perf_counter() - start, objective, best_objective, improved)):
+                break
+
+        solution = self.model.reassign(*best)
+        solution.wall_time = time.perf_counter() - start
+        return solution
+
+
+def solve_lns(model: ChargerPlacementModel, **kwargs) -> PlacementSolution:
+    """
+    Solve the placement model heuristically, see `LNSSolver`.
+    """
+    return LNSSolver(model, **kwargs).solve()
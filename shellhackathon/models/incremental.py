@@ -0,0 +1,254 @@
+"""
+Incremental what-if edits of the charger placement model.
+
+`IncrementalPlacementModel` builds the model once (in bulk, see `ChargerPlacementModel.build`) and keeps it
+in a single `pywraplp.Solver`. Edits change the bounds and coefficients of that solver in place, and new
+parking slots add their variables and constraints to it. A re-solve therefore reuses the solver instance:
+LP solvers like GLOP start from the last basis, MIP solvers get the last solution as hint.
+"""
+import time
+from typing import Optional
+
+import numpy as np
+import ortools.linear_solver.pywraplp as pywraplp
+
+from shellhackathon.candidates import CandidateArcs
+from shellhackathon.models.placement import ChargerPlacementModel
+from shellhackathon.models.solution import PlacementSolution
+from shellhackathon.models.sparse import to_pywraplp, variable_values
+from shellhackathon.utils import coordinates
+
+STATUS = {pywraplp.Solver.OPTIMAL: 'OPTIMAL', pywraplp.Solver.FEASIBLE: 'FEASIBLE',
+          pywraplp.Solver.INFEASIBLE: 'INFEASIBLE', pywraplp.Solver.UNBOUNDED: 'UNBOUNDED',
+          pywraplp.Solver.ABNORMAL: 'ABNORMAL', pywraplp.Solver.MODEL_INVALID: 'MODEL_INVALID',
+          pywraplp.Solver.NOT_SOLVED: 'NOT_SOLVED'}
+
+
+class IncrementalPlacementModel:
+    """
+    A `ChargerPlacementModel` loaded into one solver for in-place edits and re-solves.
+
+    Args:
+        model: the placement model, its arcs are the initial assignment variables
+        solver_name: `pywraplp` solver, e.g. `scip`, `cbc` or `glop` for the LP relaxation
+
+    Examples:
+        >>> import pandas as pd
+        >>> supply = pd.DataFrame({'x_coordinate': [0., 10.], 'y_coordinate': [0., 0.],
+        ...                        'total_parking_slots': [2, 2],
+        ...                        'existing_num_SCS': [1, 0], 'existing_num_FCS': [0, 0]})
+        >>> demand = pd.DataFrame({'x_coordinate': [1., 9.], 'y_coordinate': [0., 0.],
+        ...                        '2019': [150., 300.]})
+        >>> model = IncrementalPlacementModel(ChargerPlacementModel(supply, demand, 2019))
+        >>> model.solve().objective
+        1950.0
+        >>> model.set_demands([1], [500.])
+        >>> solution = model.solve()
+        >>> solution.objective, solution.slow, solution.fast
+        (2750.0, array([1., 1.]), array([0., 1.]))
+        >>> model.add_site(9., 0., total_parking_slots=2)
+        2
+        >>> solution = model.solve()
+        >>> solution.objective, solution.slow, solution.fast
+        (2250.0, array([1., 0., 1.]), array([0., 0., 1.]))
+    """
+
+    def __init__(self, model: ChargerPlacementModel, solver_name: str = 'scip'):
+        self.year = model.year
+        self.slow_charger, self.fast_charger = model.slow_charger, model.fast_charger
+        self.slow_costs, self.fast_costs = model.slow_costs, model.fast_costs
+        self.customers = coordinates(model.demand)
+        self.facilities = coordinates(model.supply)
+        self.demands = model.demands.copy()
+        self.slots = model.slots.copy()
+        self.existing_slow = model.existing_slow.copy()
+        self.existing_fast = model.existing_fast.copy()
+        self.available = np.ones(model.num_facilities, dtype=bool)
+
+        # edits change demands and slots, so the charger bounds must not be presolved for the initial ones
+        self.solver = to_pywraplp(model.build(tighten=False), solver_name)
+        self.variables = self.solver.variables()
+        self.constraints = self.solver.constraints()
+        # positions of the variables and constraints in the solver, see `ChargerPlacementModel`
+        num_arcs, num_facilities = len(model.arcs), model.num_facilities
+        facilities = np.arange(num_facilities)
+        self.arc_customer = model.arcs.customer.copy()
+        self.arc_facility = model.arcs.facility.copy()
+        self.arc_cost = model.arcs.cost.copy()
+        self.arc_variable = np.arange(num_arcs)
+        self.slow_variable = num_arcs + facilities
+        self.fast_variable = num_arcs + num_facilities + facilities
+        self.slot_row = facilities
+        self.capacity_row = num_facilities + facilities
+        self.demand_row = 2 * num_facilities + np.arange(model.num_customers)
+        self.last_values: Optional[np.ndarray] = None
+
+    @property
+    def num_customers(self) -> int:
+        return len(self.customers)
+
+    @property
+    def num_facilities(self) -> int:
+        return len(self.facilities)
+
+    def set_demands(self, customers, demands):
+        """
+        Change the demand of some demand points.
+        """
+        customers = np.atleast_1d(np.asarray(customers, dtype=np.int64))
+        demands = np.broadcast_to(np.asarray(demands, dtype=np.float64), customers.shape)
+        for customer, demand in zip(customers, demands):
+            self.constraints[self.demand_row[customer]].SetBounds(float(demand), float(demand))
+        self.demands[customers] = demands
+
+    def set_slots(self, facilities, slots):
+        """
+        Change the number of parking slots of some parking slots.
+        """
+        facilities = np.atleast_1d(np.asarray(facilities, dtype=np.int64))
+        slots = np.broadcast_to(np.asarray(slots, dtype=np.float64), facilities.shape)
+        self.slots[facilities] = slots
+        for facility in facilities:
+            self.constraints[self.slot_row[facility]].SetUb(float(self.slots[facility]))
+        self._update_charger_bounds(facilities)
+
+    def set_costs(self, slow_costs: Optional[float] = None, fast_costs: Optional[float] = None):
+        """
+        Change the build costs of slow and/or fast chargers.
+        """
+        objective = self.solver.Objective()
+        if slow_costs is not None:
+            self.slow_costs = slow_costs
+            for variable in self.slow_variable:
+                objective.SetCoefficient(self.variables[variable], slow_costs)
+        if fast_costs is not None:
+            self.fast_costs = fast_costs
+            for variable in self.fast_variable:
+                objective.SetCoefficient(self.variables[variable], fast_costs)
+
+    def set_arc_costs(self, customers, facilities, costs):
+        """
+        Change the costs of shipping demand along existing arcs.
+        """
+        facilities = np.asarray(facilities, dtype=np.int64)
+        keys = self.arc_customer.astype(np.int64) * self.num_facilities + self.arc_facility
+        order = np.argsort(keys)
+        wanted = np.asarray(customers, dtype=np.int64) * self.num_facilities + facilities
+        position = order[np.searchsorted(keys, wanted, sorter=order).clip(max=len(keys) - 1)]
+        if np.any(facilities >= self.num_facilities) or not np.array_equal(keys[position], wanted):
+            raise ValueError('arc costs can only be changed for arcs of the model')
+        costs = np.broadcast_to(np.asarray(costs, dtype=np.float64), position.shape)
+        objective = self.solver.Objective()
+        for arc, cost in zip(position, costs):
+            objective.SetCoefficient(self.variables[self.arc_variable[arc]], float(cost))
+        self.arc_cost[position] = costs
+
+    def remove_sites(self, facilities):
+        """
+        Do not build new chargers at some parking slots. Existing chargers are kept and still serve demand.
+        """
+        facilities = np.atleast_1d(np.asarray(facilities, dtype=np.int64))
+        self.available[facilities] = False
+        self._update_charger_bounds(facilities)
+
+    def restore_sites(self, facilities):
+        """
+        Allow new chargers at removed parking slots again.
+        """
+        facilities = np.atleast_1d(np.asarray(facilities, dtype=np.int64))
+        self.available[facilities] = True
+        self._update_charger_bounds(facilities)
+
+    def _update_charger_bounds(self, facilities):
+        for facility in facilities:
+            slow_upper = self.slots[facility] if self.available[facility] else self.existing_slow[facility]
+            fast_upper = self.slots[facility] if self.available[facility] else self.existing_fast[facility]
+            self.variables[self.slow_variable[facility]].SetUb(float(slow_upper))
+            self.variables[self.fast_variable[facility]].SetUb(float(fast_upper))
+
+    def add_site(self, x: float, y: float, total_parking_slots: float, existing_slow: float = 0,
+                 existing_fast: float = 0, radius: Optional[float] = None) -> int:
+        """
+        Add a candidate parking slot that serves all demand points, or the ones within `radius`.
+
+        Returns the index of the new parking slot.
+        """
+        solver, objective = self.solver, self.solver.Objective()
+        facility = self.num_facilities
+        distance = np.hypot(self.customers[:, 0] - x, self.customers[:, 1] - y)
+        customers = np.arange(self.num_customers) if radius is None else np.flatnonzero(distance <= radius)
+
+        slow = solver.IntVar(float(existing_slow), float(total_parking_slots), f'slow_{facility}')
+        fast = solver.IntVar(float(existing_fast), float(total_parking_slots), f'fast_{facility}')
+        objective.SetCoefficient(slow, self.slow_costs)
+        objective.SetCoefficient(fast, self.fast_costs)
+        slots = solver.RowConstraint(-solver.infinity(), float(total_parking_slots), f'slots_{facility}')
+        slots.SetCoefficient(slow, 1.0)
+        slots.SetCoefficient(fast, 1.0)
+        capacity = solver.RowConstraint(-solver.infinity(), 0.0, f'capacity_{facility}')
+        capacity.SetCoefficient(slow, -self.slow_charger)
+        capacity.SetCoefficient(fast, -self.fast_charger)
+        first_arc = solver.NumVariables()
+        assign = []
+        for customer in customers:
+            variable = solver.NumVar(0.0, solver.infinity(), f'assign_{customer}_{facility}')
+            objective.SetCoefficient(variable, float(distance[customer]))
+            capacity.SetCoefficient(variable, 1.0)
+            self.constraints[self.demand_row[customer]].SetCoefficient(variable, 1.0)
+            assign.append(variable)
+
+        self.variables.extend([slow, fast, *assign])
+        self.constraints.extend([slots, capacity])
+        self.facilities = np.vstack([self.facilities, [x, y]])
+        self.slots = np.append(self.slots, total_parking_slots)
+        self.existing_slow = np.append(self.existing_slow, existing_slow)
+        self.existing_fast = np.append(self.existing_fast, existing_fast)
+        self.available = np.append(self.available, True)
+        self.slow_variable = np.append(self.slow_variable, slow.index())
+        self.fast_variable = np.append(self.fast_variable, fast.index())
+        self.slot_row = np.append(self.slot_row, slots.index())
+        self.capacity_row = np.append(self.capacity_row, capacity.index())
+        self.arc_customer = np.concatenate([self.arc_customer, customers])
+        self.arc_facility = np.concatenate([self.arc_facility, np.full(len(customers), facility)])
+        self.arc_cost = np.concatenate([self.arc_cost, distance[customers]])
+        self.arc_variable = np.concatenate([self.arc_variable, first_arc + np.arange(len(customers))])
+        return facility
+
+    def solve(self, time_limit: Optional[float] = None, parameters: str = '', hint: bool = True) -> PlacementSolution:
+        """
+        Re-solve the current model with the same solver instance.
+
+        Args:
+            time_limit: in seconds
+            parameters: solver specific parameters as string
+            hint: start MIP solvers from the last solution
+        """
+        solver = self.solver
+        if time_limit is not None:
+            solver.SetTimeLimit(int(time_limit * 1000))
+        if parameters:
+            solver.SetSolverSpecificParametersAsString(parameters)
+        if hint and self.last_values is not None and solver.IsMip():
+            # variables added since the last solve have no hint
+            solver.SetHint(self.variables[:len(self.last_values)], self.last_values.tolist())
+
+        start = time.perf_counter()
+        status = STATUS.get(solver.Solve(), 'ABNORMAL')
+        wall_time = time.perf_counter() - start
+        if status in ('OPTIMAL', 'FEASIBLE'):
+            # adding 0 turns the -0.0 of some solvers into 0.0
+            values = variable_values(solver) + 0.0
+            self.last_values = values
+            objective, best_bound = solver.Objective().Value(), solver.Objective().BestBound()
+        else:
+            values = np.full(solver.NumVariables(), np.nan)
+            objective = best_bound = np.nan
+
+        order = np.lexsort((self.arc_facility, self.arc_customer))
+        arcs = CandidateArcs(customer=self.arc_customer[order], facility=self.arc_facility[order],
+                             cost=self.arc_cost[order], num_customers=self.num_customers,
+                             num_facilities=self.num_facilities)
+        return PlacementSolution(status=status, objective=objective, slow=values[self.slow_variable],
+                                 fast=values[self.fast_variable], arcs=arcs,
+                                 flow=values[self.arc_variable[order]], year=self.year,
+                                 best_bound=best_bound, wall_time=wall_time)
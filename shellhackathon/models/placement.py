@@ -0,0 +1,595 @@
+"""
+Charger placement model of the Shell hackathon.
+
+Decide how many slow and fast chargers to build at every parking slot (supply point), and how much of the
+demand of every demand point to serve from which parking slot, minimizing build costs plus distance times
+supplied demand. This is the model of the `Solution_20xx` notebooks:
+
+- constraint 2: existing chargers are not removed (variable lower bounds)
+- constraint 3: slow + fast chargers fit in the parking slots
+- constraint 5: supply of a parking slot does not exceed the capacity of its chargers
+- constraint 6: the demand of every demand point is met
+
+The model is emitted in bulk from a sparse constraint matrix instead of Python expression trees. Before that,
+the upper bounds of the charger variables are tightened by a problem specific presolve (`presolve_bounds`):
+dominated charger mixes are cut off and parking slots without reachable demand keep their existing chargers,
+which leaves the MIP solver far fewer branch-and-bound nodes.
+"""
+import dataclasses
+import time
+from math import ceil
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from shellhackathon.candidates import CandidateArcs, nearest_candidates, price_out
+from shellhackathon.data.demand_store import DemandStore
+from shellhackathon.distance import distance_matrix
+from shellhackathon.models.backends import Backend, Incumbent, get_backend, solve
+from shellhackathon.models.solution import PlacementSolution
+from shellhackathon.models.sparse import build_model, has_solution, solve_model, variable_values
+from shellhackathon.models.transportation import solve_transportation
+from shellhackathon.utils import FAST_CHARGER, FAST_COSTS, SLOW_CHARGER, SLOW_COSTS, coordinates, demand_values
+
+
+def dominance_limit(capacity: float, costs: float, other_capacity: float, other_costs: float,
+                    max_count: int) -> Optional[int]:
+    """
+    Smallest number of new chargers of one type that fewer chargers of the other type replace with at least
+    the same capacity at no higher costs, `None` if there is none up to `max_count`.
+
+    Examples:
+        Two slow chargers are replaced by one fast charger, but not the other way round:
+
+        >>> dominance_limit(200, 600, 400, 900, 10), dominance_limit(400, 900, 200, 600, 10)
+        (2, None)
+    """
+    for count in range(2, max_count + 1):
+        replacement = ceil(count * capacity / other_capacity)
+        if replacement < count and replacement * other_costs <= count * costs:
+            return count
+    return None
+
+
+def presolve_bounds(slots, existing_slow, existing_fast, reachable, slow_charger: float = SLOW_CHARGER,
+                    fast_charger: float = FAST_CHARGER, slow_costs: float = SLOW_COSTS,
+                    fast_costs: float = FAST_COSTS, dominance: bool = True):
+    """
+    Upper bounds of the slow and fast chargers of every parking slot that keep at least one optimal solution.
+
+    - chargers of one type fit next to the existing chargers of the other type
+    - a dominated number of new chargers of one type (see `dominance_limit`) is never built, e.g. at most one
+      new slow charger with the default capacities and costs; only with `dominance`, as this does not hold
+      for later years of a multi-year plan, which cannot replace the chargers of earlier years
+    - no more new chargers of a type are built than needed for the `reachable` demand, i.e. the demand of
+      the demand points with an arc to the parking slot; parking slots without any keep their existing chargers
+
+    Examples:
+        >>> slow, fast = presolve_bounds([4, 4, 4], [1, 0, 0], [0, 2, 0], [900., 300., 0.])
+        >>> slow, fast
+        (array([2., 0., 0.]), array([2., 2., 0.]))
+    """
+    slots = np.asarray(slots, dtype=np.float64)
+    existing_slow = np.asarray(existing_slow, dtype=np.float64)
+    existing_fast = np.asarray(existing_fast, dtype=np.float64)
+    missing = np.maximum(np.asarray(reachable, dtype=np.float64)
+                         - existing_slow * slow_charger - existing_fast * fast_charger, 0.0)
+    slow = np.minimum(slots - existing_fast, existing_slow + np.ceil(missing / slow_charger))
+    fast = np.minimum(slots - existing_slow, existing_fast + np.ceil(missing / fast_charger))
+    if dominance:
+        max_count = int(slots.max(initial=0))
+        limit = dominance_limit(slow_charger, slow_costs, fast_charger, fast_costs, max_count)
+        if limit is not None:
+            slow = np.minimum(slow, existing_slow + limit - 1)
+        limit = dominance_limit(fast_charger, fast_costs, slow_charger, slow_costs, max_count)
+        if limit is not None:
+            fast = np.minimum(fast, existing_fast + limit - 1)
+    # never below the existing chargers, even if these do not fit in the slots
+    return np.maximum(slow, existing_slow), np.maximum(fast, existing_fast)
+
+
+class ChargerPlacementModel:
+    """
+    Charger placement MIP for one year.
+
+    Variables are laid out as `[assign (one per arc), slow (one per facility), fast (one per facility)]`,
+    constraints as `[slots, capacity, demand]`.
+
+    Args:
+        supply: parking slots with coordinates, `total_parking_slots`, `existing_num_SCS` and
+            `existing_num_FCS`, as in `exisiting_EV_infrastructure_2018.csv`
+        demand: demand points with coordinates and one column of demand per year, as in `Demand_Future.csv`,
+            or a `DemandStore`
+        year: the demand column to plan for
+        candidates: arcs demand may be served along, all demand/supply pairs by default
+        tighten: presolve the upper bounds of the chargers (see `presolve_bounds`), otherwise they are the slots
+
+    Examples:
+        >>> supply = pd.DataFrame({'x_coordinate': [0., 10.], 'y_coordinate': [0., 0.],
+        ...                        'total_parking_slots': [2, 2],
+        ...                        'existing_num_SCS': [1, 0], 'existing_num_FCS': [0, 0]})
+        >>> demand = pd.DataFrame({'x_coordinate': [1., 9.], 'y_coordinate': [0., 0.],
+        ...                        '2019': [150., 300.]})
+        >>> solution = ChargerPlacementModel(supply, demand, 2019).solve()
+        >>> solution.status, solution.objective, solution.slow, solution.fast
+        ('OPTIMAL', 1950.0, array([1., 0.]), array([0., 1.]))
+    """
+
+    def __init__(self, supply: pd.DataFrame, demand: Union[pd.DataFrame, DemandStore], year='2019',
+                 slow_charger: float = SLOW_CHARGER, fast_charger: float = FAST_CHARGER,
+                 slow_costs: float = SLOW_COSTS, fast_costs: float = FAST_COSTS,
+                 candidates: Optional[CandidateArcs] = None, tighten: bool = True):
+        self.supply = supply
+        self.demand = demand
+        self.year = str(year)
+        self.years = [self.year]
+        self.slow_charger = slow_charger
+        self.fast_charger = fast_charger
+        self.slow_costs = slow_costs
+        self.fast_costs = fast_costs
+
+        self.demands = demand_values(demand, self.year)
+        self.slots = supply['total_parking_slots'].to_numpy(dtype=np.float64)
+        self.existing_slow = supply['existing_num_SCS'].to_numpy(dtype=np.float64)
+        self.existing_fast = supply['existing_num_FCS'].to_numpy(dtype=np.float64)
+        if candidates is None:
+            candidates = CandidateArcs.dense(distance_matrix(coordinates(demand), coordinates(supply)))
+        self.arcs = candidates
+        self.tighten = tighten
+        # solution hints per year, used as starting point of the solver
+        self.hints: Dict[str, PlacementSolution] = {}
+
+    @property
+    def num_customers(self) -> int:
+        return self.arcs.num_customers
+
+    @property
+    def num_facilities(self) -> int:
+        return self.arcs.num_facilities
+
+    @property
+    def num_variables(self) -> int:
+        return len(self.arcs) + 2 * self.num_facilities
+
+    def with_candidates(self, candidates: CandidateArcs) -> 'ChargerPlacementModel':
+        """
+        The same model restricted to other candidate arcs.
+        """
+        return type(self)(self.supply, self.demand, self.year, self.slow_charger, self.fast_charger,
+                          self.slow_costs, self.fast_costs, candidates=candidates, tighten=self.tighten)
+
+    def set_hint(self, solution: PlacementSolution, year=None):
+        """
+        Use a solution (see also `read_result_csv`) as starting point of the solver.
+
+        The hint is used for `year`; by default the year of the solution if the model has it, otherwise
+        every year of the model, e.g. to start 2020 from the 2019 infrastructure. Flows along arcs that are
+        not part of this model are dropped.
+        """
+        if year is not None:
+            years = [str(year)]
+        elif solution.year in self.years:
+            years = [solution.year]
+        else:
+            years = self.years
+        for year in years:
+            self.hints[year] = solution
+
+    def clear_hints(self):
+        self.hints = {}
+
+    def _add_hints(self, model):
+        size = len(self.arcs) + 2 * self.num_facilities
+        for index, year in enumerate(self.years):
+            if year not in self.hints:
+                continue
+            hint = self.hints[year]
+            values = np.concatenate([hint.flow_on(self.arcs), hint.slow, hint.fast])
+            # a partial hint of the non-zero flows and all charger counts is completed by the solver
+            variables = np.flatnonzero(values)
+            variables = np.union1d(variables, np.arange(len(self.arcs), size))
+            for variable in variables:
+                model.add_hint(int(index * size + variable), float(values[variable]))
+
+    def objective_coefficients(self) -> np.ndarray:
+        """
+        Objective coefficient of every variable of one year: distances, then slow and fast charger costs.
+        """
+        return np.concatenate([self.arcs.cost,
+                               np.full(self.num_facilities, self.slow_costs),
+                               np.full(self.num_facilities, self.fast_costs)])
+
+    def charger_bounds(self, demands: Optional[np.ndarray] = None, dominance: bool = True):
+        """
+        Presolved upper bounds of the slow and fast chargers (see `presolve_bounds`) for the demand of every
+        demand point, by default the demand of the model year. Only demand along the arcs of the model is
+        reachable.
+        """
+        demands = self.demands if demands is None else np.asarray(demands, dtype=np.float64)
+        reachable = np.bincount(self.arcs.facility, demands[self.arcs.customer], minlength=self.num_facilities)
+        return presolve_bounds(self.slots, self.existing_slow, self.existing_fast, reachable, self.slow_charger,
+                               self.fast_charger, self.slow_costs, self.fast_costs, dominance=dominance)
+
+    def _period(self, demands: np.ndarray, bound_demands: Optional[np.ndarray] = None, dominance: bool = True):
+        """
+        Constraint matrix, bounds and objective of the single year model for the given demands. The charger
+        bounds are presolved for `bound_demands`, without them they are the slots.
+        """
+        arcs = self.arcs
+        num_arcs, num_facilities, num_customers = len(arcs), self.num_facilities, self.num_customers
+        facilities = np.arange(num_facilities)
+        slow = num_arcs + facilities
+        fast = num_arcs + num_facilities + facilities
+
+        # constraint 3: slow[j] + fast[j] <= slots[j]
+        slot_rows = np.concatenate([facilities, facilities])
+        slot_cols = np.concatenate([slow, fast])
+        slot_vals = np.ones(2 * num_facilities)
+        # constraint 5: sum_i assign[i, j] - slow_charger * slow[j] - fast_charger * fast[j] <= 0
+        capacity_rows = num_facilities + np.concatenate([arcs.facility, facilities, facilities])
+        capacity_cols = np.concatenate([np.arange(num_arcs), slow, fast])
+        capacity_vals = np.concatenate([np.ones(num_arcs),
+                                        np.full(num_facilities, -self.slow_charger),
+                                        np.full(num_facilities, -self.fast_charger)])
+        # constraint 6: sum_j assign[i, j] == demands[i]
+        demand_rows = 2 * num_facilities + arcs.customer
+        demand_cols = np.arange(num_arcs)
+        demand_vals = np.ones(num_arcs)
+
+        matrix = sp.csr_matrix((np.concatenate([slot_vals, capacity_vals, demand_vals]),
+                                (np.concatenate([slot_rows, capacity_rows, demand_rows]),
+                                 np.concatenate([slot_cols, capacity_cols, demand_cols]))),
+                               shape=(2 * num_facilities + num_customers, num_arcs + 2 * num_facilities))
+        slow_upper, fast_upper = (self.slots, self.slots) if bound_demands is None else \
+            self.charger_bounds(bound_demands, dominance)
+        return dict(
+            lower=np.concatenate([np.zeros(num_arcs), self.existing_slow, self.existing_fast]),
+            upper=np.concatenate([np.full(num_arcs, np.inf), slow_upper, fast_upper]),
+            objective=self.objective_coefficients(),
+            row_lower=np.concatenate([np.full(2 * num_facilities, -np.inf), demands]),
+            row_upper=np.concatenate([self.slots, np.zeros(num_facilities), demands]),
+            matrix=matrix, integer=np.concatenate([slow, fast]))
+
+    def model_arrays(self, relax: bool = False, tighten: Optional[bool] = None) -> Dict:
+        """
+        Arguments of `build_model` for the MIP, or its LP relaxation. `tighten` overrides the one of the model.
+        """
+        tighten = self.tighten if tighten is None else tighten
+        period = self._period(self.demands, self.demands if tighten else None)
+        if relax:
+            period['integer'] = None
+        return dict(period, name=f'charger_placement_{self.year}')
+
+    def build(self, relax: bool = False, tighten: Optional[bool] = None):
+        """
+        Emit the MIP, or its LP relaxation, as `ModelBuilderHelper`. `tighten` overrides the one of the model.
+        """
+        model = build_model(**self.model_arrays(relax, tighten))
+        self._add_hints(model)
+        return model
+
+    def relaxation_duals(self, penalty: Optional[float] = None,
+                         solver_name: str = 'glop') -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Demand and capacity duals of the LP relaxation, one row per year, to price arcs that are not part of
+        the model (see `shellhackathon.candidates.price_out`).
+
+        The charger bounds are the slots: the presolved bounds depend on the arcs and keep parking slots
+        without arcs at their existing chargers, which is what pricing must not assume. Unmet demand is
+        allowed at cost `penalty`, by default 100 times the largest costs of serving one unit of demand, so the
+        relaxation has duals even if the arcs cannot serve all demand.
+
+        Examples:
+            >>> supply = pd.DataFrame({'x_coordinate': [0., 10.], 'y_coordinate': [0., 0.],
+            ...                        'total_parking_slots': [2, 2],
+            ...                        'existing_num_SCS': [1, 0], 'existing_num_FCS': [0, 0]})
+            >>> demand = pd.DataFrame({'x_coordinate': [1., 9.], 'y_coordinate': [0., 0.],
+            ...                        '2019': [150., 300.]})
+            >>> demand_duals, capacity_duals = ChargerPlacementModel(supply, demand, 2019).relaxation_duals()
+            >>> demand_duals, capacity_duals
+            (array([[1.  , 3.25]]), array([[ 0.  , -2.25]]))
+        """
+        arrays = self.model_arrays(relax=True, tighten=False)
+        num_years, num_facilities, num_customers = len(self.years), self.num_facilities, self.num_customers
+        if penalty is None:
+            unit_costs = max(self.slow_costs / self.slow_charger, self.fast_costs / self.fast_charger)
+            penalty = 100.0 * (float(self.arcs.cost.max(initial=0.0)) + unit_costs + 1.0)
+
+        # one unmet demand slack per demand constraint, the rows of every year are [slots, capacity, demand]
+        rows_per_year = 2 * num_facilities + num_customers
+        demand_rows = (np.arange(num_years)[:, None] * rows_per_year + 2 * num_facilities
+                       + np.arange(num_customers)).ravel()
+        num_slacks = len(demand_rows)
+        slacks = sp.csr_matrix((np.ones(num_slacks), (demand_rows, np.arange(num_slacks))),
+                               shape=(arrays['matrix'].shape[0], num_slacks))
+        arrays.update(lower=np.concatenate([arrays['lower'], np.zeros(num_slacks)]),
+                      upper=np.concatenate([arrays['upper'], np.full(num_slacks, np.inf)]),
+                      objective=np.concatenate([arrays['objective'], np.full(num_slacks, penalty)]),
+                      matrix=sp.hstack([arrays['matrix'], slacks], format='csr'))
+        solver = solve_model(build_model(**arrays), solver_name)
+        if not has_solution(solver):
+            raise RuntimeError(f'LP relaxation could not be solved: {solver.status().name}')
+        duals = np.asarray(solver.dual_values())[:num_years * rows_per_year].reshape(num_years, rows_per_year)
+        return duals[:, 2 * num_facilities:], duals[:, num_facilities:2 * num_facilities]
+
+    def _solution(self, solver, values: Optional[np.ndarray], year: str, offset: int = 0) -> PlacementSolution:
+        """
+        Extract the solution of one year from the primal `values` starting at `offset`.
+        """
+        size = len(self.arcs) + 2 * self.num_facilities
+        if values is not None:
+            values = values[offset:offset + size]
+            objective = float(values @ self.objective_coefficients())
+            best_bound = solver.best_objective_bound()
+        else:
+            values = np.full(size, np.nan)
+            objective = best_bound = np.nan
+        return PlacementSolution.from_values(values, self.arcs, status=solver.status().name, objective=objective,
+                                             year=year, best_bound=best_bound, wall_time=solver.wall_time())
+
+    def solve_years(self, solver_name: Union[str, Backend] = 'scip', time_limit: Optional[float] = None,
+                    parameters: str = '', hint_dir=None, callback: Optional[Callable[[Incumbent], None]] = None,
+                    **settings) -> Dict[str, PlacementSolution]:
+        """
+        Build and solve the model, returning the solution of every year of the model. The arguments are the
+        ones of `solve`, the incumbents are the ones of the whole model.
+        """
+        if hint_dir is not None:
+            for year in self.years:
+                path = Path(hint_dir) / f'hint_{year}.npz'
+                if year not in self.hints and path.exists():
+                    self.set_hint(PlacementSolution.load(path), year)
+
+        backend = get_backend(solver_name, time_limit=time_limit, parameters=parameters, **settings)
+        start = time.perf_counter()
+        solver = solve(self.build(relax=backend.relaxation), backend, callback=callback)
+        size = len(self.arcs) + 2 * self.num_facilities
+        # all primal values are read from the solver once and sliced per year
+        values = variable_values(solver) if has_solution(solver) else None
+        solutions = {year: self._solution(solver, values, year, offset=index * size)
+                     for index, year in enumerate(self.years)}
+        if backend.relaxation:
+            solutions = self._round(solutions)
+            if callback is not None and all(solution.has_solution for solution in solutions.values()):
+                callback(Incumbent(sum(solution.objective for solution in solutions.values()),
+                                   solver.objective_value(), time.perf_counter() - start, backend.solver))
+
+        if hint_dir is not None and has_solution(solver):
+            Path(hint_dir).mkdir(parents=True, exist_ok=True)
+            for year, solution in solutions.items():
+                solution.save(Path(hint_dir) / f'hint_{year}.npz')
+        return solutions
+
+    def _round(self, relaxed: Dict[str, PlacementSolution]) -> Dict[str, PlacementSolution]:
+        """
+        Round LP relaxation solutions year by year: the cheapest charger mix covering the relaxed load of every
+        parking slot (and the chargers of the previous year), then the optimal assignment for it. The objective
+        of the relaxation is kept as bound.
+        """
+        # heuristics imports this module
+        from shellhackathon.models.heuristics import cheapest_mix
+        slow, fast = self.existing_slow, self.existing_fast
+        solutions = {}
+        for year, solution in relaxed.items():
+            if not solution.has_solution:
+                solutions[year] = solution
+                continue
+            start = time.perf_counter()
+            slow, fast = cheapest_mix(solution.loads(), slow, fast, self.slots, self.slow_charger,
+                                      self.fast_charger, self.slow_costs, self.fast_costs)
+            rounded = self.reassign(slow, fast, year)
+            solutions[year] = dataclasses.replace(rounded, best_bound=solution.objective,
+                                                  wall_time=solution.wall_time + time.perf_counter() - start)
+        return solutions
+
+    def solve(self, solver_name: Union[str, Backend] = 'scip', time_limit: Optional[float] = None,
+              parameters: str = '', hint_dir=None, callback: Optional[Callable[[Incumbent], None]] = None,
+              **settings) -> PlacementSolution:
+        """
+        Build and solve the model.
+
+        With a time limit, gap or node limit the solve stops early and returns the best plan found so far with
+        status `FEASIBLE`.
+
+        Args:
+            solver_name: a backend like `scip`, `highs`, `cbc`, `cp-sat` or `glop-rounding` (see
+                `shellhackathon.models.backends`), or any other OR-Tools solver
+            time_limit: in seconds
+            parameters: solver specific parameters as string
+            hint_dir: directory to persist solutions in. A stored solution is used as hint for the next
+                solve of the same year, so re-solves after small changes start from the last plan.
+            callback: called with an `Incumbent` for every improved solution while the solver runs, e.g.
+                `backends.log_incumbents(logger)` or a `backends.IncumbentTrace`
+            settings: other settings of the backend: `relative_gap`, `absolute_gap`, `node_limit`, `threads`
+                or `presolve`
+
+        Examples:
+            >>> supply = pd.DataFrame({'x_coordinate': [0., 10.], 'y_coordinate': [0., 0.],
+            ...                        'total_parking_slots': [2, 2],
+            ...                        'existing_num_SCS': [1, 0], 'existing_num_FCS': [0, 0]})
+            >>> demand = pd.DataFrame({'x_coordinate': [1., 9.], 'y_coordinate': [0., 0.],
+            ...                        '2019': [150., 300.]})
+            >>> incumbents = []
+            >>> solution = ChargerPlacementModel(supply, demand, 2019).solve(
+            ...     'highs', time_limit=10, relative_gap=0.01, node_limit=1000, callback=incumbents.append)
+            >>> solution.objective, incumbents[-1].objective, incumbents[-1].gap
+            (1950.0, 1950.0, 0.0)
+        """
+        return self.solve_years(solver_name, time_limit, parameters, hint_dir, callback, **settings)[self.year]
+
+    def solve_pruned(self, k: Optional[int] = 10, radius: Optional[float] = None, max_iterations: int = 20,
+                     candidates: Optional[CandidateArcs] = None, **solve_kwargs) -> PlacementSolution:
+        """
+        Solve over the `k` nearest / within-`radius` parking slots per demand point, or over `candidates`,
+        re-adding pruned arcs with negative reduced cost in the LP relaxation or in the assignment of the
+        plan until none is left (see `shellhackathon.candidates.price_out`).
+        """
+        return self.solve_pruned_years(k, radius, max_iterations, candidates, **solve_kwargs)[self.year]
+
+    def solve_pruned_years(self, k: Optional[int] = 10, radius: Optional[float] = None, max_iterations: int = 20,
+                           candidates: Optional[CandidateArcs] = None,
+                           **solve_kwargs) -> Dict[str, PlacementSolution]:
+        """
+        `solve_pruned` returning the solution of every year of the model.
+        """
+        def solve(arcs):
+            solutions = self.with_candidates(arcs).solve_years(**solve_kwargs)
+            return solutions, self._plan_capacities(solutions)
+
+        def relaxation(arcs):
+            return self.with_candidates(arcs).relaxation_duals()
+
+        customers, facilities = coordinates(self.demand), coordinates(self.supply)
+        if candidates is None:
+            candidates = nearest_candidates(customers, facilities, k=k, radius=radius)
+        solutions, _, _ = price_out(solve, customers, facilities, self.demands, candidates, relaxation=relaxation,
+                                    max_iterations=max_iterations)
+        return solutions
+
+    def reassign(self, slow, fast, year=None, **kwargs) -> PlacementSolution:
+        """
+        Optimal assignment of the demand of `year` for a fixed build plan, solved as min-cost flow.
+
+        This is one to two orders of magnitude faster than solving the MIP, e.g. to recompute the
+        assignment after editing a plan or inside heuristics. The status is `INFEASIBLE` if the
+        chargers cannot serve all demand. Keyword arguments are passed to `solve_transportation`.
+        """
+        year = str(year or self.year)
+        slow = np.asarray(slow, dtype=np.float64)
+        fast = np.asarray(fast, dtype=np.float64)
+        result = solve_transportation(demand_values(self.demand, year),
+                                      slow * self.slow_charger + fast * self.fast_charger, self.arcs, **kwargs)
+        feasible = result.unmet.sum() <= 1e-9
+        objective = result.flow @ self.arcs.cost + slow.sum() * self.slow_costs + fast.sum() * self.fast_costs
+        return PlacementSolution(status='FEASIBLE' if feasible else 'INFEASIBLE',
+                                 objective=float(objective) if feasible else np.nan,
+                                 slow=slow, fast=fast, arcs=self.arcs, flow=result.flow, year=year)
+
+    def _plan_capacities(self, solutions: Dict[str, PlacementSolution]) -> np.ndarray:
+        """
+        (years, facilities) capacities of the build plans of `solve_years`.
+        """
+        for solution in solutions.values():
+            if not solution.has_solution:
+                raise RuntimeError(f'restricted placement model could not be solved: {solution.status}')
+        return np.stack([solution.capacities(self.slow_charger, self.fast_charger) for solution in solutions.values()])
+
+
+class MultiYearPlacementModel(ChargerPlacementModel):
+    """
+    Charger placement for several years in a single model.
+
+    Every year gets its own `assign`, `slow` and `fast` variables. The yearly charger counts are linked by
+    `slow[y - 1, j] <= slow[y, j]` (and the same for `fast`), i.e. chargers built in one year are not
+    removed later. The objective is the sum of the yearly costs.
+
+    `solve_years` returns the solution of every year; `solve` only the one of the first year, i.e. the plan
+    to build now that takes the demand of the later years into account.
+
+    Examples:
+        >>> supply = pd.DataFrame({'x_coordinate': [0.], 'y_coordinate': [0.], 'total_parking_slots': [3],
+        ...                        'existing_num_SCS': [0], 'existing_num_FCS': [0]})
+        >>> demand = pd.DataFrame({'x_coordinate': [0.], 'y_coordinate': [0.],
+        ...                        '2019': [300.], '2020': [500.]})
+        >>> solutions = MultiYearPlacementModel(supply, demand, [2019, 2020]).solve_years()
+        >>> [(year, int(solution.slow[0]), int(solution.fast[0])) for year, solution in solutions.items()]
+        [('2019', 0, 1), ('2020', 1, 1)]
+    """
+
+    def __init__(self, supply: pd.DataFrame, demand: Union[pd.DataFrame, DemandStore], years=('2019', '2020'),
+                 **kwargs):
+        years = [str(year) for year in years]
+        super().__init__(supply, demand, years[0], **kwargs)
+        self.years = years
+        self.demands = demand_values(demand, self.years).T
+
+    @property
+    def num_variables(self) -> int:
+        return len(self.years) * super().num_variables
+
+    def with_candidates(self, candidates: CandidateArcs) -> 'MultiYearPlacementModel':
+        return type(self)(self.supply, self.demand, self.years, slow_charger=self.slow_charger,
+                          fast_charger=self.fast_charger, slow_costs=self.slow_costs,
+                          fast_costs=self.fast_costs, candidates=candidates, tighten=self.tighten)
+
+    def model_arrays(self, relax: bool = False, tighten: Optional[bool] = None) -> Dict:
+        """
+        Arguments of `build_model` for the MIP of all years, or its LP relaxation.
+
+        Chargers are not removed in later years, so the charger bounds of a year are presolved for the
+        largest demand of every demand point up to that year, and without dominated mixes for the first year only.
+        """
+        tighten = self.tighten if tighten is None else tighten
+        bound_demands = np.maximum.accumulate(self.demands, axis=0)
+        periods = [self._period(demands, bounds if tighten else None, dominance=index == 0)
+                   for index, (demands, bounds) in enumerate(zip(self.demands, bound_demands))]
+        size = len(self.arcs) + 2 * self.num_facilities
+        num_links = (len(self.years) - 1) * 2 * self.num_facilities
+
+        # chargers of year y - 1 minus chargers of year y <= 0, for the slow and fast variables
+        previous = (np.arange(len(self.years) - 1)[:, None] * size + len(self.arcs)
+                    + np.arange(2 * self.num_facilities)).ravel()
+        links = sp.csr_matrix((np.concatenate([np.ones(num_links), -np.ones(num_links)]),
+                               (np.tile(np.arange(num_links), 2), np.concatenate([previous, previous + size]))),
+                              shape=(num_links, self.num_variables))
+        matrix = sp.vstack([sp.block_diag([period['matrix'] for period in periods]), links])
+
+        def stack(key):
+            return np.concatenate([period[key] for period in periods])
+
+        return dict(
+            lower=stack('lower'), upper=stack('upper'), objective=stack('objective'),
+            row_lower=np.concatenate([stack('row_lower'), np.full(num_links, -np.inf)]),
+            row_upper=np.concatenate([stack('row_upper'), np.zeros(num_links)]),
+            matrix=matrix,
+            integer=None if relax else np.concatenate([year * size + period['integer']
+                                                       for year, period in enumerate(periods)]),
+            name=f'charger_placement_{"_".join(self.years)}')
+
+
+def supply_with_solution(supply: pd.DataFrame, solution: PlacementSolution) -> pd.DataFrame:
+    """
+    Supply table with the chargers of the solution as existing infrastructure, like
+    `exisiting_EV_infrastructure_2019.csv`.
+    """
+    supply = supply.copy()
+    supply['existing_num_SCS'] = np.round(solution.slow)
+    supply['existing_num_FCS'] = np.round(solution.fast)
+    return supply
+
+
+def solve_rolling_horizon(supply: pd.DataFrame, demand: pd.DataFrame, years, window: int = 2, step: int = 1,
+                          model_kwargs: Optional[dict] = None, **solve_kwargs) -> Dict[str, PlacementSolution]:
+    """
+    Plan many years ahead by solving overlapping windows of `window` years jointly.
+
+    Only the first `step` years of every window are kept; their chargers become the existing infrastructure
+    of the next window. The effort grows linearly with the number of years.
+
+    Examples:
+        >>> supply = pd.DataFrame({'x_coordinate': [0.], 'y_coordinate': [0.], 'total_parking_slots': [3],
+        ...                        'existing_num_SCS': [0], 'existing_num_FCS': [0]})
+        >>> demand = pd.DataFrame({'x_coordinate': [0.], 'y_coordinate': [0.],
+        ...                        '2019': [300.], '2020': [500.], '2021': [700.]})
+        >>> solutions = solve_rolling_horizon(supply, demand, [2019, 2020, 2021])
+        >>> [(year, int(solution.slow[0]), int(solution.fast[0])) for year, solution in solutions.items()]
+        [('2019', 0, 1), ('2020', 1, 1), ('2021', 2, 1)]
+    """
+    years = [str(year) for year in years]
+    if not 1 <= step <= window:
+        raise ValueError('step must be between 1 and window')
+    solutions = {}
+    for start in range(0, len(years), step):
+        window_years = years[start:start + window]
+        model = MultiYearPlacementModel(supply, demand, window_years, **(model_kwargs or {}))
+        window_solutions = model.solve_years(**solve_kwargs)
+        for year in window_years[:step]:
+            solution = window_solutions[year]
+            if not solution.has_solution:
+                raise RuntimeError(f'placement model for {window_years} could not be solved: {solution.status}')
+            solutions[year] = solution
+        supply = supply_with_solution(supply, solutions[window_years[:step][-1]])
+    return solutions
@@ -0,0 +1,229 @@
+"""
+Truncation and feasibility repair of solutions before submission.
+
+The submission values are truncated to two decimals, otherwise the constraints are violated due to floating
+point issues (see https://stackoverflow.com/a/49960574). Truncating every flow loses up to one unit of the
+last decimal per shipment, so demand points end up slightly under-served. `repair_solution` works on
+integer units of the last decimal, which makes all sums exact:
+
+- negative flows are dropped and all flows truncated
+- demand points that get more than their (truncated) demand and parking slots loaded above their capacity
+  are scaled down
+- the missing mass of every demand point is given to its nearest parking slots that still have slack
+
+All steps are vectorized with `np.bincount`, only the rounds of the redistribution loop in Python.
+"""
+from dataclasses import dataclass
+from typing import Dict, Tuple, Union
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+from shellhackathon.candidates import CandidateArcs
+from shellhackathon.models.solution import PlacementSolution
+from shellhackathon.utils import FAST_CHARGER, FAST_COSTS, SLOW_CHARGER, SLOW_COSTS
+
+
+def _units(values, decimals: int) -> np.ndarray:
+    """
+    Values truncated towards zero as integer units of the last decimal.
+
+    A tiny epsilon away from zero keeps e.g. `0.29 * 100 = 28.999999999999996` at 29 units, while values
+    just below the next unit stay below it.
+
+    Examples:
+        >>> _units([0.29, 0.0099999999, 1.9999999995, -0.29], 2)
+        array([ 29,   0, 199, -29])
+    """
+    scaled = np.asarray(values, dtype=np.float64) * 10 ** decimals
+    return np.trunc(scaled + np.sign(scaled) * 1e-9).astype(np.int64)
+
+
+def truncate(values, decimals: int = 2) -> np.ndarray:
+    """
+    Truncate values towards zero to `decimals` decimals, the vectorized `truncate` of the notebooks.
+
+    Examples:
+        >>> truncate([0.29, 1.005, 2.999, -1.239])
+        array([ 0.29,  1.  ,  2.99, -1.23])
+        >>> truncate([0.0099999999, 1.9999999995])
+        array([0.  , 1.99])
+    """
+    return _units(values, decimals) / 10 ** decimals
+
+
+def truncate_submission(frame: pd.DataFrame, decimals: int = 2) -> pd.DataFrame:
+    """
+    Submission frame with truncated `value` column.
+    """
+    return frame.assign(value=truncate(frame['value'].to_numpy(), decimals))
+
+
+@dataclass
+class ViolationReport:
+    year: str
+    # parking slots whose load exceeds the capacity of their chargers, by how much
+    overloaded: np.ndarray
+    overload: np.ndarray
+    # demand points that get less than their demand, by how much
+    unserved: np.ndarray
+    shortfall: np.ndarray
+    # demand points that get more than their demand, by how much
+    oversupplied: np.ndarray
+    excess: np.ndarray
+    negative: int = 0
+    # mass moved by the repair to parking slots with slack
+    redistributed: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return not (len(self.overloaded) or len(self.unserved) or len(self.oversupplied) or self.negative)
+
+    @classmethod
+    def from_totals(cls, year, loads, capacities, served, demands, negative: int = 0,
+                    tol: float = 1e-6) -> 'ViolationReport':
+        """
+        Compare the load of every parking slot with its capacity and the supply of every demand point with
+        its demand.
+        """
+        overload = np.asarray(loads, dtype=np.float64) - capacities
+        difference = np.asarray(served, dtype=np.float64) - np.asarray(demands, dtype=np.float64)
+        overloaded = np.flatnonzero(overload > tol)
+        unserved = np.flatnonzero(difference < -tol)
+        oversupplied = np.flatnonzero(difference > tol)
+        return cls(year=str(year), overloaded=overloaded, overload=overload[overloaded],
+                   unserved=unserved, shortfall=-difference[unserved],
+                   oversupplied=oversupplied, excess=difference[oversupplied], negative=negative)
+
+    def summary(self) -> Dict[str, Union[str, float]]:
+        return {'year': self.year, 'overloaded': len(self.overloaded), 'overload': float(self.overload.sum()),
+                'unserved': len(self.unserved), 'shortfall': float(self.shortfall.sum()),
+                'oversupplied': len(self.oversupplied), 'excess': float(self.excess.sum()),
+                'negative': self.negative, 'redistributed': self.redistributed}
+
+
+def check_solution(solution: PlacementSolution, demands, slow_charger: float = SLOW_CHARGER,
+                   fast_charger: float = FAST_CHARGER, tol: float = 1e-6) -> ViolationReport:
+    """
+    Check the capacity (constraint 5) and demand (constraint 6) rows of a solution.
+
+    Examples:
+        >>> arcs = CandidateArcs.dense(np.array([[1., 2.], [3., 4.]]))
+        >>> solution = PlacementSolution.from_values([150., 60., 0., 30., 1., 0., 0., 0.], arcs)
+        >>> report = check_solution(solution, [200., 40.])
+        >>> report.ok, report.overloaded, report.overload, report.unserved, report.shortfall
+        (False, array([1]), array([90.]), array([1]), array([10.]))
+    """
+    return ViolationReport.from_totals(solution.year, solution.loads(), solution.capacities(slow_charger, fast_charger),
+                                       solution.served(), demands, negative=int(np.count_nonzero(solution.flow < 0)),
+                                       tol=tol)
+
+
+def _scale_down(units, groups, totals, limits) -> np.ndarray:
+    """
+    Scale the units of every group with a total above its limit down, rounding down.
+    """
+    ratio = np.ones(len(totals))
+    over = totals > limits
+    ratio[over] = limits[over] / totals[over]
+    return np.floor(units * ratio[groups]).astype(np.int64)
+
+
+def repair_solution(solution: PlacementSolution, demands, customers, facilities, decimals: int = 2,
+                    slow_charger: float = SLOW_CHARGER, fast_charger: float = FAST_CHARGER,
+                    slow_costs: float = SLOW_COSTS, fast_costs: float = FAST_COSTS,
+                    k: int = 16) -> Tuple[PlacementSolution, ViolationReport]:
+    """
+    Truncate the flows of a solution to `decimals` decimals and repair the constraints.
+
+    Args:
+        solution: solution to repair, the build plan is kept
+        demands: demand per demand point
+        customers, facilities: coordinates of demand points and parking slots, to find the nearest
+            parking slots with slack and to compute the costs of new arcs
+        decimals: number of decimals of the submission
+        k: number of nearest parking slots tried per demand point
+
+    Returns the repaired solution with its objective and the violations that could not be repaired, checked
+    against the demand truncated to `decimals`.
+
+    Examples:
+        >>> customers, facilities = np.array([[0., 0.], [1., 0.]]), np.array([[0., 0.], [5., 0.]])
+        >>> arcs = CandidateArcs.dense(np.array([[0., 5.], [1., 4.]]))
+        >>> solution = PlacementSolution.from_values([100.004, 0., 99.999, 100.002, 1., 1., 0., 0.], arcs)
+        >>> repaired, report = repair_solution(solution, [100.004, 200.001], customers, facilities)
+        >>> repaired.flow, report.ok, round(report.redistributed, 2)
+        (array([100.,   0., 100., 100.]), True, 0.01)
+    """
+    scale = 10 ** decimals
+    arcs = solution.arcs
+    num_customers, num_facilities = arcs.num_customers, arcs.num_facilities
+    customers = np.asarray(customers, dtype=np.float64)
+    facilities = np.asarray(facilities, dtype=np.float64)
+
+    demand_units = _units(demands, decimals)
+    capacity_units = np.floor(np.round(solution.capacities(slow_charger, fast_charger) * scale, 6)).astype(np.int64)
+    units = _units(np.maximum(solution.flow, 0), decimals)
+
+    def totals(groups, values, size):
+        return np.bincount(groups, values, minlength=size).astype(np.int64)
+
+    units = _scale_down(units, arcs.customer, totals(arcs.customer, units, num_customers), demand_units)
+    units = _scale_down(units, arcs.facility, totals(arcs.facility, units, num_facilities), capacity_units)
+
+    # redistribute the missing units, in every round each demand point asks its next nearest parking slot
+    missing = demand_units - totals(arcs.customer, units, num_customers)
+    slack = capacity_units - totals(arcs.facility, units, num_facilities)
+    granted_customers, granted_facilities, granted_units = [], [], []
+    short = np.flatnonzero(missing > 0)
+    if len(short):
+        k = min(k, num_facilities)
+        _, nearest = cKDTree(facilities).query(customers[short], k=k)
+        nearest = nearest.reshape(len(short), k)
+        for rank in range(k):
+            asking = np.flatnonzero(missing[short] > 0)
+            if not len(asking):
+                break
+            customer, facility = short[asking], nearest[asking, rank]
+            request = missing[customer]
+            # grant requests per parking slot in order until its slack is used up
+            order = np.argsort(facility, kind='stable')
+            customer, facility, request = customer[order], facility[order], request[order]
+            before = np.cumsum(request) - request
+            first = np.r_[0, np.flatnonzero(np.diff(facility)) + 1]
+            before -= np.repeat(before[first], np.diff(np.r_[first, len(facility)]))
+            granted = np.clip(slack[facility] - before, 0, request)
+            accepted = granted > 0
+            np.subtract.at(slack, facility[accepted], granted[accepted])
+            missing[customer[accepted]] -= granted[accepted]
+            granted_customers.append(customer[accepted])
+            granted_facilities.append(facility[accepted])
+            granted_units.append(granted[accepted])
+
+    if granted_customers:
+        added_customer = np.concatenate(granted_customers)
+        added_facility = np.concatenate(granted_facilities)
+        added_units = np.concatenate(granted_units)
+    else:
+        added_customer = added_facility = added_units = np.zeros(0, dtype=np.int64)
+    added_keys = added_customer * num_facilities + added_facility
+    merged = arcs.union(CandidateArcs.from_keys(added_keys, np.zeros(len(added_keys)), num_customers,
+                                                num_facilities))
+    flow_units = np.zeros(len(merged), dtype=np.int64)
+    flow_units[np.searchsorted(merged.keys, arcs.keys)] = units
+    np.add.at(flow_units, np.searchsorted(merged.keys, added_keys), added_units)
+
+    # arcs read from a result file have no costs, recompute them for all arcs
+    merged = CandidateArcs(customer=merged.customer, facility=merged.facility,
+                           cost=np.hypot(*(customers[merged.customer] - facilities[merged.facility]).T),
+                           num_customers=num_customers, num_facilities=num_facilities)
+    flow = flow_units / scale
+    slow, fast = solution.slow.copy(), solution.fast.copy()
+    objective = float(flow @ merged.cost + slow.sum() * slow_costs + fast.sum() * fast_costs)
+    repaired = PlacementSolution(status=solution.status, objective=objective, slow=slow, fast=fast, arcs=merged,
+                                 flow=flow, year=solution.year, best_bound=solution.best_bound,
+                                 wall_time=solution.wall_time)
+    report = check_solution(repaired, demand_units / scale, slow_charger, fast_charger, tol=0.5 / scale)
+    report.redistributed = float(added_units.sum() / scale)
+    return repaired, report
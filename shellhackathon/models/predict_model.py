@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+Demand forecast with the lag window forecaster of `train_model`, reusing fitted models and predictions.
+
+The forecaster is stored in the `ModelRegistry` under the hash of the demand history and its configuration,
+together with its holdout errors: the same forecaster fitted without the last `horizon` years and evaluated
+on them. As long as the history and the configuration do not change, neither fitting nor predicting is
+repeated. The forecast table is written with a `.json` file next to it that names the model that produced it.
+"""
+# system imports
+import json
+import logging
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+# third-party
+import click
+import click_log
+import numpy as np
+import pandas as pd
+
+# project imports
+from shellhackathon.models.registry import MODELS_DIR, ModelRegistry, array_hash
+from shellhackathon.models.train_model import DemandForecaster, forecast_errors, history_matrix, history_years
+
+
+##############################################################################
+logger = logging.getLogger(__name__)
+click_log.basic_config(logger)
+
+MODEL_NAME = 'demand_forecaster'
+
+
+##############################################################################
+def holdout_metrics(forecaster: DemandForecaster, history: np.ndarray) -> Dict[str, float]:
+    """
+    Errors of a forecaster fitted without the last `horizon` years of a (points, years) history on these
+    years, `mae_<step>` and `mape_<step>` for every step of the horizon.
+    """
+    horizon = forecaster.horizon
+    forecast = forecaster.fit(history[:, :-horizon]).predict(history[:, :-horizon])
+    metrics = {}
+    for step in range(horizon):
+        errors = forecast_errors(history[:, step - horizon], forecast[:, step])
+        metrics.update({f'{name}_{step + 1}': value for name, value in errors.items()})
+    return metrics
+
+
+def forecast_demand(history: pd.DataFrame, years=None, registry: Optional[ModelRegistry] = None,
+                    evaluate: bool = True, refit: bool = False, **forecaster_kwargs) -> Tuple[pd.DataFrame, Dict]:
+    """
+    The demand table with the forecast years added and the metadata of the model, fitting and predicting
+    only if the registry has no model or prediction for the history yet.
+
+    Args:
+        history: demand table with the history years
+        years: years of the history to use, all by default
+        registry: where models are stored, `models/` by default
+        evaluate: compute the holdout errors of a new model, which needs a second fit
+        refit: fit and store a new model even if there is one
+        forecaster_kwargs: arguments of `DemandForecaster`
+    """
+    registry = registry or ModelRegistry()
+    years = history_years(history) if years is None else [str(year) for year in years]
+    matrix = history_matrix(history, years)
+    data_hash = array_hash(matrix, years=years)
+    config = DemandForecaster(**forecaster_kwargs).config()
+
+    def fit():
+        metrics = holdout_metrics(DemandForecaster(**forecaster_kwargs), matrix) if evaluate else {}
+        return DemandForecaster(**forecaster_kwargs).fit(matrix), metrics
+
+    # a stored prediction does not need the model
+    entry = None if refit else registry.find(MODEL_NAME, data_hash, config)
+    forecast = None if entry is None else registry.prediction(entry, data_hash)
+    if entry is not None and forecast is not None:
+        logger.info(f'reusing the prediction of {entry}')
+        meta = registry.meta(entry)
+    else:
+        forecaster, meta = registry.fit_or_load(MODEL_NAME, data_hash, config, fit, refit=refit)
+        forecast = forecaster.predict(matrix)
+        registry.save_prediction(registry.entry(MODEL_NAME, meta['key']), data_hash, forecast)
+    future = [str(int(years[-1]) + step) for step in range(1, forecast.shape[1] + 1)]
+    return history.assign(**{year: forecast[:, step] for step, year in enumerate(future)}), meta
+
+
+##############################################################################
+@click.command()
+@click_log.simple_verbosity_option(logger)
+@click.argument('input_filepath', type=click.Path(exists=True))
+@click.argument('output_filepath', type=click.Path())
+@click.option('--models-dir', default=str(MODELS_DIR), type=click.Path(), help='directory of the model registry')
+@click.option('--window', default=2, help='past years used as features')
+@click.option('--horizon', default=2, help='future years to forecast')
+@click.option('--n-jobs', default=-1)
+@click.option('--evaluate/--no-evaluate', default=True, help='compute the holdout errors of new models')
+@click.option('--refit', is_flag=True, help='fit a new model even if the registry has one')
+def main(input_filepath, output_filepath, models_dir, window, horizon, n_jobs, evaluate, refit):
+    """
+    Forecast the next HORIZON years of the demand history in INPUT_FILEPATH and write the demand table with
+    the forecast years to OUTPUT_FILEPATH, and the model that produced it next to it as JSON.
+    """
+    from shellhackathon.data.make_dataset import load_frame
+    forecast, meta = forecast_demand(load_frame(input_filepath), registry=ModelRegistry(models_dir),
+                                     evaluate=evaluate, refit=refit, window=window, horizon=horizon, n_jobs=n_jobs)
+    forecast.to_csv(output_filepath, index=False)
+    Path(output_filepath).with_suffix('.json').write_text(json.dumps(
+        {name: meta[name] for name in ['name', 'key', 'data_hash', 'config', 'metrics', 'created']}, indent=2))
+    logger.info(f'forecast of model {meta["key"]} written to {output_filepath}, holdout errors {meta["metrics"]}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""
+Registry of fitted models and their predictions in `models/`.
+
+A model is stored under the hash of its training data and its configuration, so refitting the same model on
+the same data is a lookup. An entry `models/<name>-<key>/` holds
+
+- `model.joblib`: the fitted model, pickled with joblib and compressed
+- `model.mmap.joblib`: an uncompressed copy, written on the first load with `mmap_mode`, whose arrays are
+  memory-mapped instead of decompressed, so that loading a model in many worker processes is cheap (the
+  forest of the demand forecaster loads in 0.04 s instead of 1.5 s; scikit-learn copies the nodes of trees
+  into its own buffers, while the arrays of other models stay shared)
+- `meta.json`: name, key, training data hash, configuration, metrics, fit time and library versions
+- `predictions/<hash>.npy`: the predictions of the model for inputs with the given hash
+
+Entries are written to a temporary directory first and renamed, like the cache entries of
+`shellhackathon.data.make_dataset`.
+"""
+# system imports
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional, Union
+
+# third-party
+import numpy as np
+import pandas as pd
+
+# project imports
+from shellhackathon.data.make_dataset import PROJECT_DIR
+
+
+##############################################################################
+logger = logging.getLogger(__name__)
+
+MODELS_DIR = PROJECT_DIR / 'models'
+
+
+##############################################################################
+def array_hash(*arrays, **labels) -> str:
+    """
+    SHA-256 hex digest of the contents, shapes and types of arrays and of keyword labels (e.g. the years of
+    the columns).
+
+    Examples:
+        >>> values = np.arange(3.)
+        >>> array_hash(values) == array_hash(values.copy()), array_hash(values) == array_hash(values.astype(int))
+        (True, False)
+    """
+    digest = hashlib.sha256()
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        digest.update(f'{array.dtype.str}{array.shape}'.encode())
+        digest.update(array.data)
+    digest.update(json.dumps(labels, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+def config_hash(config: Dict) -> str:
+    """
+    SHA-256 hex digest of a JSON serializable configuration, independent of the order of the keys.
+
+    Examples:
+        >>> config_hash({'window': 2, 'horizon': 2}) == config_hash({'horizon': 2, 'window': 2})
+        True
+    """
+    return hashlib.sha256(json.dumps(config, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def model_key(data_hash: str, config: Dict) -> str:
+    """
+    Key of a model: the start of the hash of its training data and configuration.
+    """
+    return hashlib.sha256(f'{data_hash}:{config_hash(config)}'.encode()).hexdigest()[:16]
+
+
+def library_versions() -> Dict[str, str]:
+    import joblib
+    import sklearn
+    return {'numpy': np.__version__, 'pandas': pd.__version__, 'sklearn': sklearn.__version__,
+            'joblib': joblib.__version__}
+
+
+class ModelRegistry:
+    """
+    Fitted models and their predictions, stored by training data hash and configuration.
+
+    Args:
+        root: directory of the entries, `models/` of the project by default
+        compress: joblib compression level of the stored models
+
+    Examples:
+        >>> from sklearn.linear_model import LinearRegression
+        >>> with tempfile.TemporaryDirectory() as directory:
+        ...     registry = ModelRegistry(directory)
+        ...     data = np.arange(6.).reshape(3, 2)
+        ...     fit = lambda: (LinearRegression().fit(data[:, :1], data[:, 1]), {'r2': 1.0})
+        ...     model, meta = registry.fit_or_load('line', array_hash(data), {'fit_intercept': True}, fit)
+        ...     cached, cached_meta = registry.fit_or_load('line', array_hash(data), {'fit_intercept': True}, fit)
+        ...     meta['key'] == cached_meta['key'], cached_meta['metrics'], round(float(cached.coef_[0]), 6)
+        (True, {'r2': 1.0}, 1.0)
+    """
+
+    def __init__(self, root: Union[str, Path] = MODELS_DIR, compress: int = 3):
+        self.root = Path(root)
+        self.compress = compress
+
+    def entry(self, name: str, key: str) -> Path:
+        return self.root / f'{name}-{key}'
+
+    def find(self, name: str, data_hash: str, config: Dict) -> Optional[Path]:
+        """
+        Directory of the stored model with the given training data and configuration, if there is one.
+        """
+        entry = self.entry(name, model_key(data_hash, config))
+        return entry if (entry / 'meta.json').exists() else None
+
+    def save(self, model, name: str, data_hash: str, config: Dict, metrics: Optional[Dict] = None,
+             fit_time: float = np.nan) -> Dict:
+        """
+        Store a fitted model and return its metadata.
+        """
+        import joblib
+        key = model_key(data_hash, config)
+        target = self.entry(name, key)
+        meta = dict(name=name, key=key, data_hash=data_hash, config=config, metrics=metrics or {},
+                    fit_time=fit_time, created=time.strftime('%Y-%m-%dT%H:%M:%S'), versions=library_versions())
+        self.root.mkdir(parents=True, exist_ok=True)
+        building = Path(tempfile.mkdtemp(prefix=f'.{target.name}-', dir=self.root))
+        try:
+            joblib.dump(model, building / 'model.joblib', compress=self.compress)
+            (building / 'meta.json').write_text(json.dumps(meta, indent=2, default=str))
+            if target.exists():
+                shutil.rmtree(target)
+            os.replace(building, target)
+        finally:
+            shutil.rmtree(building, ignore_errors=True)
+        logger.info(f'stored {name} {key} in {target}')
+        return meta
+
+    def meta(self, entry: Path) -> Dict:
+        return json.loads((Path(entry) / 'meta.json').read_text())
+
+    def load(self, entry: Path, mmap_mode: Optional[str] = None):
+        """
+        Load a stored model, with its arrays memory-mapped from an uncompressed copy for a `mmap_mode`.
+        """
+        import joblib
+        entry = Path(entry)
+        if mmap_mode is None or not self.compress:
+            return joblib.load(entry / 'model.joblib', mmap_mode=mmap_mode)
+        expanded = entry / 'model.mmap.joblib'
+        if not expanded.exists():
+            # compressed pickles cannot be memory-mapped
+            handle, temporary = tempfile.mkstemp(prefix='.model-', suffix='.joblib', dir=entry)
+            os.close(handle)
+            joblib.dump(joblib.load(entry / 'model.joblib'), temporary)
+            os.replace(temporary, expanded)
+        return joblib.load(expanded, mmap_mode=mmap_mode)
+
+    def fit_or_load(self, name: str, data_hash: str, config: Dict, fit: Callable,
+                    mmap_mode: Optional[str] = None, refit: bool = False):
+        """
+        The stored model with the given training data and configuration and its metadata; without one (or
+        with `refit`) `fit()` is called, which returns the fitted model and its metrics, and the result is
+        stored.
+        """
+        entry = None if refit else self.find(name, data_hash, config)
+        if entry is not None:
+            logger.info(f'reusing {entry}')
+            return self.load(entry, mmap_mode), self.meta(entry)
+        start = time.perf_counter()
+        model, metrics = fit()
+        meta = self.save(model, name, data_hash, config, metrics, time.perf_counter() - start)
+        if mmap_mode is not None:
+            model = self.load(self.entry(name, meta['key']), mmap_mode)
+        return model, meta
+
+    def prediction(self, entry: Path, input_hash: str) -> Optional[np.ndarray]:
+        """
+        The stored prediction of a model for inputs with the given hash, if there is one.
+        """
+        path = Path(entry) / 'predictions' / f'{input_hash[:16]}.npy'
+        return np.load(path) if path.exists() else None
+
+    def save_prediction(self, entry: Path, input_hash: str, prediction: np.ndarray):
+        directory = Path(entry) / 'predictions'
+        directory.mkdir(exist_ok=True)
+        handle, temporary = tempfile.mkstemp(prefix='.prediction-', suffix='.npy', dir=directory)
+        with os.fdopen(handle, 'wb') as file:
+            np.save(file, prediction)
+        os.replace(temporary, directory / f'{input_hash[:16]}.npy')
+
+    def list(self) -> pd.DataFrame:
+        """
+        One row per stored model with its metadata and metrics, the newest first.
+        """
+        rows = []
+        for meta_path in self.root.glob('*/meta.json'):
+            meta = json.loads(meta_path.read_text())
+            rows.append(dict(name=meta['name'], key=meta['key'], created=meta['created'],
+                             data_hash=meta['data_hash'][:16], fit_time=meta['fit_time'],
+                             predictions=len(list(meta_path.parent.glob('predictions/*.npy'))),
+                             **{f'metric_{name}': value for name, value in meta['metrics'].items()}))
+        if not rows:
+            return pd.DataFrame(columns=['name', 'key', 'created', 'data_hash', 'fit_time', 'predictions'])
+        return pd.DataFrame(rows).sort_values('created', ascending=False, ignore_index=True)
@@ -0,0 +1,177 @@
+"""
+Scoring of submissions with the cost function of the hackathon.
+
+The costs of a year are
+
+- distance times supplied demand of every `DS` row
+- build costs of all slow (`SCS`) and fast (`FCS`) chargers
+- mean absolute error of the demand forecast, if the actual demand is known
+
+and the constraints are checked at the same time:
+
+- the chargers fit in the parking slots
+- existing chargers (and chargers of earlier years) are not removed
+- the supply of a parking slot does not exceed the capacity of its chargers
+- the demand of every demand point is met
+
+Everything is computed with NumPy gathers on the distance matrix and `np.bincount` on the columns of the
+submission, without pandas group-bys or Python loops over rows, so scoring a full submission takes milliseconds.
+"""
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from shellhackathon.data.demand_store import DemandStore
+from shellhackathon.distance import distance_matrix
+from shellhackathon.models.postprocessing import ViolationReport
+from shellhackathon.utils import FAST_CHARGER, FAST_COSTS, SLOW_CHARGER, SLOW_COSTS, coordinates, demand_values
+
+
+@dataclass
+class YearScore:
+    year: str
+    distance_cost: float
+    build_cost: float
+    # NaN if the actual demand is not known
+    forecast_mae: float
+    # parking slots with more chargers than slots
+    slot_violations: np.ndarray
+    # parking slots with fewer chargers than existed before
+    removed_chargers: np.ndarray
+    violations: ViolationReport
+
+    @property
+    def total(self) -> float:
+        return float(np.nansum([self.distance_cost, self.build_cost, self.forecast_mae]))
+
+    @property
+    def valid(self) -> bool:
+        return self.violations.ok and not len(self.slot_violations) and not len(self.removed_chargers)
+
+    def summary(self) -> Dict[str, Union[str, float]]:
+        return {'year': self.year, 'total': self.total, 'distance_cost': self.distance_cost,
+                'build_cost': self.build_cost, 'forecast_mae': self.forecast_mae, 'valid': self.valid,
+                'slot_violations': len(self.slot_violations), 'removed_chargers': len(self.removed_chargers),
+                **{key: value for key, value in self.violations.summary().items()
+                   if key not in ('year', 'redistributed')}}
+
+
+@dataclass
+class Score:
+    years: Dict[str, YearScore]
+
+    @property
+    def total(self) -> float:
+        return float(sum(year.total for year in self.years.values()))
+
+    @property
+    def valid(self) -> bool:
+        return all(year.valid for year in self.years.values())
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        One row per year with the cost components and the number of violations.
+        """
+        return pd.DataFrame([year.summary() for year in self.years.values()])
+
+
+def score(submission: Union[pd.DataFrame, str, Path], supply: pd.DataFrame, demand: Union[pd.DataFrame, DemandStore],
+          actual_demand: Union[pd.DataFrame, DemandStore, None] = None, slow_charger: float = SLOW_CHARGER,
+          fast_charger: float = FAST_CHARGER, slow_costs: float = SLOW_COSTS, fast_costs: float = FAST_COSTS,
+          tol: float = 0.01, distance: Optional[np.ndarray] = None) -> Score:
+    """
+    Score a submission and check its constraints.
+
+    Args:
+        submission: rows `(year, data_type, demand_point_index, supply_point_index, value)` or the path of
+            such a CSV file. Optional `DD` rows hold the demand forecast per demand point.
+        supply: parking slots with coordinates, `total_parking_slots` and the existing chargers
+        demand: demand points with coordinates and the forecast demand per year, used if the submission
+            has no `DD` rows; a table or a `DemandStore`
+        actual_demand: actual demand per year in the layout of `demand`, for the forecast MAE
+        tol: tolerance of the capacity and demand checks, truncated submissions miss the demand by less
+            than one cent per shipment
+        distance: the (demand points, parking slots) distance matrix, computed if not given. Pass it when
+            scoring many submissions of the same instance.
+
+    Examples:
+        >>> supply = pd.DataFrame({'x_coordinate': [0., 10.], 'y_coordinate': [0., 0.],
+        ...                        'total_parking_slots': [2, 2],
+        ...                        'existing_num_SCS': [1, 0], 'existing_num_FCS': [0, 0]})
+        >>> demand = pd.DataFrame({'x_coordinate': [1., 9.], 'y_coordinate': [0., 0.],
+        ...                        '2019': [150., 300.]})
+        >>> submission = pd.DataFrame({'year': 2019, 'data_type': ['SCS', 'SCS', 'FCS', 'FCS', 'DS', 'DS'],
+        ...                            'demand_point_index': [None, None, None, None, 0, 1],
+        ...                            'supply_point_index': [0, 1, 0, 1, 0, 1],
+        ...                            'value': [1., 0., 0., 1., 150., 300.]})
+        >>> result = score(submission, supply, demand, actual_demand=demand.assign(**{'2019': [140., 300.]}))
+        >>> result.valid, result.total
+        (True, 1955.0)
+        >>> result.to_frame()[['year', 'distance_cost', 'build_cost', 'forecast_mae']]
+           year  distance_cost  build_cost  forecast_mae
+        0  2019          450.0      1500.0           5.0
+    """
+    if not isinstance(submission, pd.DataFrame):
+        submission = pd.read_csv(submission)
+    if distance is None:
+        distance = distance_matrix(coordinates(demand), coordinates(supply))
+    num_customers, num_facilities = distance.shape
+    distance = distance.ravel()
+    slots = supply['total_parking_slots'].to_numpy(dtype=np.float64)
+    previous_slow = supply['existing_num_SCS'].to_numpy(dtype=np.float64)
+    previous_fast = supply['existing_num_FCS'].to_numpy(dtype=np.float64)
+
+    all_years = submission['year'].to_numpy()
+    customer = submission['demand_point_index'].to_numpy(dtype=np.float64, na_value=np.nan)
+    facility = submission['supply_point_index'].to_numpy(dtype=np.float64, na_value=np.nan)
+    values = submission['value'].to_numpy(dtype=np.float64)
+    # compare the strings once in pandas, which is much faster than on object arrays
+    data_type = submission['data_type']
+    types = {name: (data_type == name).to_numpy(dtype=bool) for name in ('SCS', 'FCS', 'DS', 'DD')}
+
+    years = {}
+    for year in sorted(pd.unique(all_years)):
+        in_year = all_years == year
+
+        def rows_of(name):
+            return np.flatnonzero(types[name] & in_year)
+
+        def per_facility(name):
+            rows = rows_of(name)
+            counts = np.zeros(num_facilities)
+            counts[facility[rows].astype(np.int64)] = values[rows]
+            return counts
+
+        slow, fast = per_facility('SCS'), per_facility('FCS')
+        shipments = rows_of('DS')
+        ds_customer = customer[shipments].astype(np.int64)
+        ds_facility = facility[shipments].astype(np.int64)
+        flow = values[shipments]
+
+        forecasts = rows_of('DD')
+        if len(forecasts):
+            forecast = np.zeros(num_customers)
+            forecast[customer[forecasts].astype(np.int64)] = values[forecasts]
+        else:
+            forecast = demand_values(demand, year)
+        forecast_mae = np.nan
+        if actual_demand is not None and str(year) in actual_demand:
+            forecast_mae = float(np.abs(forecast - demand_values(actual_demand, year)).mean())
+
+        # solvers return values like -1e-12 for zero
+        violations = ViolationReport.from_totals(
+            year, np.bincount(ds_facility, flow, minlength=num_facilities),
+            slow * slow_charger + fast * fast_charger,
+            np.bincount(ds_customer, flow, minlength=num_customers), forecast,
+            negative=int(np.count_nonzero(values[in_year] < -1e-9)), tol=tol)
+        years[str(year)] = YearScore(
+            year=str(year), distance_cost=float(flow @ distance[ds_customer * num_facilities + ds_facility]),
+            build_cost=float(slow.sum() * slow_costs + fast.sum() * fast_costs), forecast_mae=forecast_mae,
+            slot_violations=np.flatnonzero(slow + fast > slots),
+            removed_chargers=np.flatnonzero((slow < previous_slow) | (fast < previous_fast)),
+            violations=violations)
+        previous_slow, previous_fast = slow, fast
+    return Score(years)
@@ -0,0 +1,256 @@
+"""
+Solution of the charger placement model.
+
+Primal values are extracted once into arrays (see `shellhackathon.models.sparse.variable_values`); reports,
+validators and writers use the sparse (`shipments`) or dense (`dense_flow`) views of them instead of
+querying the solver per variable.
+"""
+from dataclasses import dataclass
+from typing import Iterator, Optional
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from shellhackathon.candidates import CandidateArcs
+from shellhackathon.utils import FAST_CHARGER, SLOW_CHARGER
+
+
+@dataclass
+class PlacementSolution:
+    status: str
+    objective: float
+    # total number of slow and fast chargers per parking slot, including the existing ones
+    slow: np.ndarray
+    fast: np.ndarray
+    # arcs of the model and the demand shipped along each of them
+    arcs: CandidateArcs
+    flow: np.ndarray
+    year: str = ''
+    best_bound: float = np.nan
+    wall_time: float = np.nan
+
+    @property
+    def has_solution(self) -> bool:
+        return self.status in ('OPTIMAL', 'FEASIBLE')
+
+    @classmethod
+    def from_values(cls, values, arcs: CandidateArcs, status: str = 'FEASIBLE', objective: float = np.nan,
+                    year='', **kwargs) -> 'PlacementSolution':
+        """
+        Split a variable vector laid out as `[assign (one per arc), slow, fast]` into a solution.
+
+        This is the layout of `ChargerPlacementModel` and, with `CandidateArcs.dense`, of the models built
+        in the solution notebooks.
+
+        Examples:
+            >>> arcs = CandidateArcs.dense(np.array([[1., 2.]]))
+            >>> solution = PlacementSolution.from_values([150., 0., 1., 0., 0., 2.], arcs, year=2019)
+            >>> solution.flow, solution.slow, solution.fast, solution.year
+            (array([150.,   0.]), array([1., 0.]), array([0., 2.]), '2019')
+        """
+        values = np.asarray(values, dtype=np.float64)
+        num_arcs, num_facilities = len(arcs), arcs.num_facilities
+        return cls(status=status, objective=objective, slow=values[num_arcs:num_arcs + num_facilities],
+                   fast=values[num_arcs + num_facilities:num_arcs + 2 * num_facilities], arcs=arcs,
+                   flow=values[:num_arcs], year=str(year), **kwargs)
+
+    def shipments(self) -> sp.coo_matrix:
+        """
+        Sparse (customers, facilities) matrix of the shipped demand along the arcs of the solution.
+        """
+        return sp.coo_matrix((self.flow, (self.arcs.customer, self.arcs.facility)),
+                             shape=(self.arcs.num_customers, self.arcs.num_facilities))
+
+    def dense_flow(self) -> np.ndarray:
+        """
+        Dense (customers, facilities) array of the shipped demand, zero where the solution has no arc.
+        """
+        return self.arcs.to_dense(self.flow)
+
+    def loads(self) -> np.ndarray:
+        """
+        Demand served by every parking slot.
+        """
+        return np.bincount(self.arcs.facility, self.flow, minlength=self.arcs.num_facilities)
+
+    def served(self) -> np.ndarray:
+        """
+        Demand served of every demand point.
+
+        Examples:
+            >>> arcs = CandidateArcs.dense(np.array([[1., 2.], [3., 4.]]))
+            >>> solution = PlacementSolution.from_values([10., 0., 5., 15., 1., 0., 0., 0.], arcs)
+            >>> solution.served(), solution.loads()
+            (array([10., 20.]), array([15., 15.]))
+            >>> float(solution.shipments().tocsr()[1, 1])
+            15.0
+        """
+        return np.bincount(self.arcs.customer, self.flow, minlength=self.arcs.num_customers)
+
+    def capacities(self, slow_charger: float = SLOW_CHARGER, fast_charger: float = FAST_CHARGER) -> np.ndarray:
+        """
+        Charging capacity per parking slot of the build plan.
+        """
+        return self.slow * slow_charger + self.fast * fast_charger
+
+    def to_frame(self, all_pairs: bool = True) -> pd.DataFrame:
+        """
+        Solution in the `(year, data_type, demand_point_index, supply_point_index, value)` result format of
+        the solution notebooks, with one `SCS` and `FCS` row per parking slot and the `DS` rows.
+
+        With `all_pairs` there is a `DS` row for every demand/supply pair like in the notebooks, otherwise
+        only for the arcs of the solution.
+
+        Examples:
+            >>> arcs = CandidateArcs.dense(np.array([[1., 2.]]))
+            >>> PlacementSolution('OPTIMAL', 0., np.array([1., 0.]), np.array([0., 2.]), arcs,
+            ...                   np.array([150., 0.]), year='2019').to_frame()
+               year data_type  demand_point_index  supply_point_index  value
+            0  2019       SCS                <NA>                   0    1.0
+            1  2019       SCS                <NA>                   1    0.0
+            2  2019       FCS                <NA>                   0    0.0
+            3  2019       FCS                <NA>                   1    2.0
+            4  2019        DS                   0                   0  150.0
+            5  2019        DS                   0                   1    0.0
+        """
+        return pd.concat(list(self.iter_frames(all_pairs, chunk_size=None)), ignore_index=True)
+
+    def _rows(self, data_type, demand_point_index, supply_point_index, value) -> pd.DataFrame:
+        demand_point_index = pd.array(demand_point_index, dtype='Int64')
+        return pd.DataFrame({
+            'year': np.full(len(value), int(self.year)),
+            'data_type': np.full(len(value), data_type),
+            'demand_point_index': demand_point_index,
+            'supply_point_index': supply_point_index,
+            'value': value,
+        })
+
+    def iter_frames(self, all_pairs: bool = True, nonzero: bool = False,
+                    chunk_size: Optional[int] = 100_000) -> Iterator[pd.DataFrame]:
+        """
+        The rows of `to_frame` in chunks of at most `chunk_size` `DS` rows, after one chunk with the `SCS`
+        and `FCS` rows. `None` yields all `DS` rows at once.
+
+        With `all_pairs` the zero rows of the pairs without arc are generated chunk by chunk, so memory
+        does not grow with the number of pairs. `nonzero` drops all `DS` rows without flow. The rows need the
+        year of the solution, a `ValueError` is raised without one.
+
+        Examples:
+            >>> arcs = CandidateArcs.dense(np.array([[1., 2.], [3., 4.]]))
+            >>> solution = PlacementSolution.from_values([10., 0., 0., 20., 1., 0., 0., 1.], arcs, year=2019)
+            >>> [len(frame) for frame in solution.iter_frames(chunk_size=3)]
+            [4, 2, 2]
+            >>> pd.concat(solution.iter_frames(nonzero=True), ignore_index=True)
+               year data_type  demand_point_index  supply_point_index  value
+            0  2019       SCS                <NA>                   0    1.0
+            1  2019       SCS                <NA>                   1    0.0
+            2  2019       FCS                <NA>                   0    0.0
+            3  2019       FCS                <NA>                   1    1.0
+            4  2019        DS                   0                   0   10.0
+            5  2019        DS                   1                   1   20.0
+        """
+        if not str(self.year).isdigit():
+            raise ValueError(f'the result format needs the year of the solution, not {self.year!r}')
+        arcs = self.arcs
+        num_customers, num_facilities = arcs.num_customers, arcs.num_facilities
+        facilities = np.arange(num_facilities)
+        yield self._rows(np.repeat(['SCS', 'FCS'], num_facilities), np.full(2 * num_facilities, pd.NA),
+                         np.concatenate([facilities, facilities]), np.concatenate([self.slow, self.fast]))
+
+        if all_pairs and not nonzero:
+            # whole demand points per chunk, arcs are sorted by customer
+            step = num_customers if chunk_size is None else max(1, chunk_size // max(num_facilities, 1))
+            bounds = np.searchsorted(arcs.customer, np.arange(0, num_customers + step, step).clip(max=num_customers))
+            for start, (low, high) in zip(range(0, num_customers, step), zip(bounds[:-1], bounds[1:])):
+                stop = min(start + step, num_customers)
+                block = np.zeros((stop - start, num_facilities))
+                block[arcs.customer[low:high] - start, arcs.facility[low:high]] = self.flow[low:high]
+                yield self._rows('DS', np.repeat(np.arange(start, stop), num_facilities),
+                                 np.tile(facilities, stop - start), block.ravel())
+            return
+
+        selected = np.flatnonzero(self.flow) if nonzero else np.arange(len(arcs))
+        step = len(selected) if chunk_size is None else chunk_size
+        for start in range(0, len(selected), max(step, 1)):
+            rows = selected[start:start + step]
+            yield self._rows('DS', arcs.customer[rows], arcs.facility[rows], self.flow[rows])
+
+    def flow_on(self, arcs: CandidateArcs) -> np.ndarray:
+        """
+        Flow of this solution along other candidate arcs, zero where the solution has no arc.
+        """
+        keys = self.arcs.keys
+        flow = np.zeros(len(arcs))
+        if len(keys):
+            position = np.searchsorted(keys, arcs.keys).clip(max=len(keys) - 1)
+            found = keys[position] == arcs.keys
+            flow[found] = self.flow[position[found]]
+        return flow
+
+    def save(self, path):
+        """
+        Store the solution as compressed `.npz` file.
+        """
+        np.savez_compressed(path, status=self.status, objective=self.objective, slow=self.slow, fast=self.fast,
+                            customer=self.arcs.customer, facility=self.arcs.facility, cost=self.arcs.cost,
+                            num_customers=self.arcs.num_customers, num_facilities=self.arcs.num_facilities,
+                            flow=self.flow, year=self.year, best_bound=self.best_bound, wall_time=self.wall_time)
+
+    @classmethod
+    def load(cls, path) -> 'PlacementSolution':
+        with np.load(path) as data:
+            arcs = CandidateArcs(customer=data['customer'], facility=data['facility'], cost=data['cost'],
+                                 num_customers=int(data['num_customers']),
+                                 num_facilities=int(data['num_facilities']))
+            return cls(status=str(data['status']), objective=float(data['objective']),
+                       slow=data['slow'], fast=data['fast'], arcs=arcs, flow=data['flow'], year=str(data['year']),
+                       best_bound=float(data['best_bound']), wall_time=float(data['wall_time']))
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame, year=None, num_customers: Optional[int] = None,
+                   num_facilities: Optional[int] = None) -> 'PlacementSolution':
+        """
+        Read a solution from the `(year, data_type, demand_point_index, supply_point_index, value)` result
+        format written by the solution notebooks, e.g. `result_2019.csv`.
+
+        Arc costs are not part of the format and are set to zero.
+
+        Examples:
+            >>> frame = pd.DataFrame({'year': 2019, 'data_type': ['SCS', 'FCS', 'DS', 'DS'],
+            ...                       'demand_point_index': [None, None, 0, 1],
+            ...                       'supply_point_index': [0, 0, 0, 0], 'value': [1., 2., 150., 0.]})
+            >>> solution = PlacementSolution.from_frame(frame)
+            >>> solution.year, solution.slow, solution.fast, solution.flow
+            ('2019', array([1.]), array([2.]), array([150.,   0.]))
+        """
+        if year is None:
+            year = frame['year'].iloc[0]
+        frame = frame[frame['year'].astype(str) == str(year)]
+        chargers = frame[frame['data_type'].isin(['SCS', 'FCS'])]
+        shipments = frame[frame['data_type'] == 'DS']
+        if num_facilities is None:
+            num_facilities = int(frame['supply_point_index'].max()) + 1
+        if num_customers is None:
+            num_customers = int(shipments['demand_point_index'].max()) + 1
+
+        def per_facility(data_type):
+            rows = chargers[chargers['data_type'] == data_type]
+            values = np.zeros(num_facilities)
+            values[rows['supply_point_index'].to_numpy(dtype=np.int64)] = rows['value'].to_numpy(dtype=np.float64)
+            return values
+
+        keys = (shipments['demand_point_index'].to_numpy(dtype=np.int64) * num_facilities
+                + shipments['supply_point_index'].to_numpy(dtype=np.int64))
+        arcs = CandidateArcs.from_keys(keys, np.zeros(len(keys)), num_customers, num_facilities)
+        flow = np.zeros(len(arcs))
+        flow[np.searchsorted(arcs.keys, keys)] = shipments['value'].to_numpy(dtype=np.float64)
+        return cls(status='FEASIBLE', objective=np.nan, slow=per_facility('SCS'), fast=per_facility('FCS'),
+                   arcs=arcs, flow=flow, year=str(year))
+
+
+def read_result_csv(path, year=None, **kwargs) -> PlacementSolution:
+    """
+    Read a result file like `data/processed/result_2019.csv`, see `PlacementSolution.from_frame`.
+    """
+    return PlacementSolution.from_frame(pd.read_csv(path), year=year, **kwargs)
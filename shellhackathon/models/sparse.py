@@ -0,0 +1,197 @@
+"""
+Bulk construction of linear models from NumPy/SciPy arrays.
+
+Models are filled with `ModelBuilderHelper.fill_model_from_sparse_data` from a CSR constraint matrix, so no
+Python object is created per variable, constraint or coefficient. Solutions are read back in one call as
+well, see `variable_values`.
+"""
+import ctypes
+import os
+import sys
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Callable, List, Optional, Protocol, Union
+
+import numpy as np
+import scipy.sparse as sp
+import ortools.linear_solver.linear_solver_pb2 as linear_solver_pb2
+import ortools.linear_solver.pywraplp as pywraplp
+from ortools.linear_solver.python import model_builder_helper as mbh
+
+
+def build_model(lower, upper, objective, row_lower, row_upper, matrix: sp.spmatrix,
+                integer=None, name: str = '') -> mbh.ModelBuilderHelper:
+    """
+    Create a minimization model `min c'x s.t. row_lower <= Ax <= row_upper, lower <= x <= upper`.
+
+    Args:
+        lower, upper: variable bounds, use `np.inf` for unbounded variables
+        objective: objective coefficient per variable
+        row_lower, row_upper: constraint bounds, equal for equality constraints
+        matrix: constraint matrix of shape (num_constraints, num_variables)
+        integer: optional indices of integral variables
+
+    Examples:
+        >>> model = build_model([0, 0], [np.inf, np.inf], [1, 2], [3], [3], sp.csr_matrix([[1., 1.]]))
+        >>> model.num_variables(), model.num_constraints()
+        (2, 1)
+    """
+    model = mbh.ModelBuilderHelper()
+    model.set_name(name)
+    # the generated stubs of OR-Tools declare Eigen vector types that no NumPy array matches
+    fill: Callable[..., None] = model.fill_model_from_sparse_data
+    fill(np.asarray(lower, dtype=np.float64), np.asarray(upper, dtype=np.float64),
+         np.asarray(objective, dtype=np.float64), np.asarray(row_lower, dtype=np.float64),
+         np.asarray(row_upper, dtype=np.float64), sp.csr_matrix(matrix, dtype=np.float64))
+    if integer is not None:
+        for index in np.asarray(integer, dtype=np.int64):
+            model.set_var_integrality(int(index), True)
+    return model
+
+
+def _flush_c_stdout():
+    try:
+        ctypes.CDLL(None).fflush(None)
+    except (OSError, AttributeError, TypeError):  # no C library to load, e.g. on Windows
+        pass
+
+
+@contextmanager
+def capture_stdout(on_line: Callable[[str], None]):
+    """
+    Send every line written to the standard output file descriptor, by Python or by C++ code like the
+    solvers, to `on_line` while the context is active. The lines are passed on from a reader thread as they
+    are written; an exception raised by `on_line` is re-raised when the context ends.
+    """
+    sys.stdout.flush()
+    _flush_c_stdout()
+    read_end, write_end = os.pipe()
+    saved = os.dup(1)
+    os.dup2(write_end, 1)
+    os.close(write_end)
+
+    errors: List[Exception] = []
+
+    def read():
+        with os.fdopen(read_end, 'r', errors='replace') as lines:
+            for line in lines:
+                # keep reading after an error, a full pipe would block the writer
+                if not errors:
+                    try:
+                        on_line(line.rstrip('\n'))
+                    except Exception as error:
+                        errors.append(error)
+
+    reader = threading.Thread(target=read, daemon=True)
+    reader.start()
+    try:
+        yield
+    finally:
+        sys.stdout.flush()
+        _flush_c_stdout()
+        # closing the last write end ends the reader
+        os.dup2(saved, 1)
+        os.close(saved)
+        reader.join()
+    if errors:
+        raise errors[0]
+
+
+def solve_model(model: mbh.ModelBuilderHelper, solver_name: str = 'scip', time_limit: Optional[float] = None,
+                parameters: str = '', log_callback: Optional[Callable[[str], None]] = None) -> mbh.ModelSolverHelper:
+    """
+    Solve a model and return the solver helper, which exposes the primal and dual values as arrays.
+
+    `log_callback` is called with every line of the solver log while the solver runs, the standard output
+    is captured for that.
+
+    Examples:
+        >>> model = build_model([0, 0], [np.inf, np.inf], [1, 2], [3], [3], sp.csr_matrix([[1., 1.]]))
+        >>> solver = solve_model(model, 'glop')
+        >>> solver.status().name, solver.objective_value(), solver.variable_values()
+        ('OPTIMAL', 3.0, array([3., 0.]))
+    """
+    solver = mbh.ModelSolverHelper(solver_name)
+    if not solver.solver_is_supported():
+        raise ValueError(f'solver {solver_name!r} is not available in this OR-Tools build')
+    if time_limit is not None:
+        solver.set_time_limit_in_seconds(time_limit)
+    if parameters:
+        solver.set_solver_specific_parameters(parameters)
+    if log_callback is None:
+        solver.solve(model)
+    else:
+        # the log callbacks of the solver helper are not usable from Python
+        solver.enable_output(True)
+        with capture_stdout(log_callback):
+            solver.solve(model)
+    return solver
+
+
+class SolveResult(Protocol):
+    """
+    What `has_solution` needs of a solved model: a `ModelSolverHelper` or a `backends.PywraplpResult`.
+    """
+
+    def status(self) -> mbh.SolveStatus: ...
+
+
+def has_solution(solver: SolveResult) -> bool:
+    """
+    Return whether the last solve produced a primal solution, optimal or not.
+    """
+    return solver.status() in (mbh.SolveStatus.OPTIMAL, mbh.SolveStatus.FEASIBLE)
+
+
+def to_pywraplp(model: mbh.ModelBuilderHelper, solver_name: str = 'scip') -> pywraplp.Solver:
+    """
+    Load a bulk built model into a `pywraplp.Solver`, e.g. to change and re-solve it incrementally.
+
+    The model is passed as binary `MPModelProto`, which takes well below a second for the full placement
+    model.
+
+    Examples:
+        >>> model = build_model([0, 0], [np.inf, np.inf], [1, 2], [3], [3], sp.csr_matrix([[1., 1.]]))
+        >>> solver = to_pywraplp(model, 'glop')
+        >>> solver.Solve() == pywraplp.Solver.OPTIMAL, solver.Objective().Value()
+        (True, 3.0)
+    """
+    solver = pywraplp.Solver.CreateSolver(solver_name)
+    if solver is None:
+        raise ValueError(f'solver {solver_name!r} is not available in this OR-Tools build')
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'model.pb')
+        if not model.write_model_to_proto_file(path):
+            raise RuntimeError('could not export the model')
+        proto = linear_solver_pb2.MPModelProto()
+        with open(path, 'rb') as file:
+            proto.ParseFromString(file.read())
+    error = solver.LoadModelFromProto(proto)
+    if error:
+        raise RuntimeError(f'could not load the model: {error}')
+    return solver
+
+
+def variable_values(solver: Union[mbh.ModelSolverHelper, pywraplp.Solver]) -> np.ndarray:
+    """
+    All primal values of a solved model as one array, in the order the variables were created.
+
+    Works for the `ModelSolverHelper` of `solve_model` and for `pywraplp.Solver` models like the ones of the
+    solution notebooks, where it replaces calling `solution_value()` once per variable.
+
+    Examples:
+        >>> solver = pywraplp.Solver.CreateSolver('GLOP')
+        >>> x, y = solver.NumVar(0, 5, 'x'), solver.NumVar(0, 5, 'y')
+        >>> _ = solver.Add(x + y >= 3)
+        >>> solver.Minimize(x + 2 * y)
+        >>> solver.Solve() == pywraplp.Solver.OPTIMAL
+        True
+        >>> variable_values(solver)
+        array([3., 0.])
+    """
+    if isinstance(solver, pywraplp.Solver):
+        response = linear_solver_pb2.MPSolutionResponse()
+        solver.FillSolutionResponseProto(response)
+        return np.array(response.variable_value, dtype=np.float64)
+    return np.asarray(solver.variable_values(), dtype=np.float64)
@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+"""
+Charger placement for uncertain demand forecasts.
+
+The placement models take the point forecast of `Demand_Future.csv` as the demand. Here the forecast is a
+distribution instead: every demand scenario is the forecast of a random tree of the forest of the
+`DemandForecaster` (or the mean of a few random trees), the bootstrap distribution of the forest, which
+keeps the spatial correlation of the errors since one tree forecasts all demand points. The point forecast
+is the mean over all trees.
+
+The build plan is then chosen for all scenarios at once, as two-stage stochastic program: the chargers are
+built once, the assignment of the demand is the recourse of every scenario, and the expected costs are
+minimized, either
+
+- `benders`: exactly by the Benders decomposition of `shellhackathon.models.decomposition`, with one
+  transportation subproblem per scenario solved in a process pool, or
+- `saa`: by sample average approximation, solving the problem for several small batches of scenarios in
+  parallel and keeping the plan with the lowest costs over all scenarios. The mean objective of the batches
+  estimates a lower bound of the expected costs.
+
+Every plan is evaluated on every scenario by min-cost flow; demand that cannot be served costs `penalty`.
+"""
+# system imports
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from itertools import repeat
+from typing import Dict, Optional, Tuple
+
+# third-party
+import click
+import click_log
+import numpy as np
+import pandas as pd
+
+# project imports
+from shellhackathon.candidates import nearest_candidates
+from shellhackathon.models.decomposition import BendersSolver
+from shellhackathon.models.placement import ChargerPlacementModel
+from shellhackathon.models.solution import PlacementSolution
+from shellhackathon.models.train_model import DemandForecaster, history_years
+from shellhackathon.models.transportation import MinCostFlowEvaluator
+from shellhackathon.utils import coordinates
+
+
+##############################################################################
+logger = logging.getLogger(__name__)
+click_log.basic_config(logger)
+
+METHODS = ['benders', 'saa']
+
+
+##############################################################################
+def demand_scenarios(forecaster: DemandForecaster, history, num_scenarios: int, trees_per_scenario: int = 1,
+                     seed: int = 0, years=None) -> np.ndarray:
+    """
+    (scenarios, points, horizon) demand scenarios: the mean forecast of `trees_per_scenario` trees of the
+    forest of a fitted forecaster, drawn with replacement. One tree per scenario gives the spread of the
+    forecasts of the trees, all trees per scenario the bootstrap distribution of the forest mean.
+
+    Examples:
+        >>> rng = np.random.default_rng(0)
+        >>> history = rng.uniform(1, 10, (50, 1)) * 1.2 ** np.arange(9) * rng.uniform(0.9, 1.1, (50, 9))
+        >>> forecaster = DemandForecaster().fit(history)
+        >>> scenarios = demand_scenarios(forecaster, history, 20)
+        >>> scenarios.shape, bool((scenarios.std(axis=0) > 0).all())
+        ((20, 50, 2), True)
+    """
+    trees = forecaster.predict_trees(history, years)
+    draws = np.random.default_rng(seed).integers(0, len(trees), (num_scenarios, trees_per_scenario))
+    return trees[draws].mean(axis=1)
+
+
+def scenario_costs(model: ChargerPlacementModel, slow, fast, scenarios: np.ndarray,
+                   penalty: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Costs of a build plan and its unmet demand in every (scenarios, points) demand scenario.
+    """
+    penalty = 10 * (model.arcs.cost.max(initial=0) + 1) if penalty is None else penalty
+    slow, fast = np.asarray(slow, dtype=np.float64), np.asarray(fast, dtype=np.float64)
+    capacities = slow * model.slow_charger + fast * model.fast_charger
+    build = slow.sum() * model.slow_costs + fast.sum() * model.fast_costs
+    costs, unmet = np.empty(len(scenarios)), np.empty(len(scenarios))
+    for index, demands in enumerate(scenarios):
+        result = MinCostFlowEvaluator(demands, model.arcs, penalty=penalty).solve(capacities)
+        unmet[index] = result.unmet.sum()
+        costs[index] = build + result.flow @ model.arcs.cost + penalty * unmet[index]
+    return costs, unmet
+
+
+@dataclass
+class StochasticResult:
+    # the plan, with the assignment of the point forecast
+    solution: PlacementSolution
+    method: str
+    # costs and unmet demand of the plan in every scenario
+    costs: np.ndarray
+    unmet: np.ndarray
+    # valid (benders) or estimated (saa) lower bound of the expected costs
+    lower_bound: float
+    solve_time: float
+    # costs of the plan of the point forecast in every scenario, if compared
+    point_costs: Optional[np.ndarray] = None
+
+    @property
+    def expected_cost(self) -> float:
+        return float(self.costs.mean())
+
+    @property
+    def shortfall_probability(self) -> float:
+        """
+        Share of the scenarios in which the plan cannot serve all demand.
+        """
+        return float((self.unmet > 1e-9).mean())
+
+    @property
+    def value_of_stochastic_solution(self) -> float:
+        """
+        Expected savings against the plan of the point forecast.
+        """
+        return float(np.mean(self.point_costs) - self.expected_cost) if self.point_costs is not None else np.nan
+
+    def summary(self) -> Dict:
+        return dict(method=self.method, scenarios=len(self.costs), expected_cost=self.expected_cost,
+                    lower_bound=self.lower_bound, worst_cost=float(self.costs.max()),
+                    shortfall_probability=self.shortfall_probability,
+                    point_expected_cost=np.nan if self.point_costs is None else float(np.mean(self.point_costs)),
+                    value_of_stochastic_solution=self.value_of_stochastic_solution, solve_time=self.solve_time)
+
+
+def _solve_batch(model: ChargerPlacementModel, demands: np.ndarray, solver_kwargs: Dict):
+    solver = BendersSolver(model, demands=demands, **solver_kwargs)
+    solution = solver.solve()
+    return solution.slow, solution.fast, solver.lower_bound
+
+
+def solve_stochastic(model: ChargerPlacementModel, scenarios: np.ndarray, method: str = 'benders',
+                     replications: int = 4, workers: int = 0, compare: bool = False,
+                     penalty: Optional[float] = None, **solver_kwargs) -> StochasticResult:
+    """
+    Build plan with the lowest expected costs over (scenarios, points) demand scenarios of the model year.
+
+    Args:
+        model: the placement model, its demand (usually the point forecast) is only used for the assignment
+            of the returned solution
+        scenarios: equally likely demand scenarios
+        method: `benders` or `saa`, see the module
+        replications: number of scenario batches of `saa`
+        workers: number of processes, for the subproblems of `benders` and the batches of `saa`
+        compare: also evaluate the plan of the point forecast on the scenarios
+        penalty: costs of unmet demand
+        solver_kwargs: options of `BendersSolver`, e.g. `gap` and `time_limit`
+
+    Examples:
+        >>> supply = pd.DataFrame({'x_coordinate': [0., 10.], 'y_coordinate': [0., 0.],
+        ...                        'total_parking_slots': [2, 2], 'existing_num_SCS': [0, 0],
+        ...                        'existing_num_FCS': [0, 0]})
+        >>> demand = pd.DataFrame({'x_coordinate': [1., 9.], 'y_coordinate': [0., 0.], '2019': [150., 150.]})
+        >>> model = ChargerPlacementModel(supply, demand, 2019)
+        >>> result = solve_stochastic(model, [[150., 150.], [150., 350.]], compare=True)
+        >>> result.solution.slow, result.solution.fast, result.costs, result.lower_bound
+        (array([1., 0.]), array([0., 1.]), array([1800., 2000.]), 1900.0)
+
+        The plan of the point forecast cannot serve the second scenario:
+
+        >>> result.point_costs, result.value_of_stochastic_solution
+        (array([ 1500., 12000.]), 4850.0)
+    """
+    if method not in METHODS:
+        raise ValueError(f'unknown method {method}, use one of {", ".join(METHODS)}')
+    scenarios = np.atleast_2d(np.asarray(scenarios, dtype=np.float64))
+    start = time.perf_counter()
+    if method == 'benders':
+        solver = BendersSolver(model, demands=scenarios, workers=workers, penalty=penalty, **solver_kwargs)
+        solution = solver.solve()
+        slow, fast, lower_bound = solution.slow, solution.fast, solver.lower_bound
+        costs, unmet = scenario_costs(model, slow, fast, scenarios, penalty)
+    else:
+        batches = np.array_split(scenarios, min(replications, len(scenarios)))
+        batch_kwargs = dict(solver_kwargs, penalty=penalty)
+        if workers:
+            with ProcessPoolExecutor(workers) as executor:
+                plans = list(executor.map(_solve_batch, repeat(model), batches, repeat(batch_kwargs)))
+                evaluations = list(executor.map(scenario_costs, repeat(model), [plan[0] for plan in plans],
+                                                [plan[1] for plan in plans], repeat(scenarios), repeat(penalty)))
+        else:
+            plans = [_solve_batch(model, batch, batch_kwargs) for batch in batches]
+            evaluations = [scenario_costs(model, slow, fast, scenarios, penalty) for slow, fast, _ in plans]
+        best = int(np.argmin([costs.mean() for costs, _ in evaluations]))
+        slow, fast, _ = plans[best]
+        costs, unmet = evaluations[best]
+        # the mean optimum of the batches underestimates the optimum over all scenarios in expectation
+        lower_bound = float(np.mean([bound for _, _, bound in plans]))
+    solve_time = time.perf_counter() - start
+
+    point_costs = None
+    if compare:
+        point = BendersSolver(model, penalty=penalty, **solver_kwargs).solve()
+        point_costs, _ = scenario_costs(model, point.slow, point.fast, scenarios, penalty)
+    return StochasticResult(solution=model.reassign(slow, fast), method=method, costs=costs, unmet=unmet,
+                            lower_bound=lower_bound, solve_time=solve_time, point_costs=point_costs)
+
+
+def plan_for_forecast(supply: pd.DataFrame, history: pd.DataFrame, year, num_scenarios: int = 20,
+                      trees_per_scenario: int = 1, k: Optional[int] = 5,
+                      forecaster: Optional[DemandForecaster] = None, seed: int = 0,
+                      **kwargs) -> StochasticResult:
+    """
+    Forecast the demand of `year` from the history and place chargers for the demand scenarios of the
+    forecast.
+
+    Args:
+        supply: the existing infrastructure the plan starts from
+        history: demand table with the history years
+        year: a year after the history, within the horizon of the forecaster
+        num_scenarios, trees_per_scenario: see `demand_scenarios`
+        k: candidate parking slots per demand point, all for `None`
+        forecaster: fitted forecaster, by default a `DemandForecaster` is fitted on the history
+        seed: of the scenario draws
+        kwargs: see `solve_stochastic`
+    """
+    step = int(year) - int(history_years(history)[-1])
+    if forecaster is None:
+        forecaster = DemandForecaster(horizon=max(step, 1)).fit(history)
+    if not 1 <= step <= forecaster.horizon:
+        raise ValueError(f'{year} is not within the {forecaster.horizon} years after the history')
+    scenarios = demand_scenarios(forecaster, history, num_scenarios, trees_per_scenario, seed)[..., step - 1]
+    point = forecaster.predict(history)[:, step - 1]
+    other = [column for column in history.columns if not str(column).isdigit()]
+    demand = history[other].assign(**{str(year): point})
+    candidates = None if k is None else nearest_candidates(coordinates(demand), coordinates(supply), k=k)
+    model = ChargerPlacementModel(supply, demand, year, candidates=candidates)
+    logger.info(f'{num_scenarios} scenarios of {year}, total demand {scenarios.sum(axis=1).min():.0f} to '
+                f'{scenarios.sum(axis=1).max():.0f}, point forecast {point.sum():.0f}')
+    return solve_stochastic(model, scenarios, **kwargs)
+
+
+##############################################################################
+@click.command()
+@click_log.simple_verbosity_option(logger)
+@click.argument('history_filepath', type=click.Path(exists=True))
+@click.argument('supply_filepath', type=click.Path(exists=True))
+@click.argument('output_filepath', type=click.Path())
+@click.option('--year', default='2019', help='year of the plan, after the history')
+@click.option('--scenarios', 'num_scenarios', default=20)
+@click.option('--trees-per-scenario', default=1)
+@click.option('--method', default='benders', type=click.Choice(METHODS))
+@click.option('--replications', default=4, help='scenario batches of saa')
+@click.option('--k', default=5, help='candidate parking slots per demand point (0 = all)')
+@click.option('--workers', default=4)
+@click.option('--gap', default=1e-3)
+@click.option('--time-limit', default=600.0)
+@click.option('--compare', is_flag=True, help='also evaluate the plan of the point forecast')
+def main(history_filepath, supply_filepath, output_filepath, year, num_scenarios, trees_per_scenario, method,
+         replications, k, workers, gap, time_limit, compare):
+    """
+    Plan the chargers of YEAR for the demand scenarios of the forecast of the history in HISTORY_FILEPATH,
+    starting from the infrastructure in SUPPLY_FILEPATH, and write the plan to OUTPUT_FILEPATH.
+    """
+    from shellhackathon.data.make_dataset import load_frame
+    result = plan_for_forecast(load_frame(supply_filepath), load_frame(history_filepath), year, num_scenarios,
+                               trees_per_scenario, k=k or None, method=method, replications=replications,
+                               workers=workers, compare=compare, gap=gap, time_limit=time_limit)
+    result.solution.to_frame().to_csv(output_filepath, index=False)
+    click.echo(pd.Series(result.summary()).to_string())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""
+Writing submissions in the `(year, data_type, demand_point_index, supply_point_index, value)` format.
+
+The rows are streamed from the solution arrays to disk chunk by chunk (see `PlacementSolution.iter_frames`),
+so memory stays flat regardless of the number of demand/supply pairs. Besides the CSV of the submission,
+Parquet and Feather copies can be written in the same pass for internal use.
+"""
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Protocol, Sequence, TextIO, Union
+
+import pandas as pd
+
+from shellhackathon.models.solution import PlacementSolution
+
+SUBMISSION_COLUMNS = ['year', 'data_type', 'demand_point_index', 'supply_point_index', 'value']
+FORMATS = ('csv', 'parquet', 'feather')
+
+
+def _as_list(solutions) -> List[PlacementSolution]:
+    if isinstance(solutions, PlacementSolution):
+        return [solutions]
+    if isinstance(solutions, dict):
+        return list(solutions.values())
+    return list(solutions)
+
+
+def iter_submission(solutions: Union[PlacementSolution, Dict[str, PlacementSolution], Iterable[PlacementSolution]],
+                    zero_rows: bool = False, chunk_size: int = 100_000) -> Iterator[pd.DataFrame]:
+    """
+    Rows of the submission of one or several years in chunks.
+
+    Args:
+        solutions: a solution, or several ones (e.g. of `MultiYearPlacementModel.solve_years`) in year order
+        zero_rows: whether the target format requires a `DS` row for every demand/supply pair, like the
+            result files of the solution notebooks. Otherwise only rows with non-zero flow are written.
+        chunk_size: maximal number of `DS` rows per chunk
+    """
+    for solution in _as_list(solutions):
+        yield from solution.iter_frames(all_pairs=zero_rows, nonzero=not zero_rows, chunk_size=chunk_size)
+
+
+class TableWriter(Protocol):
+    """
+    The part of the Parquet and Feather writers of `pyarrow` that is used here.
+    """
+
+    def write_table(self, table) -> None: ...
+
+    def close(self) -> None: ...
+
+
+def _arrow_schema():
+    import pyarrow as pa
+    return pa.schema([('year', pa.int64()), ('data_type', pa.string()), ('demand_point_index', pa.int64()),
+                      ('supply_point_index', pa.int64()), ('value', pa.float64())])
+
+
+def write_submission(solutions, path, zero_rows: bool = False, formats: Sequence[str] = ('csv',),
+                     chunk_size: int = 100_000) -> List[Path]:
+    """
+    Stream a submission to disk, one file per format with the suffix of the format.
+
+    Args:
+        solutions: see `iter_submission`
+        path: target file, e.g. `data/processed/submission.csv`; the suffix is replaced per format
+        zero_rows: see `iter_submission`
+        formats: any of `csv`, `parquet` and `feather`; the binary formats need `pyarrow`
+        chunk_size: maximal number of `DS` rows held in memory
+
+    Returns the paths written.
+
+    Examples:
+        >>> import tempfile
+        >>> import numpy as np
+        >>> from shellhackathon.candidates import CandidateArcs
+        >>> arcs = CandidateArcs.dense(np.array([[1., 2.], [3., 4.]]))
+        >>> solution = PlacementSolution.from_values([10., 0., 0., 20., 1., 0., 0., 1.], arcs, year=2019)
+        >>> with tempfile.TemporaryDirectory() as directory:
+        ...     paths = write_submission(solution, Path(directory) / 'submission.csv')
+        ...     print(paths[0].read_text())
+        year,data_type,demand_point_index,supply_point_index,value
+        2019,SCS,,0,1.0
+        2019,SCS,,1,0.0
+        2019,FCS,,0,0.0
+        2019,FCS,,1,1.0
+        2019,DS,0,0,10.0
+        2019,DS,1,1,20.0
+        <BLANKLINE>
+    """
+    unknown = set(formats) - set(FORMATS)
+    if unknown:
+        raise ValueError(f'unknown submission formats {sorted(unknown)}, use any of {FORMATS}')
+    path = Path(path)
+    paths = [path.with_suffix(f'.{fmt}') for fmt in formats]
+    if set(formats) - {'csv'}:
+        # optional dependency, only needed for the binary formats
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        schema = _arrow_schema()
+
+    csv_file: Optional[TextIO] = None
+    writers: List[TableWriter] = []
+    try:
+        for fmt, target in zip(formats, paths):
+            if fmt == 'csv':
+                csv_file = open(target, 'w', newline='')
+            elif fmt == 'parquet':
+                writers.append(pq.ParquetWriter(target, schema))
+            else:
+                writers.append(pa.ipc.new_file(target, schema))
+
+        header = True
+        for chunk in iter_submission(solutions, zero_rows=zero_rows, chunk_size=chunk_size):
+            if csv_file is not None:
+                chunk.to_csv(csv_file, header=header, index=False)
+            if writers:
+                table = pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+                for writer in writers:
+                    writer.write_table(table)
+            header = False
+    finally:
+        if csv_file is not None:
+            csv_file.close()
+        for writer in writers:
+            writer.close()
+    return paths
+
+
+def read_submission(path) -> pd.DataFrame:
+    """
+    Read a submission written by `write_submission` in any of its formats.
+    """
+    path = Path(path)
+    if path.suffix == '.parquet':
+        frame = pd.read_parquet(path)
+    elif path.suffix == '.feather':
+        frame = pd.read_feather(path)
+    else:
+        frame = pd.read_csv(path)
+    frame['demand_point_index'] = frame['demand_point_index'].astype('Int64')
+    return frame[SUBMISSION_COLUMNS]
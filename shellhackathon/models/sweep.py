@@ -0,0 +1,275 @@
+# -*- coding: utf-8 -*-
+"""
+Parallel scenario sweeps over the parameters of the placement model.
+
+A sweep is a dict of parameter lists, expanded with `utils.dict_product`:
+
+    {'slow_costs': [600, 700], 'fast_costs': [900, 1000], 'demand_scale': [1.0, 1.1], 'k': [5, None]}
+
+Parameters that change the structure of the model (`year` and the candidate arcs `k`) are computed once per
+variant: the candidate arcs in the parent process, sent to every worker once, and the `ChargerPlacementModel`
+of the variant (its distance costs, demands and bounds) once per worker. All other parameters (costs,
+capacities, demand scaling, solver) only change coefficients; a scenario copies the model of its variant,
+sets them and solves, which emits and fills the solver model again. That bulk build takes a fraction of a
+second even for the full hackathon instance, far less than the solve.
+Results are appended to a Parquet table (a directory of part files) as they come in, so a sweep can be
+interrupted and resumed: scenarios already in the table are skipped.
+"""
+# system imports
+import copy
+import hashlib
+import json
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Union
+
+# third-party
+import click
+import click_log
+import numpy as np
+import pandas as pd
+
+# project imports
+from shellhackathon.candidates import CandidateArcs, nearest_candidates
+from shellhackathon.data.demand_store import DemandStore
+from shellhackathon.distance import distance_matrix
+from shellhackathon.models.backends import get_backend
+from shellhackathon.models.heuristics import solve_lns
+from shellhackathon.models.placement import ChargerPlacementModel
+from shellhackathon.utils import FAST_CHARGER, FAST_COSTS, SLOW_CHARGER, SLOW_COSTS, coordinates, dict_product
+
+
+##############################################################################
+logger = logging.getLogger(__name__)
+click_log.basic_config(logger)
+
+DEFAULTS = {
+    'year': '2019',
+    'k': None,
+    'slow_costs': SLOW_COSTS,
+    'fast_costs': FAST_COSTS,
+    'slow_charger': SLOW_CHARGER,
+    'fast_charger': FAST_CHARGER,
+    'demand_scale': 1.0,
+    'solver': 'scip',
+    'time_limit': 60.0,
+}
+# parameters that change the variables of the model
+STRUCTURAL = ('year', 'k')
+
+
+##############################################################################
+def scenario_id(params: Dict) -> str:
+    """
+    Stable id of a scenario, the same parameters always get the same id.
+
+    Examples:
+        >>> scenario_id({'k': 5, 'solver': 'scip'}) == scenario_id({'solver': 'scip', 'k': 5})
+        True
+    """
+    text = json.dumps(params, sort_keys=True, default=str)
+    return hashlib.sha1(text.encode()).hexdigest()[:12]
+
+
+def expand(grid: Dict[str, Iterable]) -> List[Dict]:
+    """
+    All scenarios of a parameter grid, completed with the defaults and sorted by structural variant.
+
+    Examples:
+        >>> scenarios = expand({'slow_costs': [600, 700], 'k': [5]})
+        >>> [(s['slow_costs'], s['k'], s['solver']) for s in scenarios]
+        [(600, 5, 'scip'), (700, 5, 'scip')]
+    """
+    unknown = set(grid) - set(DEFAULTS)
+    if unknown:
+        raise ValueError(f'unknown sweep parameters {sorted(unknown)}, use any of {sorted(DEFAULTS)}')
+    scenarios = []
+    for params in dict_product({key: list(values) for key, values in grid.items()}):
+        scenario = dict(DEFAULTS, **params)
+        scenario['year'] = str(scenario['year'])
+        scenario['scenario_id'] = scenario_id(scenario)
+        scenarios.append(scenario)
+    return sorted(scenarios, key=lambda scenario: tuple(str(scenario[key]) for key in STRUCTURAL))
+
+
+def variant_candidates(supply: pd.DataFrame, demand: Union[pd.DataFrame, DemandStore], scenarios: List[Dict]) -> Dict:
+    """
+    Candidate arcs of every structural variant of the scenarios.
+    """
+    customers, facilities = coordinates(demand), coordinates(supply)
+    candidates: Dict = {}
+    for k in {scenario['k'] for scenario in scenarios}:
+        if k is None:
+            candidates[k] = CandidateArcs.dense(distance_matrix(customers, facilities))
+        else:
+            candidates[k] = nearest_candidates(customers, facilities, k=int(k))
+    return candidates
+
+
+##############################################################################
+# data of the worker processes, sent once when the pool starts
+_worker_data: Dict = {}
+
+
+def _init_worker(supply, demand, candidates, threads):
+    _worker_data.update(supply=supply, demand=demand, candidates=candidates, threads=threads, models={})
+
+
+def _base_model(year: str, k) -> ChargerPlacementModel:
+    models = _worker_data['models']
+    if (year, k) not in models:
+        models[year, k] = ChargerPlacementModel(_worker_data['supply'], _worker_data['demand'], year,
+                                                candidates=_worker_data['candidates'][k])
+    return models[year, k]
+
+
+def run_scenario(params: Dict) -> Dict:
+    """
+    Solve one scenario in a worker, see `run_sweep`.
+    """
+    base = _base_model(params['year'], params['k'])
+    model = copy.copy(base)
+    model.hints = {}
+    model.slow_costs, model.fast_costs = params['slow_costs'], params['fast_costs']
+    model.slow_charger, model.fast_charger = params['slow_charger'], params['fast_charger']
+    if params['demand_scale'] != 1:
+        if not isinstance(base.demand, pd.DataFrame):
+            raise TypeError('demand scaling needs the demand as DataFrame, not as DemandStore')
+        model.demand = base.demand.assign(**{base.year: base.demand[base.year] * params['demand_scale']})
+        model.demands = base.demands * params['demand_scale']
+
+    row = dict(params, status='ERROR', objective=np.nan, best_bound=np.nan, wall_time=np.nan,
+               num_slow=np.nan, num_fast=np.nan, new_slow=np.nan, new_fast=np.nan, error='')
+    start = time.perf_counter()
+    try:
+        if params['solver'] == 'lns':
+            solution = solve_lns(model, k=None, time_limit=params['time_limit'])
+        else:
+            backend = get_backend(params['solver'], time_limit=params['time_limit'], threads=_worker_data['threads'])
+            solution = model.solve(backend)
+        row.update(status=solution.status, objective=solution.objective, best_bound=solution.best_bound,
+                   num_slow=solution.slow.sum(), num_fast=solution.fast.sum(),
+                   new_slow=(solution.slow - model.existing_slow).sum(),
+                   new_fast=(solution.fast - model.existing_fast).sum())
+    except Exception as error:  # a failing scenario must not stop an overnight sweep
+        row['error'] = repr(error)
+    row['wall_time'] = time.perf_counter() - start
+    return row
+
+
+##############################################################################
+class SweepTable:
+    """
+    Append-only Parquet table of sweep results, one part file per batch of results.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+    def parts(self) -> List[Path]:
+        return sorted(self.path.glob('part-*.parquet'))
+
+    def append(self, rows: List[Dict]):
+        if not rows:
+            return
+        self.path.mkdir(parents=True, exist_ok=True)
+        frame = pd.DataFrame(rows)
+        # fixed types, so that all parts share one schema
+        frame['k'] = frame['k'].astype('Int64')
+        frame['error'] = frame['error'].astype(str)
+        frame.to_parquet(self.path / f'part-{time.time_ns()}.parquet', index=False)
+
+    def read(self) -> pd.DataFrame:
+        parts = self.parts()
+        if not parts:
+            return pd.DataFrame()
+        return pd.concat([pd.read_parquet(part) for part in parts], ignore_index=True)
+
+    def completed(self) -> set:
+        return {part_id for part in self.parts()
+                for part_id in pd.read_parquet(part, columns=['scenario_id'])['scenario_id']}
+
+
+def run_sweep(supply: pd.DataFrame, demand: Union[pd.DataFrame, DemandStore], grid: Dict[str, Iterable], path,
+              workers: int = 0, threads: int = 1, flush_every: int = 10, resume: bool = True,
+              callback: Optional[Callable[[Dict], None]] = None) -> pd.DataFrame:
+    """
+    Solve all scenarios of a parameter grid and append the results to the Parquet table at `path`.
+
+    Args:
+        supply, demand: the instance, as for `ChargerPlacementModel`; a `DemandStore` only without
+            `demand_scale`
+        grid: list of values per parameter, see `DEFAULTS` for the parameters. `solver` is a backend like `scip`,
+            `highs` or `cp-sat` (see `shellhackathon.models.backends`), or `lns` for the heuristic; `k` the
+            number of candidate parking slots per demand point, `None` for all.
+        path: directory of the result table
+        workers: number of processes, 0 solves in this process
+        threads: solver threads per worker, so that `workers * threads` matches the cores
+        flush_every: number of results written per part file
+        resume: skip scenarios whose results are already in the table
+        callback: called with the result row of every finished scenario
+
+    Returns the full result table.
+    """
+    table = SweepTable(path)
+    scenarios = expand(grid)
+    if not isinstance(demand, pd.DataFrame) and any(scenario['demand_scale'] != 1 for scenario in scenarios):
+        # the scaled demand is assigned to a copy of the table
+        raise TypeError('demand scaling needs the demand as DataFrame, not as DemandStore')
+    if resume:
+        done = table.completed()
+        scenarios = [scenario for scenario in scenarios if scenario['scenario_id'] not in done]
+    logger.info(f'{len(scenarios)} scenarios to solve')
+    if not scenarios:
+        return table.read()
+
+    initargs = (supply, demand, variant_candidates(supply, demand, scenarios), threads)
+    rows = []
+
+    def collect(row):
+        rows.append(row)
+        if callback is not None:
+            callback(row)
+        if len(rows) >= flush_every:
+            table.append(rows)
+            rows.clear()
+
+    try:
+        if workers:
+            with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=initargs) as executor:
+                for future in as_completed([executor.submit(run_scenario, scenario) for scenario in scenarios]):
+                    collect(future.result())
+        else:
+            _init_worker(*initargs)
+            for scenario in scenarios:
+                collect(run_scenario(scenario))
+    finally:
+        table.append(rows)
+    return table.read()
+
+
+##############################################################################
+@click.command()
+@click_log.simple_verbosity_option(logger)
+@click.argument('grid_json', type=click.Path(exists=True))
+@click.argument('output_path', type=click.Path())
+@click.option('--supply-csv', default='data/raw/exisiting_EV_infrastructure_2018.csv', type=click.Path(exists=True))
+@click.option('--demand-csv', default='data/processed/Demand_Future.csv', type=click.Path(exists=True))
+@click.option('--workers', default=4)
+@click.option('--threads', default=1, help='solver threads per worker')
+def main(grid_json, output_path, supply_csv, demand_csv, workers, threads):
+    """
+    Run the sweep of GRID_JSON (a JSON object of parameter lists) and append the results to OUTPUT_PATH.
+    """
+    with open(grid_json) as file:
+        grid = json.load(file)
+    results = run_sweep(pd.read_csv(supply_csv), pd.read_csv(demand_csv), grid, output_path, workers=workers,
+                        threads=threads, callback=lambda row: logger.info(
+                            f"{row['scenario_id']} {row['status']} {row['objective']:.1f}"))
+    click.echo(results.to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
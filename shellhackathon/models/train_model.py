@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+"""
+Multi-horizon demand forecasting with lag windows.
+
+The notebooks fit an `ExtraTreesRegressor` on all columns but 2018 and forecast 2019 and 2020 by dropping the
+oldest year(s), so the demand point index and the coordinates are features and every feature shifts by one
+year between fit and predict. Here every demand point contributes one sample per origin year `t` instead:
+
+- features: the demand of the `window` years before `t`, taken from a sliding window view of the (points,
+  years) demand matrix, so the tensor of all points and origins is built without Python loops
+- targets: the demand of the years `t`, ..., `t + horizon - 1`
+
+The windows of all historical origins are stacked into one training set and a single multi-output estimator
+predicts all horizons at once (direct multi-step forecasting, no feeding back of forecasts), so the
+forecast of any horizon is one batched `predict`. With `relative` (the default) windows and targets are
+divided by the last demand of the window, since demand grows every year and trees cannot predict values beyond
+the ones they were trained on. The log of the last demand is an extra feature: growth slows down as demand
+saturates, and without the level the trees would forecast the growth of the early years. Demand points
+without demand in the last year are forecast as zero.
+"""
+# system imports
+import json
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+
+# third-party
+import click
+import click_log
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+# project imports
+from shellhackathon.utils import demand_values
+
+
+##############################################################################
+logger = logging.getLogger(__name__)
+click_log.basic_config(logger)
+
+# demand below counts as zero, for the relative scaling and the MAPE
+ZERO_DEMAND = 1e-9
+
+
+##############################################################################
+def history_years(demand) -> List[str]:
+    """
+    Year columns of a demand table or `DemandStore`, in order.
+
+    Examples:
+        >>> history_years(pd.DataFrame(columns=['demand_point_index', 'x_coordinate', '2011', '2010']))
+        ['2010', '2011']
+    """
+    years = demand.years if hasattr(demand, 'years') else [str(column) for column in demand.columns]
+    return sorted(year for year in years if year.isdigit())
+
+
+def history_matrix(demand, years=None) -> np.ndarray:
+    """
+    (points, years) demand matrix of a demand table, `DemandStore` or array, by default of all years.
+    """
+    if isinstance(demand, np.ndarray):
+        return demand if years is None else demand[:, list(years)]
+    return demand_values(demand, list(history_years(demand) if years is None else years))
+
+
+def lag_windows(demand: np.ndarray, window: int, horizon: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Stacked lag windows of all demand points and origins: features (samples, window) and targets
+    (samples, horizon), ordered by origin and then demand point.
+
+    Examples:
+        >>> features, targets = lag_windows(np.array([[1., 2., 3., 4., 5.]]), window=2, horizon=2)
+        >>> features.tolist(), targets.tolist()
+        ([[1.0, 2.0], [2.0, 3.0]], [[3.0, 4.0], [4.0, 5.0]])
+    """
+    num_years = demand.shape[1]
+    if num_years < window + horizon:
+        raise ValueError(f'{window} + {horizon} years are needed for a lag window, but there are {num_years}')
+    # (points, origins, window + horizon) view, transposed so that the samples of one origin are consecutive
+    series = sliding_window_view(demand, window + horizon, axis=1).transpose(1, 0, 2)
+    return series[..., :window].reshape(-1, window), series[..., window:].reshape(-1, horizon)
+
+
+def forecast_errors(actual: np.ndarray, forecast: np.ndarray) -> Dict[str, float]:
+    """
+    MAE and MAPE of a forecast; the MAPE skips demand points without actual demand, like the notebooks.
+
+    Examples:
+        >>> forecast_errors(np.array([0., 10., 20.]), np.array([1., 11., 18.]))
+        {'mae': 1.3333333333333333, 'mape': 0.1}
+    """
+    actual = np.asarray(actual, dtype=np.float64)
+    forecast = np.asarray(forecast, dtype=np.float64)
+    nonzero = np.abs(actual) > ZERO_DEMAND
+    return {'mae': float(np.abs(forecast - actual).mean()),
+            'mape': float(np.abs((forecast[nonzero] - actual[nonzero]) / actual[nonzero]).mean())}
+
+
+def default_estimator(n_jobs: Optional[int] = None, random_state: Optional[int] = 0):
+    from sklearn.ensemble import ExtraTreesRegressor
+    return ExtraTreesRegressor(n_estimators=100, min_samples_leaf=5, n_jobs=n_jobs, random_state=random_state)
+
+
+def supports_multi_output(estimator) -> bool:
+    """
+    Whether a scikit-learn estimator fits several targets at once, from its tags; `get_tags` is only
+    available from scikit-learn 1.6 on, older versions have `_get_tags`.
+
+    Examples:
+        >>> from sklearn.ensemble import ExtraTreesRegressor, HistGradientBoostingRegressor
+        >>> supports_multi_output(ExtraTreesRegressor()), supports_multi_output(HistGradientBoostingRegressor())
+        (True, False)
+    """
+    try:
+        from sklearn.utils import get_tags
+    except ImportError:
+        return bool(estimator._get_tags().get('multioutput', False))
+    return get_tags(estimator).target_tags.multi_output
+
+
+class DemandForecaster:
+    """
+    Direct multi-horizon forecaster on stacked lag windows.
+
+    Args:
+        estimator: scikit-learn regressor, an `ExtraTreesRegressor` by default; estimators without
+            multi-output support are fitted once per horizon
+        window: number of past years used as features
+        horizon: number of future years forecast at once
+        relative: scale windows and targets by the last demand of the window
+        n_jobs: parallel jobs of the estimator, or of the per-horizon fits
+
+    Examples:
+        >>> years = np.arange(2010, 2019)
+        >>> rng = np.random.default_rng(0)
+        >>> demand = rng.uniform(1, 10, (50, 1)) * 1.2 ** (years - 2010)
+        >>> forecaster = DemandForecaster(window=3, horizon=2).fit(demand)
+        >>> forecast = forecaster.predict(demand)
+        >>> forecast.shape, bool(np.allclose(forecast, demand[:, -1:] * [1.2, 1.44], rtol=0.01))
+        ((50, 2), True)
+    """
+
+    def __init__(self, estimator=None, window: int = 2, horizon: int = 2, relative: bool = True,
+                 n_jobs: Optional[int] = None):
+        self.estimator = estimator
+        self.window = window
+        self.horizon = horizon
+        self.relative = relative
+        self.n_jobs = n_jobs
+        self.model_ = None
+        self.fit_time_ = np.nan
+
+    def _model(self):
+        from sklearn.base import clone
+        from sklearn.multioutput import MultiOutputRegressor
+        model = default_estimator(self.n_jobs) if self.estimator is None else clone(self.estimator)
+        if self.n_jobs is not None and 'n_jobs' in model.get_params():
+            model.set_params(n_jobs=self.n_jobs)
+        if self.horizon > 1 and not supports_multi_output(model):
+            model = MultiOutputRegressor(model, n_jobs=self.n_jobs)
+        return model
+
+    def config(self) -> Dict:
+        """
+        Everything that changes the fitted model: the features and the estimator with its parameters, but not
+        the number of jobs.
+
+        Examples:
+            >>> config = DemandForecaster(window=3).config()
+            >>> config['window'], config['estimator'], config['params']['n_estimators']
+            (3, 'ExtraTreesRegressor', 100)
+        """
+        estimator = default_estimator() if self.estimator is None else self.estimator
+        params = {name: value for name, value in estimator.get_params(deep=False).items() if name != 'n_jobs'}
+        return dict(window=self.window, horizon=self.horizon, relative=self.relative,
+                    estimator=type(estimator).__name__, params=json.loads(json.dumps(params, default=repr)))
+
+    def _features(self, windows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Features of lag windows and the divisor of every sample: the windows relative to their last demand
+        and the log of the last demand, or the windows and 1 without relative scaling.
+        """
+        if not self.relative:
+            return windows, np.ones(len(windows))
+        scale = windows[:, -1]
+        safe = np.where(scale > ZERO_DEMAND, scale, 1.0)
+        return np.column_stack([windows / safe[:, None], np.log1p(scale)]), scale
+
+    def fit(self, demand, years=None) -> 'DemandForecaster':
+        """
+        Fit on all lag windows of the history of a demand table, `DemandStore` or (points, years) array.
+        """
+        start = time.perf_counter()
+        windows, targets = lag_windows(history_matrix(demand, years), self.window, self.horizon)
+        features, scale = self._features(windows)
+        if self.relative:
+            # nothing to learn from points without demand, they are forecast as zero
+            keep = scale > ZERO_DEMAND
+            features, targets, scale = features[keep], targets[keep], scale[keep]
+        targets = targets / scale[:, None]
+        self.model_ = self._model().fit(features, targets[:, 0] if self.horizon == 1 else targets)
+        self.fit_time_ = time.perf_counter() - start
+        return self
+
+    def predict(self, demand, years=None) -> np.ndarray:
+        """
+        (points, horizon) forecast of the years after the history, from the last `window` years.
+        """
+        if self.model_ is None:
+            raise RuntimeError('the forecaster has not been fitted')
+        features, scale = self._features(history_matrix(demand, years)[:, -self.window:])
+        return self._unscale(self.model_.predict(features), scale)
+
+    def predict_trees(self, demand, years=None) -> np.ndarray:
+        """
+        (trees, points, horizon) forecasts of every tree of a forest estimator, whose mean is the forecast of
+        `predict`. Their spread is the uncertainty of the forecast, see `shellhackathon.models.stochastic`.
+        """
+        if self.model_ is None:
+            raise RuntimeError('the forecaster has not been fitted')
+        features, scale = self._features(history_matrix(demand, years)[:, -self.window:])
+        if not (hasattr(self.model_, 'estimators_') and hasattr(self.model_, 'n_outputs_')):
+            raise ValueError(f'{type(self.model_).__name__} is not a forest')
+        return np.stack([self._unscale(tree.predict(features), scale) for tree in self.model_.estimators_])
+
+    def _unscale(self, prediction: np.ndarray, scale: np.ndarray) -> np.ndarray:
+        forecast = prediction.reshape(len(scale), self.horizon) * scale[:, None]
+        if self.relative:
+            forecast[scale <= ZERO_DEMAND] = 0.0
+        return forecast
+
+    def forecast(self, demand: pd.DataFrame, years=None) -> pd.DataFrame:
+        """
+        The demand table with a column for every forecast year, like `Demand_Future.csv`.
+        """
+        history = history_years(demand) if years is None else [str(year) for year in years]
+        forecast = self.predict(demand, history)
+        future = [str(int(history[-1]) + step) for step in range(1, self.horizon + 1)]
+        return demand.assign(**{year: forecast[:, step] for step, year in enumerate(future)})
+
+
+def notebook_forecast(demand: pd.DataFrame, years, horizon: int = 2, random_state: Optional[int] = 42,
+                      n_jobs: Optional[int] = None) -> np.ndarray:
+    """
+    The forecast of `demand_prediction_AM_v2.ipynb` for comparison: an `ExtraTreesRegressor` fitted on 70% of
+    the demand points to predict the last year from all other columns (including index and coordinates),
+    applied recursively with the oldest year dropped for every further year.
+    """
+    from sklearn.ensemble import ExtraTreesRegressor
+    from sklearn.model_selection import train_test_split
+    years = [str(year) for year in years]
+    other = [column for column in demand.columns if not str(column).isdigit()]
+    table = demand[other + years].to_numpy(dtype=np.float64)
+    features, target = table[:, :-1], table[:, -1]
+    train, _, target_train, _ = train_test_split(features, target, test_size=0.3, random_state=random_state)
+    model = ExtraTreesRegressor(n_jobs=n_jobs, random_state=random_state).fit(train, target_train)
+    forecast = []
+    for step in range(horizon):
+        # drop the oldest year, the columns shift by one year against the fit
+        table = np.delete(table, len(other), axis=1)
+        forecast.append(model.predict(table))
+        table = np.column_stack([table, forecast[-1]])
+    return np.column_stack(forecast)
+
+
+##############################################################################
+@click.command()
+@click_log.simple_verbosity_option(logger)
+@click.argument('input_filepath', type=click.Path(exists=True))
+@click.argument('output_filepath', type=click.Path())
+@click.option('--window', default=2, help='past years used as features')
+@click.option('--horizon', default=2, help='future years to forecast')
+@click.option('--n-jobs', default=-1)
+def main(input_filepath, output_filepath, window, horizon, n_jobs):
+    """
+    Forecast the next HORIZON years of the demand history in INPUT_FILEPATH and write the demand table with
+    the forecast years to OUTPUT_FILEPATH.
+    """
+    from shellhackathon.data.make_dataset import load_frame
+    demand = load_frame(input_filepath)
+    forecaster = DemandForecaster(window=window, horizon=horizon, n_jobs=n_jobs).fit(demand)
+    logger.info(f'fitted on {len(history_years(demand))} years in {forecaster.fit_time_:.2f} s')
+    forecaster.forecast(demand).to_csv(output_filepath, index=False)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,202 @@
+"""
+Transportation problem: serve all demand points from parking slots with fixed capacities at minimal
+distance costs.
+
+Once the number of chargers per parking slot is fixed, this is all that is left of the placement model.
+"""
+from dataclasses import dataclass, replace
+from typing import Optional
+
+import numpy as np
+import scipy.sparse as sp
+
+from ortools.graph.python import min_cost_flow
+
+from shellhackathon.models.sparse import build_model, has_solution, solve_model
+
+
+@dataclass
+class TransportationResult:
+    status: str
+    objective: float
+    # flow per candidate arc
+    flow: np.ndarray
+    # demand that could not be served within the capacities
+    unmet: np.ndarray
+    # only available from the LP
+    demand_duals: Optional[np.ndarray] = None
+    capacity_duals: Optional[np.ndarray] = None
+
+
+def _default_penalty(arcs) -> float:
+    return 100.0 * (float(arcs.cost.max(initial=0.0)) + 1.0)
+
+
+def solve_transportation_lp(demands, capacities, arcs, penalty: Optional[float] = None,
+                            solver_name: str = 'glop') -> TransportationResult:
+    """
+    Solve the transportation LP over the given candidate arcs.
+
+    Every customer gets an extra slack variable for unmet demand with cost `penalty`, so the LP is always
+    feasible and has duals even if the arcs or capacities are not sufficient. The default penalty is
+    100 times the largest arc cost.
+
+    Args:
+        demands: demand per customer
+        capacities: capacity per facility
+        arcs: `CandidateArcs` the demand may be shipped along
+
+    Examples:
+        >>> from shellhackathon.candidates import CandidateArcs
+        >>> arcs = CandidateArcs.dense(np.array([[1., 5.]]))
+        >>> result = solve_transportation_lp([10.], [4., 100.], arcs)
+        >>> result.objective, result.flow, result.demand_duals, result.capacity_duals
+        (34.0, array([4., 6.]), array([5.]), array([-4.,  0.]))
+    """
+    demands = np.asarray(demands, dtype=np.float64)
+    capacities = np.asarray(capacities, dtype=np.float64)
+    num_arcs, num_customers = len(arcs), arcs.num_customers
+    if penalty is None:
+        penalty = _default_penalty(arcs)
+
+    # rows: demand constraints, then capacity constraints; columns: arcs, then unmet demand slacks
+    rows = np.concatenate([arcs.customer, np.arange(num_customers), num_customers + arcs.facility])
+    cols = np.concatenate([np.arange(num_arcs), num_arcs + np.arange(num_customers), np.arange(num_arcs)])
+    matrix = sp.csr_matrix((np.ones(len(rows)), (rows, cols)),
+                           shape=(num_customers + arcs.num_facilities, num_arcs + num_customers))
+    model = build_model(lower=np.zeros(num_arcs + num_customers),
+                        upper=np.full(num_arcs + num_customers, np.inf),
+                        objective=np.concatenate([arcs.cost, np.full(num_customers, penalty)]),
+                        row_lower=np.concatenate([demands, np.full(len(capacities), -np.inf)]),
+                        row_upper=np.concatenate([demands, capacities]),
+                        matrix=matrix, name='transportation')
+    solver = solve_model(model, solver_name)
+    if not has_solution(solver):
+        raise RuntimeError(f'transportation LP could not be solved: {solver.status().name}')
+
+    values = solver.variable_values()
+    duals = solver.dual_values()
+    return TransportationResult(status=solver.status().name, objective=solver.objective_value(),
+                                flow=values[:num_arcs], unmet=values[num_arcs:],
+                                demand_duals=duals[:num_customers], capacity_duals=duals[num_customers:])
+
+
+class MinCostFlowEvaluator:
+    """
+    Transportation problem as integer min-cost flow with OR-Tools' `SimpleMinCostFlow`.
+
+    The network is built once for the given demands and arcs; `solve` only updates the capacities of the
+    facilities, so evaluating many build plans (e.g. inside heuristics) does not rebuild the graph. Arcs and
+    capacities are passed as arrays (`add_arcs_with_capacity_and_unit_cost`, `set_arc_capacities`), which
+    needs the OR-Tools version of the Pipfile, 9.15 or later.
+
+    Demands are rounded and capacities are floored to multiples of `1 / scale`, distances to multiples of
+    `1 / cost_scale`. With the default `scale` all flows have at most two decimals, like the submission.
+    Unmet demand is allowed at cost `penalty`, as in `solve_transportation_lp`.
+    """
+
+    def __init__(self, demands, arcs, scale: float = 100, cost_scale: float = 1000,
+                 penalty: Optional[float] = None):
+        self.arcs = arcs
+        self.demands = np.asarray(demands, dtype=np.float64)
+        self.scale = scale
+        self.cost_scale = cost_scale
+        self.penalty = _default_penalty(arcs) if penalty is None else penalty
+        num_customers, num_facilities = arcs.num_customers, arcs.num_facilities
+
+        # nodes: customers, facilities, sink; arcs: candidate arcs, facility -> sink, customer -> sink (unmet)
+        sink = num_customers + num_facilities
+        supplies = np.round(np.asarray(demands, dtype=np.float64) * scale).astype(np.int64)
+        customers = np.arange(num_customers)
+        facilities = np.arange(num_facilities)
+        tails = np.concatenate([arcs.customer, num_customers + facilities, customers])
+        heads = np.concatenate([num_customers + arcs.facility, np.full(num_facilities + num_customers, sink)])
+        arc_capacities = np.concatenate([supplies[arcs.customer], np.zeros(num_facilities, dtype=np.int64),
+                                         supplies])
+        unit_costs = np.concatenate([np.round(arcs.cost * cost_scale), np.zeros(num_facilities),
+                                     np.full(num_customers, np.round(self.penalty * cost_scale))]).astype(np.int64)
+
+        self._solver = min_cost_flow.SimpleMinCostFlow()
+        self._arcs = np.asarray(self._solver.add_arcs_with_capacity_and_unit_cost(
+            tails.astype(np.int32), heads.astype(np.int32), arc_capacities, unit_costs), dtype=np.int32)
+        self._solver.set_nodes_supplies(np.arange(sink + 1, dtype=np.int32),
+                                        np.concatenate([supplies, np.zeros(num_facilities, dtype=np.int64),
+                                                        [-supplies.sum()]]))
+        self._capacity_arcs = self._arcs[len(arcs):len(arcs) + num_facilities]
+
+    def solve(self, capacities) -> TransportationResult:
+        capacities = np.asarray(capacities, dtype=np.float64)
+        self._solver.set_arc_capacities(
+            self._capacity_arcs, np.floor(np.maximum(capacities, 0) * self.scale + 1e-9).astype(np.int64))
+        status = self._solver.solve()
+        if status != self._solver.OPTIMAL:
+            raise RuntimeError(f'min cost flow could not be solved: {status}')
+
+        flows = self._solver.flows(self._arcs) / self.scale
+        num_arcs = len(self.arcs)
+        return self._result(flows[:num_arcs], flows[num_arcs + self.arcs.num_facilities:])
+
+    def resolve(self, capacities, previous_capacities, previous: TransportationResult) -> TransportationResult:
+        """
+        Re-route only the demand of the customers with an arc to a parking slot whose capacity changed, and
+        of the customers with unmet demand; all other customers keep their flow of `previous`, the result for
+        `previous_capacities`.
+
+        The affected customers are solved as a smaller min-cost flow over the capacities the others leave.
+        The result is a feasible assignment for `capacities`, but its objective is only an upper bound of the
+        one of `solve`: re-routing the other customers as well may be cheaper.
+
+        Examples:
+            >>> from shellhackathon.candidates import CandidateArcs
+            >>> arcs = CandidateArcs.dense(np.array([[1., 5.], [5., 1.]]))
+            >>> evaluator = MinCostFlowEvaluator([10., 10.], arcs)
+            >>> previous = evaluator.solve([20., 20.])
+            >>> result = evaluator.resolve([20., 5.], [20., 20.], previous)
+            >>> result.objective, result.flow, evaluator.solve([20., 5.]).objective
+            (40.0, array([10.,  0.,  5.,  5.]), 40.0)
+        """
+        arcs = self.arcs
+        capacities = np.asarray(capacities, dtype=np.float64)
+        changed = capacities != np.asarray(previous_capacities, dtype=np.float64)
+        affected = previous.unmet > 0
+        affected[arcs.customer[changed[arcs.facility]]] = True
+        if not affected.any():
+            return previous
+
+        local = affected[arcs.customer]
+        flow = np.where(local, 0.0, previous.flow)
+        residual = capacities - np.bincount(arcs.facility, flow, minlength=arcs.num_facilities)
+        customers = np.flatnonzero(affected)
+        index = np.zeros(arcs.num_customers, dtype=np.int64)
+        index[customers] = np.arange(len(customers))
+        # a subset of customer-major arcs is still customer-major
+        local_arcs = replace(arcs, customer=index[arcs.customer[local]], facility=arcs.facility[local],
+                             cost=arcs.cost[local], num_customers=len(customers))
+        result = MinCostFlowEvaluator(self.demands[customers], local_arcs, scale=self.scale,
+                                      cost_scale=self.cost_scale, penalty=self.penalty).solve(residual)
+        flow[local] = result.flow
+        unmet = previous.unmet.copy()
+        unmet[customers] = result.unmet
+        return self._result(flow, unmet)
+
+    def _result(self, flow: np.ndarray, unmet: np.ndarray) -> TransportationResult:
+        return TransportationResult(status='OPTIMAL',
+                                    objective=float(flow @ self.arcs.cost + self.penalty * unmet.sum()),
+                                    flow=flow, unmet=unmet)
+
+
+def solve_transportation(demands, capacities, arcs, scale: float = 100, cost_scale: float = 1000,
+                         penalty: Optional[float] = None) -> TransportationResult:
+    """
+    Solve the transportation problem as integer min-cost flow, see `MinCostFlowEvaluator`.
+
+    This is much faster than an LP or MIP solve, but gives no duals.
+
+    Examples:
+        >>> from shellhackathon.candidates import CandidateArcs
+        >>> arcs = CandidateArcs.dense(np.array([[1., 5.]]))
+        >>> result = solve_transportation([10.], [4., 100.], arcs)
+        >>> result.objective, result.flow, result.unmet
+        (34.0, array([4., 6.]), array([0.]))
+    """
+    return MinCostFlowEvaluator(demands, arcs, scale=scale, cost_scale=cost_scale, penalty=penalty).solve(capacities)
@@ -1,11 +1,52 @@
 import itertools
 from typing import List
 
+import numpy as np
 import pandas as pd
 
 
+# capacities and costs of the chargers of the hackathon
+SLOW_CHARGER = 200
+FAST_CHARGER = 400
+SLOW_COSTS = 1.0*600
+FAST_COSTS = 1.5*600
+
+
 ####################################################################################################
 # Project specific helper functions
+def coordinates(df) -> np.ndarray:
+    """
+    Return the `x_coordinate`/`y_coordinate` columns of a supply or demand table, or the coordinates of a
+    `DemandStore`, as (n, 2) array.
+
+    Examples:
+        >>> coordinates(pd.DataFrame({'x_coordinate': [0.5, 1.5], 'y_coordinate': [0.5, 0.5]}))
+        array([[0.5, 0.5],
+               [1.5, 0.5]])
+    """
+    if isinstance(df, pd.DataFrame):
+        return df[['x_coordinate', 'y_coordinate']].to_numpy(dtype=np.float64)
+    return np.asarray(df.coordinates, dtype=np.float64)
+
+
+def demand_values(demand, years) -> np.ndarray:
+    """
+    Return the demand of one year as (n,) array, or of a list of years as (n, years) array, from a demand
+    table or a `DemandStore`.
+
+    Examples:
+        >>> demand = pd.DataFrame({'2019': [1.5, 2.5], '2020': [2.0, 3.0]})
+        >>> demand_values(demand, 2019), demand_values(demand, ['2019', '2020']).shape
+        (array([1.5, 2.5]), (2, 2))
+    """
+    if isinstance(years, (list, tuple)):
+        years = [str(year) for year in years]
+        if isinstance(demand, pd.DataFrame):
+            return demand[years].to_numpy(dtype=np.float64)
+        return np.asarray(demand.select_years(years).demand, dtype=np.float64)
+    if isinstance(demand, pd.DataFrame):
+        return demand[str(years)].to_numpy(dtype=np.float64)
+    return np.asarray(demand.year(years), dtype=np.float64)
 
 
 ####################################################################################################
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+
+def random_supply(rng: np.random.Generator, sites: int = 6, size: int = 8, slots=(3, 6), existing_fast: bool = False,
+                  index: bool = False) -> pd.DataFrame:
+    """
+    `sites` parking slots at random in the `size` x `size` area, with up to one existing slow charger (and fast
+    charger with `existing_fast`) each.
+    """
+    supply = pd.DataFrame({'x_coordinate': rng.uniform(0, size, sites), 'y_coordinate': rng.uniform(0, size, sites),
+                           'total_parking_slots': rng.integers(*slots, sites),
+                           'existing_num_SCS': rng.integers(0, 2, sites),
+                           'existing_num_FCS': rng.integers(0, 2, sites) if existing_fast else 0})
+    if index:
+        supply.insert(0, 'supply_point_index', range(sites))
+    return supply
+
+
+def random_demand(rng: np.random.Generator, size: int = 8, years=('2019',), max_demand=30, growth=None,
+                  index: bool = False) -> pd.DataFrame:
+    """
+    Demand on the cell centres of the `size` x `size` grid. Every year is drawn up to its `max_demand` (one value
+    for all years or one per year), or with `growth` only the first one, and the following years grow by a
+    random factor in the `growth` range.
+    """
+    x, y = np.meshgrid(np.arange(size) + 0.5, np.arange(size) + 0.5)
+    demand = pd.DataFrame({'x_coordinate': x.ravel(), 'y_coordinate': y.ravel()})
+    if index:
+        demand.insert(0, 'demand_point_index', range(size * size))
+    maxima = np.broadcast_to(max_demand, len(years))
+    for step, year in enumerate(years):
+        if growth is None or step == 0:
+            demand[year] = rng.uniform(0, maxima[step], size * size)
+        else:
+            demand[year] = demand[years[step - 1]] * rng.uniform(*growth, size * size)
+    return demand
+
+
+@pytest.fixture
+def make_instance():
+    """
+    Factory of random (supply, demand) instances by seed, see `random_supply` and `random_demand`.
+    """
+    def make(seed: int, sites: int = 6, size: int = 8, slots=(3, 6), existing_fast: bool = False, years=('2019',),
+             max_demand=30, growth=None, index: bool = False):
+        rng = np.random.default_rng(seed)
+        supply = random_supply(rng, sites, size, slots, existing_fast, index)
+        return supply, random_demand(rng, size, years, max_demand, growth, index)
+    return make
+
+
+@pytest.fixture
+def make_demand():
+    """
+    Factory of random demand tables by seed, see `random_demand`.
+    """
+    def make(seed: int, size: int = 8, years=('2019',), max_demand=30, growth=None, index: bool = True):
+        return random_demand(np.random.default_rng(seed), size, years, max_demand, growth, index)
+    return make
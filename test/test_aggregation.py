@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from shellhackathon.models.aggregation import aggregate_demand, grid_clusters, kmeans_clusters, solve_aggregated
+from shellhackathon.models.placement import ChargerPlacementModel, MultiYearPlacementModel
+from shellhackathon.models.postprocessing import check_solution
+
+
+@pytest.fixture
+def instance(make_instance):
+    return make_instance(17, sites=8, slots=(2, 5), years=('2019', '2020'), max_demand=25, growth=(1.0, 1.5))
+
+
+def test_aggregation_keeps_the_demand(instance):
+    _, demand = instance
+    labels = grid_clusters(demand[['x_coordinate', 'y_coordinate']], cell_size=2)
+    aggregated = aggregate_demand(demand, labels, ['2019', '2020'])
+    assert len(aggregated) == 16 and aggregated['size'].tolist() == [4] * 16
+    assert aggregated[['2019', '2020']].sum().to_numpy() == pytest.approx(demand[['2019', '2020']].sum())
+    # centroids stay within their blocks
+    first = np.unique(labels, return_index=True)[1]
+    assert np.all(np.floor(aggregated[['x_coordinate', 'y_coordinate']].to_numpy() / 2) ==
+                  np.floor(demand[['x_coordinate', 'y_coordinate']].to_numpy()[first] / 2))
+
+
+def test_kmeans_clusters_every_point(instance):
+    _, demand = instance
+    labels = kmeans_clusters(demand[['x_coordinate', 'y_coordinate']], demand['2019'], 10)
+    assert labels.shape == (64,) and set(labels) == set(range(10))
+
+
+@pytest.mark.parametrize('method,settings', [('grid', dict(cell_size=1)), ('grid', dict(cell_size=2)),
+                                             ('kmeans', dict(clusters=16))])
+def test_disaggregated_plan_is_feasible(instance, method, settings):
+    supply, demand = instance
+    model = ChargerPlacementModel(supply, demand, 2019)
+    result = solve_aggregated(model, method, **settings)
+    solution = result.solutions['2019']
+    # min-cost flow ships demand in hundredths
+    assert solution.status == 'FEASIBLE' and check_solution(solution, demand['2019'], tol=0.01).ok
+    assert result.error == pytest.approx(solution.objective - result.reduced['2019'].objective)
+    # no better than the optimum of the original model
+    assert solution.objective >= model.solve().objective - 1e-6
+    if settings.get('cell_size') == 1:
+        assert result.num_clusters == 64 and result.error == pytest.approx(0, abs=1e-3 * solution.objective)
+
+
+def test_multi_year_aggregation(instance):
+    supply, demand = instance
+    result = solve_aggregated(MultiYearPlacementModel(supply, demand, [2019, 2020]), cell_size=4, k=3)
+    assert result.reduction == 16.0 and list(result.solutions) == ['2019', '2020']
+    assert all(solution.status == 'FEASIBLE' for solution in result.solutions.values())
+    assert np.all(result.solutions['2020'].slow >= result.solutions['2019'].slow)
+    assert result.summary()['objective'] == pytest.approx(result.objective)
+
+
+def test_unknown_method(instance):
+    supply, demand = instance
+    with pytest.raises(ValueError, match='unknown aggregation method'):
+        solve_aggregated(ChargerPlacementModel(supply, demand, 2019), 'hierarchical')
+    with pytest.raises(ValueError, match='number of clusters'):
+        solve_aggregated(ChargerPlacementModel(supply, demand, 2019), 'kmeans')
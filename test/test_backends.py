@@ -0,0 +1,126 @@
+import numpy as np
+import pytest
+
+from shellhackathon.models.backends import BACKENDS, IncumbentParser, IncumbentTrace, get_backend
+from shellhackathon.models.facility_location import FacilityLocationModel
+from shellhackathon.models.placement import ChargerPlacementModel, MultiYearPlacementModel
+from shellhackathon.models.postprocessing import check_solution
+
+
+@pytest.fixture
+def instance(make_instance):
+    return make_instance(11, sites=8, slots=(2, 5), years=('2019', '2020'), max_demand=25, growth=(1.0, 1.5))
+
+
+@pytest.mark.parametrize('backend', ['highs', 'cbc', 'cp-sat'])
+def test_mip_backends_agree(instance, backend):
+    supply, demand = instance
+    model = ChargerPlacementModel(supply, demand, 2019)
+    expected = model.solve('scip', parameters='limits/gap = 0')
+    solution = model.solve(backend)
+    assert solution.status in ('OPTIMAL', 'FEASIBLE')
+    # within the relative gap of the presets, CP-SAT scales the flows to integers
+    assert solution.objective == pytest.approx(expected.objective, rel=2e-4)
+    assert solution.best_bound <= expected.objective + 1e-3 * len(model.arcs)
+
+
+def test_relaxation_rounding_is_feasible(instance):
+    supply, demand = instance
+    model = ChargerPlacementModel(supply, demand, 2019)
+    optimal = model.solve()
+    solution = model.solve('glop-rounding')
+    assert solution.status == 'FEASIBLE'
+    assert np.all(solution.slow == np.round(solution.slow)) and np.all(solution.fast == np.round(solution.fast))
+    assert np.all(solution.slow + solution.fast <= supply['total_parking_slots'])
+    assert np.all(solution.slow >= supply['existing_num_SCS'])
+    assert check_solution(solution, demand['2019'], tol=0.02).ok
+    assert solution.best_bound <= optimal.objective + 1e-6 <= solution.objective + 2e-6
+
+
+def test_relaxation_rounding_keeps_chargers_over_years(instance):
+    supply, demand = instance
+    solutions = MultiYearPlacementModel(supply, demand, [2019, 2020]).solve_years('glop-rounding')
+    assert [solution.status for solution in solutions.values()] == ['FEASIBLE', 'FEASIBLE']
+    assert np.all(solutions['2020'].slow >= solutions['2019'].slow)
+    assert np.all(solutions['2020'].fast >= solutions['2019'].fast)
+
+
+def test_presets_are_translated_to_solver_parameters():
+    assert get_backend('scip', threads=2, presolve=False).solver_parameters() == \
+        'parallel/maxnthreads = 2\nlimits/gap = 0.0001\npresolving/maxrounds = 0'
+    assert get_backend('sat', parameters='log_search_progress:false').solver_parameters().endswith(
+        'mip_wanted_precision:1e-3 log_search_progress:false')
+    assert BACKENDS['cp-sat'].replace(threads=4).threads == 4 and BACKENDS['cp-sat'].threads == 8
+
+
+@pytest.mark.parametrize('capacities', [None, 60.0])
+@pytest.mark.parametrize('backend', ['scip', 'highs', 'cbc', 'glop-rounding'])
+def test_facility_location_backends(backend, capacities):
+    rng = np.random.default_rng(3)
+    customers, facilities = rng.uniform(0, 10, (30, 2)), rng.uniform(0, 10, (8, 2))
+    demands = rng.uniform(1, 10, 30)
+    model = FacilityLocationModel.from_coordinates(customers, facilities, rng.uniform(20, 60, 8), demands,
+                                                   capacities)
+    expected = model.solve('scip', parameters='limits/gap = 0')
+    solution = model.solve(backend)
+    assert solution.has_solution
+    assert np.bincount(model.arcs.customer, solution.flow) == pytest.approx(demands, abs=0.01)
+    assert not np.any(solution.flow[~solution.open[model.arcs.facility]] > 1e-6)
+    if capacities is not None:
+        assert np.all(np.bincount(model.arcs.facility, solution.flow, minlength=8) <= capacities + 1e-6)
+    if backend == 'glop-rounding':
+        assert solution.best_bound <= expected.objective + 1e-6 <= solution.objective + 0.1
+    else:
+        assert solution.objective == pytest.approx(expected.objective, rel=2e-4)
+
+
+@pytest.mark.parametrize('backend', ['scip', 'cp-sat', 'cbc', 'glop-rounding'])
+def test_incumbents_are_streamed(instance, backend):
+    supply, demand = instance
+    trace = IncumbentTrace()
+    solution = ChargerPlacementModel(supply, demand, 2019).solve(backend, time_limit=20, callback=trace)
+    frame = trace.to_frame()
+    assert len(frame) >= 1 and set(frame['solver']) == {get_backend(backend).solver}
+    # the logs round the objective, the final incumbent is exact
+    assert np.all(np.diff(frame['objective']) <= 1e-6 * frame['objective'].max())
+    assert frame['elapsed'].is_monotonic_increasing
+    assert frame['objective'].iloc[-1] == pytest.approx(solution.objective, rel=1e-6)
+    assert (frame['bound'] <= frame['objective'] + 1e-6).all()
+
+
+def test_incumbents_are_parsed_from_solver_logs():
+    incumbents = []
+    scip = IncumbentParser('scip', incumbents.append)
+    scip('  0.3s|     1 |     0 |  6329 |     - |    35M |   0 |7232 |1519 |1518 |   0 |  0 |   1 |   0 '
+         '| 1.634169e+06 |      --      |    Inf | unknown')
+    scip('r 0.6s|     1 |     0 |  6537 |     - |randroun|   0 |7232 |1519 |1550 |   0 |  9 |   1 |   0 '
+         '| 1.634226e+06 | 1.634721e+06 |   0.03%| unknown')
+    highs = IncumbentParser('highs', incumbents.append)
+    highs(' J       0       0         0   0.00%   -inf            2077185.018299     Large        0      0      0'
+          '         0     0.1s')
+    highs(' R       0       0         0   0.00%   1634169.15661   1634316.786052     0.01%        0      0      0'
+          '      1773     0.1s')
+    assert [(incumbent.solver, incumbent.objective, incumbent.bound) for incumbent in incumbents] == [
+        ('scip', 1.634721e+06, 1.634226e+06), ('highs', 2077185.018299, -np.inf),
+        ('highs', 1634316.786052, 1634169.15661)]
+
+
+def test_limits_stop_the_solve_with_the_best_plan(instance):
+    supply, demand = instance
+    model = ChargerPlacementModel(supply, demand, 2019)
+    solution = model.solve('scip', relative_gap=0.5, absolute_gap=1e6, node_limit=1)
+    assert solution.has_solution and solution.objective >= model.solve().objective - 1e-6
+    with pytest.raises(ValueError, match='node_limit'):
+        model.solve('cp-sat', node_limit=10)
+    with pytest.raises(ValueError, match='absolute_gap'):
+        model.solve('cbc', absolute_gap=10.0)
+
+
+def test_callback_errors_are_raised(instance):
+    supply, demand = instance
+
+    def fail(incumbent):
+        raise RuntimeError('sink is down')
+
+    with pytest.raises(RuntimeError, match='sink is down'):
+        ChargerPlacementModel(supply, demand, 2019).solve('scip', callback=fail)
@@ -0,0 +1,34 @@
+import pandas as pd
+import pytest
+
+from shellhackathon.models.backtest import make_estimator, run_backtest, summarize
+
+
+@pytest.fixture
+def history(make_demand):
+    return make_demand(24, years=[str(year) for year in range(2010, 2019)], max_demand=5, growth=(1.1, 1.3))
+
+
+def test_backtest_covers_all_origins_and_steps(history):
+    results = run_backtest(history, ['linear', 'mean_growth'])
+    # origins 2013 to 2017, the last one only one year ahead
+    assert len(results) == 2 * (4 * 2 + 1)
+    last = results[results['origin'] == '2017']
+    assert last['year'].tolist() == ['2018', '2018'] and (last['step'] == 1).all()
+    assert ((results['mape'] > 0) & (results['mape'] < 0.3)).all()
+
+    summary = summarize(results)
+    assert sorted(summary.index) == ['linear', 'mean_growth']
+    assert summary.columns.tolist() == ['mae_1', 'mae_2', 'mape_1', 'mape_2', 'seconds_1', 'seconds_2']
+
+
+def test_parallel_backtest_gives_the_same_errors(history):
+    serial = run_backtest(history, ['extra_trees', 'gradient_boosting'], horizon=3, workers=0)
+    parallel = run_backtest(history, ['extra_trees', 'gradient_boosting'], horizon=3, workers=2)
+    pd.testing.assert_frame_equal(serial.drop(columns='seconds'), parallel.drop(columns='seconds'))
+    assert serial['step'].max() == 3
+
+
+def test_unknown_estimator():
+    with pytest.raises(ValueError):
+        make_estimator('pycaret')
@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from shellhackathon.data.demand_store import DemandStore
+from shellhackathon.features.build_features import build_features, demand_grid, ring_means
+
+
+@pytest.fixture
+def instance(make_instance):
+    supply, demand = make_instance(22, sites=7, slots=(2, 5), existing_fast=True, years=('2019', '2020'),
+                                   max_demand=40, growth=(1.0, 1.8), index=True)
+    demand[['2019', '2020']] = demand[['2019', '2020']].astype(np.float32).astype(np.float64)
+    # shuffled, the features follow the order of the table
+    return supply, demand.sample(frac=1, random_state=0).reset_index(drop=True)
+
+
+def test_features_match_a_neighbour_search(instance):
+    supply, demand = instance
+    features = build_features(demand, supply, radii=[1, 2])
+    points = demand[['x_coordinate', 'y_coordinate']].to_numpy()
+    chebyshev = np.abs(points[:, None] - points[None]).max(axis=2)
+    for radius in [1, 2]:
+        expected = np.array([demand['2020'][row <= radius].mean() for row in chebyshev])
+        np.testing.assert_allclose(features[f'2020_ring{radius}'], expected)
+    np.testing.assert_allclose(features['2020_growth'], demand['2020'] / demand['2019'] - 1)
+    assert (features['2019_growth'] == 0).all()
+
+    chargers = supply[(supply['existing_num_SCS'] + supply['existing_num_FCS']) > 0]
+    sites = chargers[['x_coordinate', 'y_coordinate']].to_numpy()
+    np.testing.assert_allclose(features['charger_distance'],
+                               np.linalg.norm(points[:, None] - sites[None], axis=2).min(axis=1))
+
+
+def test_charger_density_sums_to_the_capacity(instance):
+    supply, demand = instance
+    features = build_features(demand, supply, radii=[8])
+    capacity = (supply['existing_num_SCS'] * 200 + supply['existing_num_FCS'] * 400).sum()
+    # the 8-ring of every cell covers the whole 8 x 8 area
+    np.testing.assert_allclose(features['charger_density8'], capacity / 64)
+
+
+def test_grid_skips_missing_cells(instance):
+    supply, demand = instance
+    demand = demand[demand['x_coordinate'] != 3.5]
+    grid = demand_grid(demand)
+    assert grid.shape == (8, 8) and grid.occupied().sum() == 56
+    means = grid.at_points(ring_means(grid.values, 1, grid.occupied()))
+    assert means.shape == (2, 56) and (means > 0).all()
+
+
+def test_store_gives_the_same_features(instance):
+    supply, demand = instance
+    pd.testing.assert_frame_equal(build_features(DemandStore.from_frame(demand), supply),
+                                  build_features(demand, supply), rtol=1e-5)
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from shellhackathon.candidates import CandidateArcs, nearest_candidates, price_out
+from shellhackathon.distance import distance_matrix
+from shellhackathon.models.transportation import solve_transportation_lp
+
+
+@pytest.fixture
+def instance():
+    rng = np.random.default_rng(1)
+    customers = rng.uniform(0, 20, (150, 2))
+    facilities = rng.uniform(0, 20, (12, 2))
+    demands = rng.uniform(0, 10, 150)
+    capacities = rng.uniform(0.5, 1.5, 12) * demands.sum() / 12 * 1.2
+    return customers, facilities, demands, capacities
+
+
+def test_nearest_candidates_are_nearest(instance):
+    customers, facilities, _, _ = instance
+    arcs = nearest_candidates(customers, facilities, k=3)
+    distance = distance_matrix(customers, facilities)
+    assert len(arcs) == 3 * len(customers)
+    np.testing.assert_allclose(arcs.cost, distance[arcs.customer, arcs.facility])
+    expected = np.sort(np.argsort(distance, axis=1)[:, :3], axis=1)
+    np.testing.assert_array_equal(arcs.facility.reshape(-1, 3), expected)
+
+
+def test_radius_keeps_every_customer(instance):
+    customers, facilities, _, _ = instance
+    arcs = nearest_candidates(customers, facilities, radius=0.1)
+    assert set(arcs.customer) == set(range(len(customers)))
+
+
+def test_union_is_sorted_and_unique(instance):
+    customers, facilities, _, _ = instance
+    a = nearest_candidates(customers, facilities, k=2)
+    b = nearest_candidates(customers, facilities, k=4)
+    merged = a.union(b)
+    assert len(merged) == len(b)
+    assert np.all(np.diff(merged.keys) > 0)
+
+
+def test_price_out_recovers_dense_optimum(instance):
+    customers, facilities, demands, capacities = instance
+    dense = CandidateArcs.dense(distance_matrix(customers, facilities))
+    expected = solve_transportation_lp(demands, capacities, dense)
+
+    def solve(arcs):
+        return solve_transportation_lp(demands, capacities, arcs), capacities
+
+    result, arcs, converged = price_out(solve, customers, facilities, demands,
+                                        nearest_candidates(customers, facilities, k=1))
+    assert converged
+    assert len(arcs) < len(dense)
+    assert result.unmet.sum() == pytest.approx(0, abs=1e-6)
+    assert result.objective == pytest.approx(expected.objective)
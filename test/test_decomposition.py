@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from shellhackathon.models import decomposition
+from shellhackathon.models.decomposition import BendersSolver, solve_benders
+from shellhackathon.models.placement import ChargerPlacementModel, MultiYearPlacementModel
+
+
+@pytest.fixture
+def model(make_instance):
+    supply, demand = make_instance(4, sites=10, size=12, slots=(3, 8), existing_fast=True, years=('2019', '2020'),
+                                   max_demand=(30, 40))
+    return ChargerPlacementModel(supply, demand, 2019)
+
+
+def test_benders_closes_gap_to_mip(model):
+    optimum = model.solve()
+    progress = []
+    solution = solve_benders(model, gap=1e-6, callback=progress.append)
+    assert solution.status == 'OPTIMAL'
+    assert solution.objective == pytest.approx(optimum.objective, rel=1e-5)
+    assert np.all(solution.slow >= model.existing_slow) and np.all(solution.fast >= model.existing_fast)
+    np.testing.assert_allclose(np.bincount(solution.arcs.customer, solution.flow), model.demands, atol=1e-6)
+
+    lower = [p.lower_bound for p in progress]
+    upper = [p.upper_bound for p in progress]
+    assert lower == sorted(lower) and upper == sorted(upper, reverse=True)
+    assert lower[-1] <= optimum.objective + 1e-6
+
+
+def test_benders_stops_early_with_valid_bound(model):
+    optimum = model.solve()
+    solution = solve_benders(model, max_iterations=2)
+    assert solution.best_bound <= optimum.objective + 1e-6 <= solution.objective + 1e-6
+    # the subproblem data of the in-process solve is not kept
+    assert decomposition._worker_data == {}
+
+
+def test_benders_scenarios_in_parallel(model):
+    demands = model.demand[['2019', '2020']].to_numpy().T
+    serial_solver = BendersSolver(model, demands=demands, weights=[0.3, 0.7])
+    parallel_solver = BendersSolver(model, demands=demands, weights=[0.3, 0.7], workers=2)
+    serial = serial_solver.solve()
+    parallel_solver.solve()
+    assert serial_solver.upper_bound == pytest.approx(parallel_solver.upper_bound)
+    assert serial_solver.lower_bound <= serial_solver.upper_bound
+    # one plan has to cover the larger scenario
+    capacities = serial.capacities()
+    assert capacities.sum() >= demands.sum(axis=1).max()
+    # the solution is the plan assigned to the demand of the model year, with the costs of that assignment
+    np.testing.assert_allclose(np.bincount(serial.arcs.customer, serial.flow), model.demands, atol=0.01)
+    assert serial.objective == pytest.approx(serial.flow @ serial.arcs.cost + serial.slow.sum() * model.slow_costs
+                                             + serial.fast.sum() * model.fast_costs)
+
+
+def test_benders_rejects_multi_year_models(model):
+    with pytest.raises(ValueError):
+        BendersSolver(MultiYearPlacementModel(model.supply, model.demand, years=('2019', '2020')))
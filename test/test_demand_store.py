@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from shellhackathon.data.demand_store import DemandStore
+from shellhackathon.models.placement import ChargerPlacementModel, MultiYearPlacementModel
+from shellhackathon.models.scoring import score
+
+
+@pytest.fixture
+def instance(make_instance):
+    supply, demand = make_instance(20, slots=(2, 5), years=('2019', '2020'), max_demand=40, growth=(1.0, 1.8),
+                                   index=True)
+    # the store holds float32, compare with the same values
+    demand[['2019', '2020']] = demand[['2019', '2020']].astype(np.float32).astype(np.float64)
+    return supply, demand
+
+
+def test_store_round_trips_through_disk(instance, tmp_path):
+    _, demand = instance
+    demand.to_csv(tmp_path / 'demand.csv', index=False)
+    store = DemandStore.from_csv(tmp_path / 'demand.csv', tmp_path / 'store', chunksize=10)
+    assert isinstance(store.demand, np.memmap) and not store.demand.flags.writeable
+    assert store.years == ['2019', '2020'] and store.sorted_by_y
+    assert store.coordinates.dtype == store.demand.dtype == np.float32
+    np.testing.assert_array_equal(store.year(2020), demand['2020'])
+    pd.testing.assert_frame_equal(DemandStore.open(tmp_path / 'store').to_frame(),
+                                  demand[['x_coordinate', 'y_coordinate', '2019', '2020']].astype(np.float32))
+
+
+def test_slices_are_views(instance, tmp_path):
+    _, demand = instance
+    store = DemandStore.from_frame(demand).save(tmp_path / 'store')
+    assert np.shares_memory(store.year(2019), store.demand)
+    assert np.shares_memory(store.select_years([2020]).demand, store.demand)
+    band = store.bbox(0, 2, 8, 4)
+    assert len(band) == 16 and np.shares_memory(band.demand, store.demand)
+    box = store.bbox(1, 2, 3, 4)
+    assert len(box) == 4 and box.coordinates.min(axis=0).tolist() == [1.5, 2.5]
+    # unsorted stores are scanned completely
+    shuffled = DemandStore.from_frame(demand.sample(frac=1, random_state=0))
+    assert not shuffled.sorted_by_y and len(shuffled.bbox(1, 2, 3, 4)) == 4
+
+
+def test_models_and_scorer_accept_a_store(instance, tmp_path):
+    supply, demand = instance
+    store = DemandStore.from_frame(demand).save(tmp_path / 'store')
+    expected = ChargerPlacementModel(supply, demand, 2019).solve()
+    solution = ChargerPlacementModel(supply, store, 2019).solve()
+    assert solution.objective == pytest.approx(expected.objective)
+    solutions = MultiYearPlacementModel(supply, store, [2019, 2020]).solve_years()
+    assert solutions['2020'].has_solution
+
+    submission = solution.to_frame()
+    assert score(submission, supply, store, actual_demand=store).total == \
+        pytest.approx(score(submission, supply, demand, actual_demand=demand).total)
@@ -0,0 +1,58 @@
+from itertools import product
+from math import sqrt
+
+import numpy as np
+import pytest
+
+from shellhackathon.distance import distance_matrix, iter_distance_chunks
+
+
+def compute_distance(loc1, loc2):
+    # reference implementation from the solution notebooks
+    dx = loc1[0] - loc2[0]
+    dy = loc1[1] - loc2[1]
+    return sqrt(dx*dx + dy*dy)
+
+
+@pytest.fixture
+def points():
+    rng = np.random.default_rng(0)
+    return rng.uniform(0, 64, (50, 2)), rng.uniform(0, 64, (7, 2))
+
+
+def test_matches_notebook_dict(points):
+    customers, facilities = points
+    expected = {(c, f): compute_distance(customers[c], facilities[f])
+                for c, f in product(range(len(customers)), range(len(facilities)))}
+    matrix = distance_matrix(customers, facilities)
+    assert matrix.shape == (50, 7)
+    for key, value in expected.items():
+        assert matrix[key] == pytest.approx(value)
+
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 49, 50, 1000])
+def test_chunked_equals_dense(points, chunk_size):
+    customers, facilities = points
+    np.testing.assert_allclose(distance_matrix(customers, facilities, chunk_size=chunk_size),
+                               distance_matrix(customers, facilities))
+
+
+def test_out_memmap(points, tmp_path):
+    customers, facilities = points
+    out = np.memmap(tmp_path / 'distance.dat', dtype=np.float32, mode='w+', shape=(50, 7))
+    result = distance_matrix(customers, facilities, chunk_size=8, out=out)
+    assert result is out
+    np.testing.assert_allclose(out, distance_matrix(customers, facilities), rtol=1e-6)
+
+
+def test_iter_chunks_cover_all_rows(points):
+    customers, facilities = points
+    starts = [start for start, _ in iter_distance_chunks(customers, facilities, chunk_size=16)]
+    assert starts == [0, 16, 32, 48]
+
+
+def test_invalid_shapes():
+    with pytest.raises(ValueError):
+        distance_matrix([1, 2, 3], [(0, 0)])
+    with pytest.raises(ValueError):
+        distance_matrix([(0, 0)], [(0, 0)], out=np.empty((2, 2)))
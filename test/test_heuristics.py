@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from shellhackathon.models.heuristics import LNSSolver, cheapest_mix, solve_lns
+from shellhackathon.models.placement import ChargerPlacementModel
+
+
+@pytest.fixture
+def model(make_instance):
+    supply, demand = make_instance(4, sites=10, size=12, slots=(3, 8), existing_fast=True)
+    return ChargerPlacementModel(supply, demand, 2019)
+
+
+def test_cheapest_mix_respects_bounds():
+    slow, fast = cheapest_mix([0, 0, 900], [2, 0, 0], [0, 1, 0], [3, 3, 2])
+    np.testing.assert_array_equal(slow, [2, 0, 0])
+    np.testing.assert_array_equal(fast, [0, 1, 2])
+
+
+@pytest.mark.parametrize('incremental', [True, False])
+def test_lns_is_feasible_and_close_to_mip(model, incremental):
+    optimum = model.solve()
+    progress = []
+    solution = solve_lns(model, k=4, max_iterations=200, seed=1, incremental=incremental, callback=progress.append)
+    assert solution.status == 'FEASIBLE'
+    assert np.all(solution.slow >= model.existing_slow) and np.all(solution.fast >= model.existing_fast)
+    assert np.all(solution.slow + solution.fast <= model.slots)
+    np.testing.assert_allclose(np.bincount(solution.arcs.customer, solution.flow), model.demands, atol=0.01)
+    # flows are rounded to two decimals, so the heuristic may undercut the optimum slightly
+    assert 0.9999 * optimum.objective <= solution.objective <= 1.05 * optimum.objective
+
+    assert len(progress) == 200
+    assert progress[-1].best_objective == min(p.best_objective for p in progress)
+
+
+def test_lns_is_reproducible_and_can_be_stopped(model):
+    first = LNSSolver(model, max_iterations=30, seed=7).solve()
+    second = LNSSolver(model, max_iterations=30, seed=7).solve()
+    assert first.objective == second.objective
+
+    stopped = []
+    LNSSolver(model, seed=7, callback=lambda progress: stopped.append(progress) or len(stopped) == 3).solve()
+    assert len(stopped) == 3
+
+
+def test_lns_result_format(model):
+    frame = solve_lns(model, max_iterations=5).to_frame()
+    assert list(frame.columns) == ['year', 'data_type', 'demand_point_index', 'supply_point_index', 'value']
+    assert len(frame) == 2 * 10 + 144 * 10
+    assert set(frame['year']) == {2019}
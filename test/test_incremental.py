@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from shellhackathon.models.incremental import IncrementalPlacementModel
+from shellhackathon.models.placement import ChargerPlacementModel
+
+
+@pytest.fixture
+def instance(make_instance):
+    return make_instance(7)
+
+
+def fresh(supply, demand, **kwargs):
+    return ChargerPlacementModel(supply, demand, 2019, **kwargs).solve()
+
+
+def test_edits_match_rebuilt_models(instance):
+    supply, demand = instance
+    model = IncrementalPlacementModel(ChargerPlacementModel(supply, demand, 2019))
+    assert model.solve().objective == pytest.approx(fresh(supply, demand).objective)
+
+    model.set_demands([3, 40], [120.0, 0.0])
+    demand = demand.copy()
+    demand.loc[[3, 40], '2019'] = [120.0, 0.0]
+    assert model.solve().objective == pytest.approx(fresh(supply, demand).objective)
+
+    model.set_slots([0, 1], 1 + supply.loc[[0, 1], 'existing_num_SCS'].to_numpy())
+    model.set_costs(slow_costs=700.0)
+    supply = supply.copy()
+    supply.loc[[0, 1], 'total_parking_slots'] = 1 + supply.loc[[0, 1], 'existing_num_SCS']
+    expected = fresh(supply, demand, slow_costs=700.0)
+    solution = model.solve()
+    assert solution.objective == pytest.approx(expected.objective)
+    assert solution.slow.sum() + solution.fast.sum() == expected.slow.sum() + expected.fast.sum()
+
+    # a removed site keeps its existing chargers only
+    model.remove_sites([2])
+    solution = model.solve()
+    assert solution.slow[2] == supply.loc[2, 'existing_num_SCS'] and solution.fast[2] == 0
+    model.restore_sites([2])
+    assert model.solve().objective == pytest.approx(expected.objective)
+
+
+def test_added_site_and_arc_costs(instance):
+    supply, demand = instance
+    model = IncrementalPlacementModel(ChargerPlacementModel(supply, demand, 2019))
+    model.solve()
+    assert model.add_site(4.0, 4.0, total_parking_slots=4) == 6
+    solution = model.solve()
+
+    extended = pd.concat([supply, pd.DataFrame({'x_coordinate': [4.0], 'y_coordinate': [4.0],
+                                                'total_parking_slots': [4], 'existing_num_SCS': [0],
+                                                'existing_num_FCS': [0]})], ignore_index=True)
+    expected = fresh(extended, demand)
+    assert solution.objective == pytest.approx(expected.objective)
+    np.testing.assert_array_equal(solution.arcs.keys, expected.arcs.keys)
+    np.testing.assert_allclose(solution.served(), demand['2019'], atol=1e-6)
+
+    # making every arc of the new site expensive moves the demand away from it
+    customers = np.arange(64)
+    model.set_arc_costs(customers, np.full(64, 6), 1000.0)
+    solution = model.solve()
+    assert solution.loads()[6] == pytest.approx(0.0)
+    with pytest.raises(ValueError):
+        model.set_arc_costs([0], [7], 1.0)
@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from shellhackathon.data.make_dataset import cache_dataset, load_arrays, load_frame, make_dataset
+
+
+@pytest.fixture
+def demand_csv(make_demand, tmp_path):
+    demand = make_demand(19, years=('2018', '2019'), max_demand=25, growth=(1.0, 1.5))
+    path = tmp_path / 'Demand_Future.csv'
+    # written twice with the default index, like the processed files
+    demand.to_csv(path)
+    pd.read_csv(path).to_csv(path)
+    return path
+
+
+def test_junk_index_columns_are_dropped(demand_csv, tmp_path):
+    assert sorted(pd.read_csv(demand_csv).columns[:2]) == ['Unnamed: 0', 'Unnamed: 0.1']
+    frame = load_frame(demand_csv, tmp_path / 'interim')
+    assert frame.columns.tolist() == ['demand_point_index', 'x_coordinate', 'y_coordinate', '2018', '2019']
+    assert frame['demand_point_index'].dtype == np.int64
+    pd.testing.assert_frame_equal(frame, pd.read_csv(demand_csv).iloc[:, 2:])
+
+
+def test_arrays_are_float32_memory_maps(demand_csv, tmp_path):
+    arrays = load_arrays(demand_csv, tmp_path / 'interim')
+    expected = pd.read_csv(demand_csv)
+    assert isinstance(arrays.values, np.memmap) and not arrays.values.flags.writeable
+    assert arrays.coordinates.dtype == arrays.values.dtype == np.float32
+    assert arrays.coordinates.shape == (64, 2) and arrays.values.shape == (64, 2)
+    assert arrays.years == ['2018', '2019']
+    np.testing.assert_allclose(arrays.column('2019'), expected['2019'], rtol=1e-6)
+
+
+def test_cache_is_keyed_by_source_hash(demand_csv, tmp_path):
+    cache_dir = tmp_path / 'interim'
+    entry = cache_dataset(demand_csv, cache_dir)
+    assert cache_dataset(demand_csv, cache_dir) == entry
+
+    frame = pd.read_csv(demand_csv)
+    frame.loc[0, '2019'] = 1000.0
+    frame.to_csv(demand_csv, index=False)
+    changed = cache_dataset(demand_csv, cache_dir)
+    assert changed != entry and not entry.exists()
+    assert load_arrays(demand_csv, cache_dir).column(2019)[0] == 1000.0
+
+
+def test_files_with_the_same_name_keep_their_entries(demand_csv, tmp_path):
+    cache_dir = tmp_path / 'interim'
+    other = tmp_path / 'other' / demand_csv.name
+    other.parent.mkdir()
+    frame = pd.read_csv(demand_csv)
+    frame.loc[0, '2019'] = 1000.0
+    frame.to_csv(other, index=False)
+    entry = cache_dataset(demand_csv, cache_dir)
+    other_entry = cache_dataset(other, cache_dir)
+    assert other_entry != entry and entry.exists()
+
+
+def test_integer_columns_stay_integers(tmp_path):
+    path = tmp_path / 'supply.csv'
+    pd.DataFrame({'x_coordinate': [1., 2.], 'y_coordinate': [3., 4.], 'total_parking_slots': [20, 30],
+                  'capacity': [200, 400], 'share': [0.5, 1.5]}).to_csv(path, index=False)
+    dtypes = load_frame(path, tmp_path / 'interim').dtypes.astype(str).to_dict()
+    assert dtypes == {'x_coordinate': 'float64', 'y_coordinate': 'float64', 'total_parking_slots': 'int64',
+                      'capacity': 'int64', 'share': 'float64'}
+
+
+def test_make_dataset_caches_directories(demand_csv, tmp_path):
+    supply = pd.DataFrame({'supply_point_index': [0, 1], 'x_coordinate': [1., 2.], 'y_coordinate': [3., 4.],
+                           'total_parking_slots': [20, 30], 'existing_num_SCS': [5., 4.],
+                           'existing_num_FCS': [18., 7.]})
+    supply.to_csv(tmp_path / 'exisiting_EV_infrastructure_2019.csv')
+    entries = make_dataset([tmp_path], tmp_path / 'interim')
+    assert sorted(entry.name.rsplit('-', 1)[0] for entry in entries) == \
+        ['Demand_Future', 'exisiting_EV_infrastructure_2019']
+    frame = load_frame(tmp_path / 'exisiting_EV_infrastructure_2019.csv', tmp_path / 'interim')
+    assert frame['existing_num_FCS'].dtype == np.int64 and frame['existing_num_FCS'].tolist() == [18, 7]
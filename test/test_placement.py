@@ -0,0 +1,210 @@
+import numpy as np
+import pandas as pd
+import pytest
+from ortools.linear_solver import pywraplp
+
+from shellhackathon.benchmarks import build_with_loops
+from shellhackathon.candidates import CandidateArcs, nearest_candidates
+from shellhackathon.models.placement import (ChargerPlacementModel, MultiYearPlacementModel,
+                                             solve_rolling_horizon, supply_with_solution)
+from shellhackathon.models.solution import PlacementSolution, read_result_csv
+from shellhackathon.models.sparse import variable_values
+from shellhackathon.utils import coordinates
+
+
+@pytest.fixture
+def instance(make_instance):
+    return make_instance(2, slots=(2, 5), years=('2019', '2020'), max_demand=40, growth=(1.0, 1.8), index=True)
+
+
+def test_bulk_model_matches_notebook_loops(instance):
+    supply, demand = instance
+    solver = build_with_loops(supply, demand, '2019')
+    assert solver.Solve() == pywraplp.Solver.OPTIMAL
+
+    model = ChargerPlacementModel(supply, demand, 2019)
+    assert model.build().num_variables() == solver.NumVariables()
+    assert model.build().num_constraints() == solver.NumConstraints()
+    solution = model.solve()
+    assert solution.status == 'OPTIMAL'
+    assert solution.objective == pytest.approx(solver.Objective().Value())
+
+
+def test_bulk_extraction_of_notebook_model(instance):
+    supply, demand = instance
+    solver = build_with_loops(supply, demand, '2019')
+    solver.Solve()
+    values = variable_values(solver)
+    np.testing.assert_array_equal(values, [variable.solution_value() for variable in solver.variables()])
+
+    arcs = ChargerPlacementModel(supply, demand, 2019).arcs
+    solution = PlacementSolution.from_values(values, arcs, year=2019)
+    assert solution.flow @ arcs.cost + 600 * solution.slow.sum() + 900 * solution.fast.sum() == pytest.approx(
+        solver.Objective().Value())
+    np.testing.assert_allclose(solution.served(), demand['2019'])
+    np.testing.assert_allclose(solution.shipments().toarray(), solution.dense_flow())
+    assert np.all(solution.loads() <= solution.capacities() + 1e-6)
+
+
+def test_solution_is_feasible(instance):
+    supply, demand = instance
+    model = ChargerPlacementModel(supply, demand, 2019)
+    solution = model.solve()
+    assert np.all(solution.slow >= supply['existing_num_SCS'])
+    assert np.all(solution.slow + solution.fast <= supply['total_parking_slots'] + 1e-9)
+    served = np.bincount(solution.arcs.customer, solution.flow, minlength=64)
+    np.testing.assert_allclose(served, demand['2019'], atol=1e-6)
+    load = np.bincount(solution.arcs.facility, solution.flow, minlength=6)
+    assert np.all(load <= solution.capacities() + 1e-6)
+
+
+def test_pruned_solve_matches_full(instance):
+    supply, demand = instance
+    model = ChargerPlacementModel(supply, demand, 2019)
+    full = model.solve()
+    pruned = model.solve_pruned(k=2)
+    assert len(pruned.arcs) < len(full.arcs)
+    assert pruned.objective == pytest.approx(full.objective, rel=1e-6)
+
+
+def test_pruned_solve_adds_arcs_to_empty_parking_slots():
+    supply = pd.DataFrame({'x_coordinate': [0., 20.], 'y_coordinate': [0., 0.], 'total_parking_slots': [2, 2],
+                           'existing_num_SCS': [1, 0], 'existing_num_FCS': [0, 0]})
+    demand = pd.DataFrame({'x_coordinate': [20., 20.], 'y_coordinate': [0., 0.], '2019': [100., 5.]})
+    # demand point 0 only reaches the existing charger, building one at the empty slot needs its arc there
+    start = CandidateArcs.from_keys([0, 2, 3], [20., 20., 0.], num_customers=2, num_facilities=2)
+    assert ChargerPlacementModel(supply, demand, 2019, candidates=start).solve().objective == pytest.approx(2700)
+
+    pruned = ChargerPlacementModel(supply, demand, 2019).solve_pruned(candidates=start)
+    assert pruned.objective == pytest.approx(1200)
+    assert 1 in pruned.arcs.facility[pruned.arcs.customer == 0]
+
+
+def test_multi_year_is_not_worse_than_sequential(instance):
+    supply, demand = instance
+    first = ChargerPlacementModel(supply, demand, 2019).solve()
+    second = ChargerPlacementModel(supply_with_solution(supply, first), demand, 2020).solve()
+
+    joint = MultiYearPlacementModel(supply, demand, [2019, 2020]).solve_years()
+    assert list(joint) == ['2019', '2020']
+    assert np.all(joint['2020'].slow >= joint['2019'].slow - 1e-9)
+    assert np.all(joint['2020'].fast >= joint['2019'].fast - 1e-9)
+    assert (joint['2019'].objective + joint['2020'].objective
+            <= first.objective + second.objective + 1e-6)
+
+
+def test_rolling_horizon_with_window_one_is_sequential(instance):
+    supply, demand = instance
+    first = ChargerPlacementModel(supply, demand, 2019).solve()
+    second = ChargerPlacementModel(supply_with_solution(supply, first), demand, 2020).solve()
+    rolling = solve_rolling_horizon(supply, demand, [2019, 2020], window=1)
+    assert rolling['2020'].objective == pytest.approx(second.objective)
+
+
+def test_multi_year_pruned_matches_full(instance):
+    supply, demand = instance
+    model = MultiYearPlacementModel(supply, demand, [2019, 2020])
+    full = model.solve_years()
+    pruned = model.solve_pruned_years(k=2)
+    assert sum(s.objective for s in pruned.values()) == pytest.approx(sum(s.objective for s in full.values()))
+    # solve keeps the signature of the single year model and returns the plan of the first year
+    first = model.solve()
+    assert first.year == '2019'
+    np.testing.assert_allclose(first.capacities(), full['2019'].capacities())
+
+
+def result_frame(solution, year):
+    # result format of the solution notebooks
+    rows = [(year, 'SCS', '', j, value) for j, value in enumerate(solution.slow)]
+    rows += [(year, 'FCS', '', j, value) for j, value in enumerate(solution.fast)]
+    rows += [(year, 'DS', i, j, value) for i, j, value in zip(solution.arcs.customer, solution.arcs.facility,
+                                                              solution.flow)]
+    return pd.DataFrame(rows, columns=['year', 'data_type', 'demand_point_index', 'supply_point_index', 'value'])
+
+
+def test_warm_start_from_result_csv(instance, tmp_path):
+    supply, demand = instance
+    first = ChargerPlacementModel(supply, demand, 2019).solve()
+    result_frame(first, 2019).to_csv(tmp_path / 'result_2019.csv')
+
+    hint = read_result_csv(tmp_path / 'result_2019.csv')
+    assert hint.year == '2019'
+    np.testing.assert_allclose(hint.slow, first.slow)
+    np.testing.assert_allclose(hint.flow_on(first.arcs), first.flow)
+
+    model = ChargerPlacementModel(supply_with_solution(supply, first), demand, 2020)
+    cold = model.solve()
+    model.set_hint(hint)
+    assert list(model.hints) == ['2020']
+    assert model.solve().objective == pytest.approx(cold.objective)
+
+
+def test_result_format_needs_the_year():
+    solution = PlacementSolution.from_values([150., 0., 1., 0., 0., 2.], CandidateArcs.dense(np.array([[1., 2.]])))
+    with pytest.raises(ValueError, match='year'):
+        solution.to_frame()
+    solution.year = '2020'
+    assert set(solution.to_frame()['year']) == {2020}
+
+
+def test_hint_dir_persists_solutions(instance, tmp_path):
+    supply, demand = instance
+    model = ChargerPlacementModel(supply, demand, 2019)
+    solution = model.solve(hint_dir=tmp_path)
+    stored = PlacementSolution.load(tmp_path / 'hint_2019.npz')
+    np.testing.assert_allclose(stored.flow, solution.flow)
+
+    again = ChargerPlacementModel(supply, demand, 2019)
+    assert again.solve(hint_dir=tmp_path).objective == pytest.approx(solution.objective)
+    assert again.hints['2019'].objective == pytest.approx(solution.objective)
+
+
+def test_reassign_reproduces_mip_assignment(instance):
+    supply, demand = instance
+    model = ChargerPlacementModel(supply, demand, 2019)
+    solution = model.solve()
+    reassigned = model.reassign(solution.slow, solution.fast)
+    assert reassigned.status == 'FEASIBLE'
+    assert reassigned.objective == pytest.approx(solution.objective, rel=1e-4)
+    assert model.reassign(supply['existing_num_SCS'] * 0, supply['existing_num_FCS'] * 0).status == 'INFEASIBLE'
+
+
+@pytest.mark.parametrize('k', [None, 2])
+def test_presolved_bounds_keep_the_optimum(instance, k):
+    supply, demand = instance
+    model = ChargerPlacementModel(supply, demand, 2019)
+    if k:
+        model = model.with_candidates(nearest_candidates(coordinates(demand), coordinates(supply), k=k))
+    slow, fast = model.charger_bounds()
+    assert np.all(slow <= model.slots) and np.all(fast <= model.slots)
+    assert np.all(slow <= model.existing_slow + 1)
+    expected = ChargerPlacementModel(supply, demand, 2019, candidates=model.arcs, tighten=False).solve(
+        parameters='limits/gap = 0')
+    solution = model.solve(parameters='limits/gap = 0')
+    assert solution.objective == pytest.approx(expected.objective, rel=1e-9)
+    assert np.all(solution.slow <= slow) and np.all(solution.fast <= fast)
+
+
+def test_presolve_fixes_parking_slots_without_demand(instance):
+    supply, demand = instance
+    far = pd.DataFrame({'x_coordinate': [50.], 'y_coordinate': [50.], 'total_parking_slots': [4],
+                        'existing_num_SCS': [1], 'existing_num_FCS': [1]})
+    supply = pd.concat([supply, far], ignore_index=True)
+    model = ChargerPlacementModel(supply, demand, 2019).with_candidates(
+        nearest_candidates(coordinates(demand), coordinates(supply), k=2))
+    unreachable = np.bincount(model.arcs.facility, minlength=model.num_facilities) == 0
+    assert unreachable[-1]
+    slow, fast = model.charger_bounds()
+    assert np.array_equal(slow[unreachable], model.existing_slow[unreachable])
+    assert np.array_equal(fast[unreachable], model.existing_fast[unreachable])
+
+
+def test_multi_year_presolve_keeps_growing_slow_chargers():
+    # two new slow chargers in the last year are cheaper than a fast charger in every year
+    supply = pd.DataFrame({'x_coordinate': [0.], 'y_coordinate': [0.], 'total_parking_slots': [3],
+                           'existing_num_SCS': [0], 'existing_num_FCS': [0]})
+    demand = pd.DataFrame({'x_coordinate': [0.], 'y_coordinate': [0.],
+                           '2019': [200.], '2020': [200.], '2021': [400.]})
+    solutions = MultiYearPlacementModel(supply, demand, [2019, 2020, 2021]).solve_years()
+    assert sum(solution.objective for solution in solutions.values()) == pytest.approx(2400.0)
+    assert solutions['2021'].slow[0] == 2
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from shellhackathon.candidates import CandidateArcs, nearest_candidates
+from shellhackathon.models.postprocessing import check_solution, repair_solution, truncate, truncate_submission
+from shellhackathon.models.solution import PlacementSolution
+
+
+@pytest.fixture
+def instance():
+    rng = np.random.default_rng(3)
+    customers, facilities = rng.uniform(0, 10, (200, 2)), rng.uniform(0, 10, (12, 2))
+    arcs = nearest_candidates(customers, facilities, k=3)
+    demands = rng.uniform(0, 30, 200)
+    # noisy split of every demand over its arcs, as left by a solver with tolerances
+    share = rng.dirichlet(np.ones(3), 200).ravel()
+    flow = demands[arcs.customer] * share + rng.normal(0, 1e-4, len(arcs))
+    slow = np.full(12, 2.0)
+    fast = np.ceil(np.maximum(np.bincount(arcs.facility, flow, minlength=12) - 400, 0) / 400) + 1
+    solution = PlacementSolution('OPTIMAL', np.nan, slow, fast, arcs, flow, year='2019')
+    return solution, demands, customers, facilities
+
+
+def test_truncate_is_towards_zero():
+    values = np.random.default_rng(0).uniform(-100, 100, 10_000)
+    truncated = truncate(values)
+    assert np.all(np.abs(truncated) <= np.abs(values) + 1e-12)
+    assert np.all(np.abs(values - truncated) < 0.01)
+    np.testing.assert_array_equal(truncate([0.29, 0.57, 1.15]), [0.29, 0.57, 1.15])
+
+    frame = pd.DataFrame({'data_type': ['DS', 'DS'], 'value': [1.239, 0.001]})
+    assert truncate_submission(frame)['value'].tolist() == [1.23, 0.0]
+
+
+def test_repair_restores_feasibility(instance):
+    solution, demands, customers, facilities = instance
+    assert not check_solution(solution, demands).ok
+
+    # take capacity away so that some parking slots are overloaded
+    solution.fast[:3] = 0
+    repaired, report = repair_solution(solution, demands, customers, facilities)
+    assert report.ok, report.summary()
+    assert report.redistributed > 0
+    np.testing.assert_array_equal(repaired.slow, solution.slow)
+    np.testing.assert_array_equal(repaired.fast, solution.fast)
+    units = repaired.flow * 100
+    np.testing.assert_allclose(units, np.round(units), atol=1e-6)
+    assert np.all(repaired.flow >= 0)
+    np.testing.assert_allclose(repaired.served(), truncate(demands), atol=1e-9)
+    assert np.all(repaired.loads() <= repaired.capacities() + 1e-9)
+    np.testing.assert_allclose(repaired.arcs.cost, np.hypot(*(customers[repaired.arcs.customer]
+                                                              - facilities[repaired.arcs.facility]).T))
+
+
+def test_repair_reports_what_cannot_be_fixed():
+    arcs = CandidateArcs.dense(np.array([[1.0]]))
+    solution = PlacementSolution.from_values([250.0, 1.0, 0.0], arcs)
+    repaired, report = repair_solution(solution, [250.0], np.zeros((1, 2)), np.zeros((1, 2)))
+    assert repaired.flow[0] == 200.0
+    assert not report.ok
+    assert report.unserved.tolist() == [0] and report.shortfall[0] == pytest.approx(50.0)
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from shellhackathon.models import predict_model
+from shellhackathon.models.predict_model import forecast_demand
+from shellhackathon.models.registry import ModelRegistry, array_hash
+
+
+@pytest.fixture
+def history(make_demand):
+    return make_demand(23, years=[str(year) for year in range(2010, 2019)], max_demand=5, growth=(1.1, 1.3))
+
+
+def test_forecast_reuses_model_and_prediction(history, tmp_path, monkeypatch):
+    registry = ModelRegistry(tmp_path)
+    forecast, meta = forecast_demand(history, registry=registry, n_jobs=1)
+    assert forecast.columns[-2:].tolist() == ['2019', '2020']
+    assert set(meta['metrics']) == {'mae_1', 'mape_1', 'mae_2', 'mape_2'}
+    assert meta['config']['window'] == 2 and meta['config']['estimator'] == 'ExtraTreesRegressor'
+
+    def fail(*args, **kwargs):
+        raise AssertionError('the forecaster was fitted again')
+
+    monkeypatch.setattr(predict_model.DemandForecaster, 'fit', fail)
+    cached, cached_meta = forecast_demand(history, registry=registry, n_jobs=1)
+    pd.testing.assert_frame_equal(cached, forecast)
+    assert cached_meta == meta
+    # n_jobs does not change the model
+    assert forecast_demand(history, registry=registry, n_jobs=2)[1]['key'] == meta['key']
+    monkeypatch.undo()
+
+    # changed history or configuration, new models
+    changed = history.assign(**{'2018': history['2018'] * 1.01})
+    assert forecast_demand(changed, registry=registry, evaluate=False)[1]['key'] != meta['key']
+    assert forecast_demand(history, registry=registry, window=3, evaluate=False)[1]['key'] != meta['key']
+    assert len(registry.list()) == 3
+
+
+def test_models_are_compressed_and_memory_mapped(history, tmp_path):
+    registry = ModelRegistry(tmp_path)
+    _, meta = forecast_demand(history, registry=registry, evaluate=False)
+    entry = registry.entry('demand_forecaster', meta['key'])
+    forecaster = registry.load(entry, mmap_mode='r')
+    assert (entry / 'model.mmap.joblib').stat().st_size > (entry / 'model.joblib').stat().st_size
+    matrix = history.filter(regex=r'^\d+$').to_numpy()
+    np.testing.assert_array_equal(forecaster.predict(matrix), registry.load(entry).predict(matrix))
+    # the prediction of the history is stored
+    years = [str(year) for year in range(2010, 2019)]
+    stored = registry.prediction(entry, array_hash(matrix, years=years))
+    np.testing.assert_array_equal(forecaster.predict(matrix), stored)
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from shellhackathon.models.placement import MultiYearPlacementModel
+from shellhackathon.models.scoring import score
+
+
+@pytest.fixture
+def instance(make_instance):
+    supply, demand = make_instance(5, years=('2019', '2020'), max_demand=(30, 40))
+    solutions = MultiYearPlacementModel(supply, demand, ['2019', '2020']).solve_years()
+    submission = pd.concat([solution.to_frame() for solution in solutions.values()], ignore_index=True)
+    return supply, demand, solutions, submission
+
+
+def test_score_matches_objective(instance, tmp_path):
+    supply, demand, solutions, submission = instance
+    result = score(submission, supply, demand)
+    assert result.valid
+    assert list(result.years) == ['2019', '2020']
+    for year, solution in solutions.items():
+        assert result.years[year].total == pytest.approx(solution.objective)
+        assert np.isnan(result.years[year].forecast_mae)
+
+    path = tmp_path / 'submission.csv'
+    submission.to_csv(path)
+    assert score(path, supply, demand).total == pytest.approx(result.total)
+    assert len(result.to_frame()) == 2
+
+
+def test_forecast_mae(instance):
+    supply, demand, _, submission = instance
+    actual = demand.assign(**{'2019': demand['2019'] + 2.0})
+    assert score(submission, supply, demand, actual_demand=actual).years['2019'].forecast_mae == pytest.approx(2.0)
+
+    # forecast rows of the submission take precedence over the demand frame
+    forecast = pd.DataFrame({'year': 2019, 'data_type': 'DD', 'demand_point_index': np.arange(64),
+                             'supply_point_index': pd.NA, 'value': demand['2019'] + 2.0})
+    result = score(pd.concat([submission, forecast], ignore_index=True), supply, demand, actual_demand=actual)
+    assert result.years['2019'].forecast_mae == pytest.approx(0.0)
+    assert not result.years['2019'].valid
+
+
+def test_violations(instance):
+    supply, demand, _, submission = instance
+    broken = submission.copy()
+    chargers = broken['data_type'].isin(['SCS', 'FCS']) & (broken['year'] == 2020)
+    # removing all 2020 chargers breaks the lower bounds and the capacities
+    broken.loc[chargers, 'value'] = 0.0
+    # more chargers than slots in 2019
+    broken.loc[(broken['data_type'] == 'FCS') & (broken['year'] == 2019) & (broken['supply_point_index'] == 0),
+               'value'] = 10.0
+    # demand point 0 is not served in 2019
+    broken.loc[(broken['data_type'] == 'DS') & (broken['year'] == 2019) & (broken['demand_point_index'] == 0),
+               'value'] = 0.0
+
+    result = score(broken, supply, demand)
+    assert not result.valid
+    first, second = result.years['2019'], result.years['2020']
+    assert first.slot_violations.tolist() == [0]
+    assert 0 in first.violations.unserved
+    assert len(second.removed_chargers) and len(second.violations.overloaded)
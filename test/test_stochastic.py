@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from shellhackathon.models.placement import ChargerPlacementModel
+from shellhackathon.models.stochastic import demand_scenarios, plan_for_forecast, scenario_costs, solve_stochastic
+from shellhackathon.models.train_model import DemandForecaster
+
+
+@pytest.fixture
+def instance(make_instance):
+    return make_instance(25, years=[str(year) for year in range(2010, 2019)], max_demand=4, growth=(1.05, 1.35),
+                         index=True)
+
+
+def test_tree_scenarios_average_to_the_forecast(instance):
+    _, history = instance
+    forecaster = DemandForecaster(horizon=2).fit(history)
+    trees = forecaster.predict_trees(history)
+    assert trees.shape == (100, 64, 2)
+    np.testing.assert_allclose(trees.mean(axis=0), forecaster.predict(history))
+    scenarios = demand_scenarios(forecaster, history, 30, trees_per_scenario=100, seed=1)
+    # means of many trees spread less than single trees
+    assert scenarios.std(axis=0).mean() < demand_scenarios(forecaster, history, 30, seed=1).std(axis=0).mean()
+
+
+@pytest.mark.parametrize('method', ['benders', 'saa'])
+def test_stochastic_plan_serves_all_scenarios(instance, method):
+    supply, history = instance
+    result = plan_for_forecast(supply, history, 2019, num_scenarios=6, k=3, method=method, replications=3,
+                               compare=True, gap=1e-6)
+    assert result.solution.has_solution and result.solution.year == '2019'
+    assert result.shortfall_probability == 0
+    if method == 'benders':
+        assert result.expected_cost >= result.lower_bound - 1e-6
+    # the plan of the point forecast is one of the plans the stochastic program could choose
+    assert result.expected_cost <= np.mean(result.point_costs) + 1e-6
+    costs, _ = scenario_costs(ChargerPlacementModel(supply, history.assign(**{'2019': 0.0}), 2019,
+                                                    candidates=result.solution.arcs),
+                              result.solution.slow, result.solution.fast, np.zeros((1, 64)))
+    assert costs[0] == pytest.approx(result.solution.slow.sum() * 600 + result.solution.fast.sum() * 900)
+
+
+def test_parallel_saa_finds_the_same_plan(instance):
+    supply, history = instance
+    forecaster = DemandForecaster(horizon=1).fit(history)
+    scenarios = demand_scenarios(forecaster, history, 4)[..., 0]
+    model = ChargerPlacementModel(supply, history.assign(**{'2019': scenarios.mean(axis=0)}), 2019)
+    serial = solve_stochastic(model, scenarios, method='saa', replications=2)
+    parallel = solve_stochastic(model, scenarios, method='saa', replications=2, workers=2)
+    np.testing.assert_array_equal(serial.costs, parallel.costs)
+    with pytest.raises(ValueError):
+        solve_stochastic(model, scenarios, method='robust')
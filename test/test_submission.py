@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from shellhackathon.candidates import CandidateArcs
+from shellhackathon.models.solution import PlacementSolution
+from shellhackathon.models.submission import SUBMISSION_COLUMNS, iter_submission, read_submission, write_submission
+
+
+@pytest.fixture
+def solutions():
+    rng = np.random.default_rng(0)
+    arcs = CandidateArcs.dense(rng.uniform(0, 10, (50, 7)))
+    flow = np.where(rng.random(len(arcs)) < 0.1, rng.uniform(0, 5, len(arcs)), 0.0)
+    slow, fast = rng.integers(0, 3, 7).astype(float), rng.integers(0, 3, 7).astype(float)
+    return {year: PlacementSolution.from_values(np.concatenate([flow, slow, fast]), arcs, year=year)
+            for year in ('2019', '2020')}
+
+
+def test_zero_rows_match_notebook_format(solutions, tmp_path):
+    expected = pd.concat([solution.to_frame() for solution in solutions.values()], ignore_index=True)
+    path, = write_submission(solutions, tmp_path / 'submission.csv', zero_rows=True, chunk_size=64)
+    pd.testing.assert_frame_equal(read_submission(path), expected)
+
+
+def test_sparse_rows_in_all_formats(solutions, tmp_path):
+    paths = write_submission(solutions, tmp_path / 'submission', formats=('csv', 'parquet', 'feather'),
+                             chunk_size=10)
+    assert [path.suffix for path in paths] == ['.csv', '.parquet', '.feather']
+    frames = [read_submission(path) for path in paths]
+    for frame in frames[1:]:
+        pd.testing.assert_frame_equal(frame, frames[0])
+
+    frame = frames[0]
+    assert list(frame.columns) == SUBMISSION_COLUMNS
+    shipments = frame[frame['data_type'] == 'DS']
+    assert (shipments['value'] > 0).all()
+    assert len(shipments) == sum(np.count_nonzero(solution.flow) for solution in solutions.values())
+    assert len(frame) - len(shipments) == 2 * 2 * 7
+
+
+def test_chunks_are_bounded(solutions):
+    sizes = [len(chunk) for chunk in iter_submission(solutions['2019'], zero_rows=True, chunk_size=30)]
+    # first chunk holds the charger rows, then whole demand points
+    assert sizes[0] == 14 and max(sizes[1:]) <= 30 and sum(sizes[1:]) == 50 * 7
+
+
+def test_unknown_format(solutions, tmp_path):
+    with pytest.raises(ValueError):
+        write_submission(solutions, tmp_path / 'submission', formats=('xlsx',))
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from shellhackathon.data.demand_store import DemandStore
+from shellhackathon.models.placement import ChargerPlacementModel
+from shellhackathon.models.sweep import SweepTable, expand, run_sweep
+
+
+@pytest.fixture
+def instance(make_instance):
+    return make_instance(6)
+
+
+GRID = {'slow_costs': [600, 800], 'demand_scale': [1.0, 1.2], 'k': [3, None]}
+
+
+def test_sweep_matches_single_solves(instance, tmp_path):
+    supply, demand = instance
+    results = run_sweep(supply, demand, GRID, tmp_path / 'sweep', flush_every=3)
+    assert len(results) == 8 and (results['status'] == 'OPTIMAL').all()
+    assert len(SweepTable(tmp_path / 'sweep').parts()) == 3
+
+    row = results[(results['slow_costs'] == 800) & (results['demand_scale'] == 1.2) & results['k'].isna()].iloc[0]
+    scaled = demand.assign(**{'2019': demand['2019'] * 1.2})
+    expected = ChargerPlacementModel(supply, scaled, 2019, slow_costs=800).solve()
+    assert row['objective'] == pytest.approx(expected.objective)
+    assert row['num_slow'] == expected.slow.sum() and row['num_fast'] == expected.fast.sum()
+    # fewer candidate arcs can only make the plan more expensive
+    restricted = results[results['k'] == 3].set_index(['slow_costs', 'demand_scale'])['objective']
+    full = results[results['k'].isna()].set_index(['slow_costs', 'demand_scale'])['objective']
+    assert (restricted >= full - 1e-6).all()
+
+
+def test_parallel_sweep_and_resume(instance, tmp_path):
+    supply, demand = instance
+    grid = {'slow_costs': [600, 800], 'k': [3]}
+    serial = run_sweep(supply, demand, grid, tmp_path / 'serial')
+    parallel = run_sweep(supply, demand, grid, tmp_path / 'parallel', workers=2)
+    merged = serial.merge(parallel, on='scenario_id')
+    assert len(merged) == 2
+    np.testing.assert_allclose(merged['objective_x'], merged['objective_y'])
+
+    seen = []
+    grid = dict(grid, solver=['scip', 'lns'], time_limit=[0.5])
+    results = run_sweep(supply, demand, grid, tmp_path / 'serial', callback=seen.append)
+    # the scip scenarios with a different time limit are new scenarios as well
+    assert len(seen) == 4 and len(results) == 6
+    assert not (results['status'] == 'ERROR').any()
+    assert len(run_sweep(supply, demand, grid, tmp_path / 'serial', callback=seen.append)) == 6
+    assert len(seen) == 4
+
+
+def test_unknown_parameter():
+    with pytest.raises(ValueError):
+        expand({'slow_cost': [600]})
+
+
+def test_demand_store_cannot_be_scaled(instance, tmp_path):
+    supply, demand = instance
+    store = DemandStore.from_frame(demand)
+    with pytest.raises(TypeError, match='DemandStore'):
+        run_sweep(supply, store, {'demand_scale': [1.2]}, tmp_path / 'results')
+    results = run_sweep(supply, store, {'k': [3]}, tmp_path / 'results')
+    assert list(results['status']) == ['OPTIMAL']
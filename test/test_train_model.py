@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LinearRegression
+
+from shellhackathon.data.demand_store import DemandStore
+from shellhackathon.models.train_model import DemandForecaster, forecast_errors, lag_windows
+
+
+@pytest.fixture
+def history(make_demand):
+    demand = make_demand(21, years=[str(year) for year in range(2010, 2019)], max_demand=5, growth=(1.1, 1.3))
+    # without demand in any year
+    demand.loc[:3, demand.columns[3:]] = 0.0
+    return demand
+
+
+def test_lag_windows_stack_all_origins(history):
+    demand = history[[str(year) for year in range(2010, 2019)]].to_numpy()
+    features, targets = lag_windows(demand, window=3, horizon=2)
+    # 9 years give 5 origins of every demand point
+    assert features.shape == (5 * 64, 3) and targets.shape == (5 * 64, 2)
+    np.testing.assert_array_equal(features[64 + 7], demand[7, 1:4])
+    np.testing.assert_array_equal(targets[64 + 7], demand[7, 4:6])
+    with pytest.raises(ValueError):
+        lag_windows(demand, window=8, horizon=2)
+
+
+def test_forecast_adds_future_years(history):
+    forecaster = DemandForecaster(horizon=2, n_jobs=1).fit(history)
+    future = forecaster.forecast(history)
+    assert future.columns[-2:].tolist() == ['2019', '2020']
+    pd.testing.assert_frame_equal(future.iloc[:, :-2], history)
+    # points without demand stay without demand
+    assert (future.loc[:3, ['2019', '2020']] == 0).all().all()
+    growth = future['2020'][4:] / history['2018'][4:]
+    assert growth.between(1.1 ** 2, 1.3 ** 2).all()
+
+
+def test_holdout_beats_last_value(history):
+    train = [str(year) for year in range(2010, 2017)]
+    actual = history[['2017', '2018']].to_numpy()
+    forecast = DemandForecaster(horizon=2).fit(history, train).predict(history, train)
+    naive = np.repeat(history[['2016']].to_numpy(), 2, axis=1)
+    for step in range(2):
+        assert forecast_errors(actual[:, step], forecast[:, step])['mae'] < \
+            forecast_errors(actual[:, step], naive[:, step])['mae']
+
+
+@pytest.mark.parametrize('estimator', [None, LinearRegression()])
+def test_store_and_frame_give_the_same_forecast(history, estimator):
+    history = history.astype({str(year): np.float32 for year in range(2010, 2019)}).astype(
+        {str(year): np.float64 for year in range(2010, 2019)})
+    store = DemandStore.from_frame(history)
+    expected = DemandForecaster(estimator, horizon=3).fit(history).predict(history)
+    forecast = DemandForecaster(estimator, horizon=3).fit(store).predict(store)
+    assert forecast.shape == (64, 3)
+    np.testing.assert_allclose(forecast, expected, rtol=1e-6)
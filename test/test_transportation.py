@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from shellhackathon.candidates import CandidateArcs, nearest_candidates
+from shellhackathon.distance import distance_matrix
+from shellhackathon.models.transportation import MinCostFlowEvaluator, solve_transportation, solve_transportation_lp
+
+
+@pytest.fixture
+def instance():
+    rng = np.random.default_rng(3)
+    customers = rng.uniform(0, 30, (300, 2))
+    facilities = rng.uniform(0, 30, (15, 2))
+    demands = np.round(rng.uniform(0, 20, 300), 2)
+    capacities = np.round(rng.uniform(0.8, 1.6, 15) * demands.sum() / 15, 2)
+    return CandidateArcs.dense(distance_matrix(customers, facilities)), demands, capacities
+
+
+def test_min_cost_flow_matches_lp(instance):
+    arcs, demands, capacities = instance
+    lp = solve_transportation_lp(demands, capacities, arcs)
+    flow = solve_transportation(demands, capacities, arcs)
+    assert flow.objective == pytest.approx(lp.objective, rel=1e-4)
+    np.testing.assert_allclose(np.bincount(arcs.customer, flow.flow), demands, atol=1e-9)
+    assert np.all(np.bincount(arcs.facility, flow.flow) <= capacities + 1e-9)
+
+
+def test_flows_have_two_decimals(instance):
+    arcs, demands, capacities = instance
+    flow = solve_transportation(demands, capacities, arcs).flow
+    np.testing.assert_allclose(flow * 100, np.round(flow * 100), atol=1e-6)
+
+
+def test_insufficient_capacity_is_unmet(instance):
+    arcs, demands, capacities = instance
+    lp = solve_transportation_lp(demands, capacities / 2, arcs)
+    flow = solve_transportation(demands, capacities / 2, arcs)
+    assert flow.unmet.sum() == pytest.approx(demands.sum() - capacities.sum() / 2, abs=0.05)
+    assert flow.unmet.sum() == pytest.approx(lp.unmet.sum(), abs=0.05)
+
+
+def test_sparse_arcs(instance):
+    _, demands, capacities = instance
+    sparse = nearest_candidates(np.zeros((300, 2)), np.zeros((15, 2)), k=1)
+    result = solve_transportation(demands, capacities, sparse)
+    assert len(result.flow) == len(sparse) == 300
+
+
+def test_resolve_only_reroutes_customers_of_changed_capacities(instance):
+    _, demands, capacities = instance
+    rng = np.random.default_rng(8)
+    arcs = nearest_candidates(rng.uniform(0, 30, (300, 2)), rng.uniform(0, 30, (15, 2)), k=3)
+    evaluator = MinCostFlowEvaluator(demands, arcs)
+    previous = evaluator.solve(capacities)
+    changed = capacities.copy()
+    changed[[2, 7]] /= 3
+    result = evaluator.resolve(changed, capacities, previous)
+    untouched = ~np.isin(arcs.customer, arcs.customer[np.isin(arcs.facility, [2, 7])])
+    assert untouched.any() and not untouched.all()
+    np.testing.assert_array_equal(result.flow[untouched], previous.flow[untouched])
+    np.testing.assert_allclose(np.bincount(arcs.customer, result.flow) + result.unmet, demands, atol=1e-9)
+    assert np.all(np.bincount(arcs.facility, result.flow, minlength=15) <= changed + 1e-9)
+    assert result.objective >= evaluator.solve(changed).objective - 1e-9